@@ -3,11 +3,20 @@ import openai
 import re
 import json
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from enum import Enum
 import openai
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .llm_cache import LLMCache
+from .local_classifier import LocalCommentClassifier
+from .keyword_matcher import KeywordMatcher
+from .circuit_breaker import CircuitOpenError, get_circuit_breaker
+
+# Bump whenever a prompt changes so cached responses from older prompts are not reused
+PROMPT_VERSION = "1"
 
 class AIProcessor:
     def __init__(self, openai_api_key: str):
@@ -53,10 +62,31 @@ class Platform(Enum):
     TWITTER = "twitter"
 
 class AIProcessor:
-    def __init__(self, openai_api_key: str):
+    def __init__(self, openai_api_key: str, cache: LLMCache = None,
+                 local_classifier: LocalCommentClassifier = None):
         """Initialize AI processor with OpenAI API key"""
         openai.api_key = openai_api_key
         self.client = openai.OpenAI(api_key=openai_api_key)
+        self.async_client = openai.AsyncOpenAI(api_key=openai_api_key)
+        # Provider outages open this circuit so calls fail fast instead of timing out one by one
+        self.llm_breaker = get_circuit_breaker("llm:openai")
+        
+        # Cache for classifications, replies and sentiment of near-identical comments
+        self.cache = cache or LLMCache()
+        # Replies are only reused for low-stakes types, rotating between a few cached variants
+        self.cacheable_reply_types = {CommentType.PRAISE, CommentType.GENERAL, CommentType.SPAM}
+        self.reply_cache_variants = int(os.getenv("LLM_CACHE_REPLY_VARIANTS", "3"))
+        
+        # Local rules + model answer obvious cases; the LLM only sees comments it is unsure about
+        self.local_classifier = local_classifier or LocalCommentClassifier()
+        
+        # Batched classification: comments per request are bounded by an estimated input token budget
+        self.classification_batch_tokens = int(os.getenv("AI_CLASSIFY_BATCH_TOKENS", "2000"))
+        self.classification_batch_max_items = int(os.getenv("AI_CLASSIFY_BATCH_MAX_ITEMS", "25"))
+        
+        # Content generation runs on a bounded pool; each request asks for up to content_max_choices drafts
+        self.content_executor = ThreadPoolExecutor(max_workers=int(os.getenv("AI_CONTENT_WORKERS", "6")))
+        self.content_max_choices = int(os.getenv("AI_CONTENT_MAX_CHOICES", "4"))
         
         # Brand voice configuration for Ervin
         self.brand_voice = {
@@ -74,166 +104,772 @@ class AIProcessor:
             "support": ["help", "problem", "issue", "not working", "error"],
             "praise": ["amazing", "great", "awesome", "love", "fantastic", "incredible"]
         }
+        
+        # Keywords for quick spam/lead classification
+        self.spam_indicators = ["click here", "follow me", "check my profile", "dm me", "www.", "http://", "https://"]
+        self.lead_keywords = ["interested", "how much", "price", "buy", "want", "need"]
+        
+        # All keyword sets are compiled once into a single matcher
+        self._keyword_sets_setting = None
+        self.keyword_matcher = self._build_keyword_matcher()
 
-    def classify_comment(self, comment_text: str, platform: str) -> Tuple[CommentType, Dict]:
-        """Classify comment type using AI and keyword analysis"""
+    # Errors meaning the provider is unreachable or failing, as opposed to rejecting one request
+    OUTAGE_ERRORS = (openai.APIConnectionError, openai.InternalServerError)
+
+    def _complete(self, **request):
+        """Create a chat completion through the LLM provider's circuit breaker"""
+        if not self.llm_breaker.allow_request():
+            raise CircuitOpenError("LLM provider circuit is open")
+        try:
+            response = self.client.chat.completions.create(**request)
+        except self.OUTAGE_ERRORS as e:
+            self.llm_breaker.record_failure(e)
+            raise
+        except Exception:
+            # The provider answered (e.g. rate limit or bad request), so it is up
+            self.llm_breaker.record_success()
+            raise
+        self.llm_breaker.record_success()
+        return response
+
+    async def _acomplete(self, **request):
+        """Async variant of _complete"""
+        if not self.llm_breaker.allow_request():
+            raise CircuitOpenError("LLM provider circuit is open")
+        try:
+            response = await self.async_client.chat.completions.create(**request)
+        except self.OUTAGE_ERRORS as e:
+            self.llm_breaker.record_failure(e)
+            raise
+        except Exception:
+            self.llm_breaker.record_success()
+            raise
+        self.llm_breaker.record_success()
+        return response
+
+    def _build_keyword_matcher(self) -> KeywordMatcher:
+        """Compile spam, lead and GHL engagement keywords into one matcher"""
         
-        # First, use keyword-based classification for quick wins
-        comment_lower = comment_text.lower()
+        return KeywordMatcher({
+            "spam": self.spam_indicators,
+            "lead": self.lead_keywords,
+            **self.engagement_keywords
+        })
+
+    def reload_keywords(self, db) -> bool:
+        """Reload keyword sets from the 'keyword_sets' setting; returns True if they changed.
+        
+        The setting is a JSON object mapping category ("spam", "lead" or an engagement
+        trigger type) to its keyword list; categories left out keep their defaults.
+        """
+        
+        try:
+            setting = db.get_setting("keyword_sets")
+            if not setting or setting == self._keyword_sets_setting:
+                return False
+            
+            keyword_sets = json.loads(setting)
+            self.spam_indicators = keyword_sets.get("spam", self.spam_indicators)
+            self.lead_keywords = keyword_sets.get("lead", self.lead_keywords)
+            self.engagement_keywords = {
+                **self.engagement_keywords,
+                **{category: keywords for category, keywords in keyword_sets.items() if category not in ("spam", "lead")}
+            }
+            
+            # Swap in the new matcher in one assignment so concurrent readers never see a partial one
+            self.keyword_matcher = self._build_keyword_matcher()
+            self._keyword_sets_setting = setting
+            logger.info("Keyword sets reloaded from settings")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to reload keyword sets: {e}")
+            return False
+
+    def _keyword_classification(self, comment_text: str) -> Optional[Tuple[CommentType, Dict]]:
+        """Classify obvious spam and leads from keywords without an API call"""
+        
+        matches = self.keyword_matcher.match(comment_text)
         
         # Check for spam indicators
-        spam_indicators = ["click here", "follow me", "check my profile", "dm me", "www.", "http"]
-        if any(indicator in comment_lower for indicator in spam_indicators):
-            return CommentType.SPAM, {"confidence": 0.9, "reason": "spam_keywords"}
+        if "spam" in matches:
+            return CommentType.SPAM, {"confidence": 0.9, "reason": "spam_keywords", "source": "keyword",
+                                      "keywords": matches["spam"]}
         
         # Check for lead indicators
-        lead_keywords = ["interested", "how much", "price", "buy", "want", "need"]
-        if any(keyword in comment_lower for keyword in lead_keywords):
-            return CommentType.LEAD, {"confidence": 0.8, "reason": "lead_keywords"}
+        if "lead" in matches:
+            return CommentType.LEAD, {"confidence": 0.8, "reason": "lead_keywords", "source": "keyword",
+                                      "keywords": matches["lead"]}
+        
+        return None
+
+    def _classification_request(self, comment_text: str, platform: str) -> Dict:
+        """Build the chat-completion request for AI comment classification"""
+        
+        classification_prompt = f"""
+        Analyze this social media comment and classify it into one of these categories:
+        - LEAD: Shows buying interest, asks about services/products, wants more info
+        - PRAISE: Compliments, positive feedback, appreciation
+        - QUESTION: Asks genuine questions about content/topic
+        - COMPLAINT: Negative feedback, problems, dissatisfaction
+        - SPAM: Promotional, irrelevant, suspicious content
+        - GENERAL: Normal engagement, casual comments
+        
+        Comment: "{comment_text}"
+        Platform: {platform}
+        
+        Respond with JSON: {{"type": "CATEGORY", "confidence": 0.0-1.0, "reasoning": "brief explanation"}}
+        """
+        
+        return {
+            "model": "gpt-3.5-turbo",  # ✅ supported by all accounts
+            "messages": [{"role": "user", "content": classification_prompt}],
+            "temperature": 0.6,
+            "max_tokens": 150
+        }
+
+    def _parse_classification(self, response) -> Tuple[CommentType, Dict]:
+        """Parse the classification JSON returned by the model"""
+        
+        result = json.loads(response.choices[0].message.content)
+        comment_type = CommentType(result["type"].lower())
+        metadata = {
+            "confidence": result["confidence"],
+            "reasoning": result["reasoning"],
+            "ai_classified": True,
+            "source": "llm"
+        }
+        
+        return comment_type, metadata
+
+    def _local_classification(self, comment_text: str) -> Optional[Tuple[CommentType, Dict]]:
+        """Classify with keyword rules, then the local classifier; None means ask the LLM"""
+        
+        quick_result = self._keyword_classification(comment_text)
+        if quick_result:
+            return quick_result
+        
+        local_result = self.local_classifier.classify(comment_text)
+        if local_result:
+            return CommentType(local_result[0]), local_result[1]
+        
+        return None
+
+    def _cached_classification(self, comment_text: str, platform: str) -> Tuple[str, Optional[Tuple[CommentType, Dict]]]:
+        """Look up a cached classification; returns (cache_key, cached result or None)"""
+        
+        cache_key = self.cache.make_key("classification", comment_text, platform=platform,
+                                        prompt_version=PROMPT_VERSION)
+        cached = self.cache.get(cache_key)
+        if cached:
+            return cache_key, (CommentType(cached["type"]), {**cached["metadata"], "cached": True})
+        return cache_key, None
+
+    def _store_classification(self, cache_key: str, result: Tuple[CommentType, Dict]) -> Tuple[CommentType, Dict]:
+        """Cache a successful AI classification and pass it through"""
+        
+        comment_type, metadata = result
+        self.cache.set(cache_key, {"type": comment_type.value, "metadata": metadata})
+        return result
+
+    def quick_classification(self, comment_text: str, platform: str) -> Optional[Tuple[CommentType, Dict]]:
+        """Classification available without an LLM call (keywords, local model or cache), if any"""
+        
+        quick_result = self._local_classification(comment_text)
+        if quick_result:
+            return quick_result
+        
+        _, cached = self._cached_classification(comment_text, platform)
+        return cached
+
+    def _store_analysis(self, comment_text: str, platform: str, analysis: Dict) -> Dict:
+        """Seed the classification, reply and sentiment caches from a one-shot analysis and pass it through"""
+        
+        comment_type = analysis["comment_type"]
+        self.cache.set(
+            self.cache.make_key("classification", comment_text, platform=platform, prompt_version=PROMPT_VERSION),
+            {"type": comment_type.value, "metadata": analysis["classification"]}
+        )
+        self.cache.set(self.cache.make_key("sentiment", comment_text, prompt_version=PROMPT_VERSION), analysis["sentiment"])
+        if comment_type in self.cacheable_reply_types:
+            reply_key = self.cache.make_key("reply", comment_text, comment_type=comment_type.value,
+                                            platform=platform, prompt_version=PROMPT_VERSION)
+            self.cache.add_reply_variant(reply_key, analysis["reply"]["reply"], self.reply_cache_variants)
+        return analysis
+
+    def _classification_fallback(self, error: Exception) -> Tuple[CommentType, Dict]:
+        """Classification used when the AI call fails"""
+        
+        return CommentType.GENERAL, {"confidence": 0.5, "reason": "fallback", "source": "fallback", "error": str(error)}
+
+    def classify_comment(self, comment_text: str, platform: str) -> Tuple[CommentType, Dict]:
+        """Classify comment type using AI and keyword analysis"""
+        
+        # First, use keyword rules and the local classifier for quick wins
+        quick_result = self._local_classification(comment_text)
+        if quick_result:
+            return quick_result
+        
+        cache_key, cached = self._cached_classification(comment_text, platform)
+        if cached:
+            return cached
         
         # Use AI for more nuanced classification
         try:
-            classification_prompt = f"""
-            Analyze this social media comment and classify it into one of these categories:
-            - LEAD: Shows buying interest, asks about services/products, wants more info
-            - PRAISE: Compliments, positive feedback, appreciation
-            - QUESTION: Asks genuine questions about content/topic
-            - COMPLAINT: Negative feedback, problems, dissatisfaction
-            - SPAM: Promotional, irrelevant, suspicious content
-            - GENERAL: Normal engagement, casual comments
-            
-            Comment: "{comment_text}"
-            Platform: {platform}
+            response = self._complete(**self._classification_request(comment_text, platform))
+            return self._store_classification(cache_key, self._parse_classification(response))
             
-            Respond with JSON: {{"type": "CATEGORY", "confidence": 0.0-1.0, "reasoning": "brief explanation"}}
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",  # ✅ supported by all accounts
+        except Exception as e:
+            logger.error(f"AI classification failed: {e}")
+            return self._classification_fallback(e)
 
-                messages=[{"role": "user", "content": classification_prompt}],
-                temperature=0.6,
-                max_tokens=150
+    async def aclassify_comment(self, comment_text: str, platform: str) -> Tuple[CommentType, Dict]:
+        """Async variant of classify_comment; rate-limit errors are re-raised for back-pressure"""
+        
+        quick_result = self._local_classification(comment_text)
+        if quick_result:
+            return quick_result
+        
+        cache_key, cached = self._cached_classification(comment_text, platform)
+        if cached:
+            return cached
+        
+        try:
+            response = await self._acomplete(
+                **self._classification_request(comment_text, platform)
             )
+            return self._store_classification(cache_key, self._parse_classification(response))
             
-            result = json.loads(response.choices[0].message.content)
-            comment_type = CommentType(result["type"].lower())
-            metadata = {
-                "confidence": result["confidence"],
-                "reasoning": result["reasoning"],
-                "ai_classified": True
-            }
-            
-            return comment_type, metadata
-            
+        except openai.RateLimitError:
+            raise
         except Exception as e:
             logger.error(f"AI classification failed: {e}")
-            return CommentType.GENERAL, {"confidence": 0.5, "reason": "fallback", "error": str(e)}
+            return self._classification_fallback(e)
 
-    def generate_reply(self, comment_text: str, comment_type: CommentType, platform: str, 
-                      post_context: Optional[str] = None) -> Dict:
-        """Generate contextual reply based on comment type and platform"""
+    def _batch_classification_request(self, batch: List[Tuple[str, Dict]]) -> Dict:
+        """Build one structured-JSON request classifying several comments by id"""
+        
+        system_prompt = """
+        Classify each social media comment into one of these categories:
+        - LEAD: Shows buying interest, asks about services/products, wants more info
+        - PRAISE: Compliments, positive feedback, appreciation
+        - QUESTION: Asks genuine questions about content/topic
+        - COMPLAINT: Negative feedback, problems, dissatisfaction
+        - SPAM: Promotional, irrelevant, suspicious content
+        - GENERAL: Normal engagement, casual comments
+        
+        The user message is a JSON list of comments with an "id", "platform" and "comment".
+        Respond ONLY with JSON containing exactly one result per comment id:
+        {"results": [{"id": "c1", "type": "CATEGORY", "confidence": 0.0-1.0, "reasoning": "brief explanation"}]}
+        """
+        
+        items = [
+            {"id": f"c{position}", "platform": item["platform"], "comment": item["text"]}
+            for position, (_, item) in enumerate(batch)
+        ]
+        
+        return {
+            "model": "gpt-3.5-turbo",
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": json.dumps(items, ensure_ascii=False)}
+            ],
+            "response_format": {"type": "json_object"},
+            "temperature": 0.6,
+            "max_tokens": 50 + 60 * len(items)
+        }
+
+    def _parse_batch_classification(self, response, batch_size: int) -> Dict[int, Tuple[CommentType, Dict]]:
+        """Parse a batch classification response; returns {batch position: result} for valid items only"""
+        
+        results = {}
+        for result in json.loads(response.choices[0].message.content).get("results", []):
+            try:
+                position = int(str(result["id"]).lstrip("c"))
+                if not 0 <= position < batch_size or position in results:
+                    raise ValueError(f"Unexpected id: {result['id']}")
+                
+                confidence = float(result["confidence"])
+                if not 0.0 <= confidence <= 1.0:
+                    raise ValueError(f"Confidence out of range: {confidence}")
+                
+                results[position] = (CommentType(str(result["type"]).lower()), {
+                    "confidence": confidence,
+                    "reasoning": result.get("reasoning", ""),
+                    "ai_classified": True,
+                    "source": "llm",
+                    "batched": True
+                })
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Invalid batch classification item {result}: {e}")
+        
+        return results
+
+    def _plan_classification_batches(self, items: List[Tuple[str, Dict]]) -> List[List[Tuple[str, Dict]]]:
+        """Group items into batches that fit the token budget and item cap"""
+        
+        batches, batch, batch_tokens = [], [], 0
+        for item in items:
+            # Rough token estimate: ~4 characters per token plus per-item JSON overhead
+            item_tokens = len(item[1]["text"]) // 4 + 15
+            if batch and (batch_tokens + item_tokens > self.classification_batch_tokens
+                          or len(batch) >= self.classification_batch_max_items):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(item)
+            batch_tokens += item_tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _classify_batch(self, batch: List[Tuple[str, Dict]], results: List) -> int:
+        """Classify one batch, re-splitting items that fail validation; returns requests made"""
+        
+        def assign(item: Dict, result: Tuple[CommentType, Dict]):
+            for index in item["indexes"]:
+                results[index] = result
+        
+        # A lone comment goes through the regular single-comment request
+        if len(batch) == 1:
+            cache_key, item = batch[0]
+            try:
+                response = self._complete(
+                    **self._classification_request(item["text"], item["platform"])
+                )
+                assign(item, self._store_classification(cache_key, self._parse_classification(response)))
+            except Exception as e:
+                logger.error(f"AI classification failed: {e}")
+                assign(item, self._classification_fallback(e))
+            return 1
         
         try:
-            # Build context-aware prompt
-            context_info = f"Post context: {post_context}\n" if post_context else ""
-            
-            system_prompt = f"""
-            You are Ervin's AI assistant for social media management. Generate replies that match his brand voice:
-            
-            BRAND VOICE:
-            - Tone: {self.brand_voice['tone']}
-            - Style: {self.brand_voice['style']}
-            - Core Values: {', '.join(self.brand_voice['values'])}
-            - Avoid: {', '.join(self.brand_voice['avoid'])}
-            
-            REPLY GUIDELINES BY COMMENT TYPE:
-            
-            LEAD: 
-            - Acknowledge interest warmly
-            - Provide helpful info without being pushy
-            - Include soft CTA (DM, link, tag for updates)
-            - Example: "So glad this resonates! I'd love to share more details - check your DMs! 🙏"
+            response = self._complete(**self._batch_classification_request(batch))
+        except Exception as e:
+            # No answer at all (rate limit, outage, timeout, open circuit): re-splitting would only
+            # multiply calls that fail the same way; per-comment processing retries these
+            logger.error(f"Batch classification of {len(batch)} comments failed: {e}")
+            for _, item in batch:
+                assign(item, self._classification_fallback(e))
+            return 1
+        
+        try:
+            parsed = self._parse_batch_classification(response, len(batch))
+        except Exception as e:
+            # The answer was unusable as a whole; smaller batches may still parse
+            logger.warning(f"Batch classification of {len(batch)} comments could not be parsed: {e}")
+            parsed = {}
+        
+        failed = []
+        for position, (cache_key, item) in enumerate(batch):
+            if position in parsed:
+                assign(item, self._store_classification(cache_key, parsed[position]))
+            else:
+                failed.append((cache_key, item))
+        
+        requests_made = 1
+        if failed:
+            middle = (len(failed) + 1) // 2
+            for half in (failed[:middle], failed[middle:]):
+                if half:
+                    requests_made += self._classify_batch(half, results)
+        return requests_made
+
+    def classify_comments(self, comments: List[Dict]) -> List[Tuple[CommentType, Dict]]:
+        """Classify many comments ({"text", "platform"} dicts) at once, in input order.
+        
+        Keyword, local-classifier and cache hits are resolved first; the remaining
+        comments are deduplicated and packed into batched requests.
+        """
+        
+        results = [None] * len(comments)
+        pending = {}  # cache key -> {"text", "platform", "indexes"}
+        
+        for index, comment in enumerate(comments):
+            comment_text = comment.get("text", "")
+            platform = comment.get("platform", "")
             
-            PRAISE:
-            - Express genuine gratitude
-            - Encourage continued engagement
-            - Ask engaging follow-up question
-            - Example: "Thank you so much! This kind of encouragement keeps me going. What's been your biggest takeaway?"
+            quick_result = self._local_classification(comment_text)
+            if quick_result:
+                results[index] = quick_result
+                continue
             
-            QUESTION:
-            - Provide helpful, specific answer
-            - Show expertise without preaching
-            - Invite further discussion
-            - Example: "Great question! In my experience... What's your current approach to this?"
+            cache_key, cached = self._cached_classification(comment_text, platform)
+            if cached:
+                results[index] = cached
+                continue
             
-            COMPLAINT:
-            - Show empathy and understanding
-            - Take responsibility where appropriate
-            - Offer solution or follow-up
-            - Example: "I hear you and appreciate the feedback. Let me make this right - DMing you now."
+            item = pending.setdefault(cache_key, {"text": comment_text, "platform": platform, "indexes": []})
+            item["indexes"].append(index)
+        
+        requests_made = 0
+        for batch in self._plan_classification_batches(list(pending.items())):
+            requests_made += self._classify_batch(batch, results)
+        
+        logger.info(f"Classified {len(comments)} comments ({len(pending)} needing AI) with {requests_made} requests")
+        return results
+
+    def _reply_system_prompt(self) -> str:
+        """Build the brand-voice system prompt shared by reply generation calls"""
+        
+        return f"""
+        You are Ervin's AI assistant for social media management. Generate replies that match his brand voice:
+        
+        BRAND VOICE:
+        - Tone: {self.brand_voice['tone']}
+        - Style: {self.brand_voice['style']}
+        - Core Values: {', '.join(self.brand_voice['values'])}
+        - Avoid: {', '.join(self.brand_voice['avoid'])}
+        
+        REPLY GUIDELINES BY COMMENT TYPE:
+        
+        LEAD: 
+        - Acknowledge interest warmly
+        - Provide helpful info without being pushy
+        - Include soft CTA (DM, link, tag for updates)
+        - Example: "So glad this resonates! I'd love to share more details - check your DMs! 🙏"
+        
+        PRAISE:
+        - Express genuine gratitude
+        - Encourage continued engagement
+        - Ask engaging follow-up question
+        - Example: "Thank you so much! This kind of encouragement keeps me going. What's been your biggest takeaway?"
+        
+        QUESTION:
+        - Provide helpful, specific answer
+        - Show expertise without preaching
+        - Invite further discussion
+        - Example: "Great question! In my experience... What's your current approach to this?"
+        
+        COMPLAINT:
+        - Show empathy and understanding
+        - Take responsibility where appropriate
+        - Offer solution or follow-up
+        - Example: "I hear you and appreciate the feedback. Let me make this right - DMing you now."
+        
+        GENERAL:
+        - Be warm and authentic
+        - Add value to the conversation
+        - Encourage community engagement
+        - Example: "Love seeing this kind of discussion! You all inspire me daily 💪"
+        
+        PLATFORM CONSIDERATIONS:
+        - YouTube: More detailed, educational responses
+        - Instagram: Visual, emoji-friendly, shorter
+        - Facebook: Community-focused, conversational
+        - LinkedIn: Professional but personal
+        - Twitter: Concise, impactful
+        
+        Keep replies 1-3 sentences, natural and conversational. Include relevant emojis for Instagram/Facebook.
+        """
+
+    def _reply_request(self, comment_text: str, comment_type: CommentType, platform: str,
+                       post_context: Optional[str] = None) -> Dict:
+        """Build the chat-completion request for reply generation"""
+        
+        # Build context-aware prompt
+        context_info = f"Post context: {post_context}\n" if post_context else ""
+        
+        system_prompt = self._reply_system_prompt()
+        
+        user_prompt = f"""
+        {context_info}
+        Platform: {platform}
+        Comment Type: {comment_type.value}
+        Comment: "{comment_text}"
+        
+        Generate an appropriate reply that matches Ervin's brand voice and the comment type guidelines.
+        """
+        
+        return {
+            "model": "gpt-3.5-turbo",  # ✅ supported by all accounts
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.6,
+            "max_tokens": 200
+        }
+
+    def _reply_fallback(self, comment_type: CommentType, platform: str, error: Exception) -> Dict:
+        """Canned reply used when generation fails"""
+        
+        return {
+            "reply": "Thanks for your comment! I appreciate you being part of this community. 🙏",
+            "platform": platform,
+            "comment_type": comment_type.value,
+            "error": str(error),
+            "timestamp": datetime.now().isoformat(),
+            "needs_approval": True
+        }
+
+    def _cached_reply(self, comment_text: str, comment_type: CommentType,
+                      platform: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """Reuse a cached reply variant for low-stakes comments; returns (cache_key, reply data or None)"""
+        
+        if comment_type not in self.cacheable_reply_types:
+            return None, None
+        
+        # Post context is deliberately left out of the key: praise/general replies don't depend on it
+        cache_key = self.cache.make_key("reply", comment_text, comment_type=comment_type.value,
+                                        platform=platform, prompt_version=PROMPT_VERSION)
+        reply_text = self.cache.get_reply_variant(cache_key, self.reply_cache_variants)
+        if reply_text:
+            reply_data = self._build_reply_data(comment_text, reply_text, comment_type, platform)
+            reply_data["cached"] = True
+            return cache_key, reply_data
+        return cache_key, None
+
+    def generate_reply(self, comment_text: str, comment_type: CommentType, platform: str, 
+                      post_context: Optional[str] = None) -> Dict:
+        """Generate contextual reply based on comment type and platform"""
+        
+        cache_key, cached = self._cached_reply(comment_text, comment_type, platform)
+        if cached:
+            return cached
+        
+        try:
+            response = self._complete(
+                **self._reply_request(comment_text, comment_type, platform, post_context)
+            )
             
-            GENERAL:
-            - Be warm and authentic
-            - Add value to the conversation
-            - Encourage community engagement
-            - Example: "Love seeing this kind of discussion! You all inspire me daily 💪"
+            reply_text = response.choices[0].message.content.strip()
+            if cache_key:
+                self.cache.add_reply_variant(cache_key, reply_text, self.reply_cache_variants)
             
-            PLATFORM CONSIDERATIONS:
-            - YouTube: More detailed, educational responses
-            - Instagram: Visual, emoji-friendly, shorter
-            - Facebook: Community-focused, conversational
-            - LinkedIn: Professional but personal
-            - Twitter: Concise, impactful
+            return self._build_reply_data(comment_text, reply_text, comment_type, platform)
             
-            Keep replies 1-3 sentences, natural and conversational. Include relevant emojis for Instagram/Facebook.
-            """
+        except Exception as e:
+            logger.error(f"Reply generation failed: {e}")
+            return self._reply_fallback(comment_type, platform, e)
+
+    async def agenerate_reply(self, comment_text: str, comment_type: CommentType, platform: str,
+                              post_context: Optional[str] = None) -> Dict:
+        """Async variant of generate_reply; rate-limit errors are re-raised for back-pressure"""
+        
+        cache_key, cached = self._cached_reply(comment_text, comment_type, platform)
+        if cached:
+            return cached
+        
+        try:
+            response = await self._acomplete(
+                **self._reply_request(comment_text, comment_type, platform, post_context)
+            )
             
-            user_prompt = f"""
-            {context_info}
-            Platform: {platform}
-            Comment Type: {comment_type.value}
-            Comment: "{comment_text}"
+            reply_text = response.choices[0].message.content.strip()
+            if cache_key:
+                self.cache.add_reply_variant(cache_key, reply_text, self.reply_cache_variants)
             
-            Generate an appropriate reply that matches Ervin's brand voice and the comment type guidelines.
-            """
+            return self._build_reply_data(comment_text, reply_text, comment_type, platform)
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",  # ✅ supported by all accounts
-
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.6,
-                max_tokens=200
+        except openai.RateLimitError:
+            raise
+        except Exception as e:
+            logger.error(f"Reply generation failed: {e}")
+            return self._reply_fallback(comment_type, platform, e)
+
+    def _stream_completion(self, request: Dict) -> Iterator[str]:
+        """Yield the text deltas of a streamed chat completion.
+        
+        The breaker is only told once the stream ends, so a connection that drops or times
+        out mid-stream counts as a provider failure like one that never opened.
+        """
+        
+        if not self.llm_breaker.allow_request():
+            raise CircuitOpenError("LLM provider circuit is open")
+        try:
+            stream = self.client.chat.completions.create(**request, stream=True)
+        except self.OUTAGE_ERRORS as e:
+            self.llm_breaker.record_failure(e)
+            raise
+        except Exception:
+            # The provider answered (e.g. rate limit or bad request), so it is up
+            self.llm_breaker.record_success()
+            raise
+        
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except GeneratorExit:
+            # The caller stopped reading early; the provider was answering
+            self.llm_breaker.record_success()
+            raise
+        except Exception as e:
+            self.llm_breaker.record_failure(e)
+            raise
+        self.llm_breaker.record_success()
+
+    def stream_reply(self, comment_text: str, comment_type: CommentType, platform: str,
+                     post_context: Optional[str] = None) -> Iterator[str]:
+        """Streaming variant of generate_reply that yields the reply text as it is generated.
+        
+        A failed stream raises, even after some text was yielded, so callers can report
+        the error instead of presenting a partial or canned reply as generated.
+        """
+        
+        cache_key, cached = self._cached_reply(comment_text, comment_type, platform)
+        if cached:
+            yield cached["reply"]
+            return
+        
+        parts = []
+        try:
+            for delta in self._stream_completion(self._reply_request(comment_text, comment_type, platform, post_context)):
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            logger.error(f"Reply streaming failed after {len(parts)} chunks: {e}")
+            raise
+        
+        reply_text = "".join(parts).strip()
+        if cache_key and reply_text:
+            self.cache.add_reply_variant(cache_key, reply_text, self.reply_cache_variants)
+
+    def _build_reply_data(self, comment_text: str, reply_text: str, comment_type: CommentType,
+                          platform: str, confidence: float = 0.8) -> Dict:
+        """Wrap a drafted reply with GHL triggers and approval flags"""
+        
+        # Detect GHL trigger keywords in the generated reply and original comment
+        ghl_triggers = self._detect_ghl_triggers(comment_text, reply_text)
+        
+        return {
+            "reply": reply_text,
+            "platform": platform,
+            "comment_type": comment_type.value,
+            "ghl_triggers": ghl_triggers,
+            "timestamp": datetime.now().isoformat(),
+            "confidence": confidence,
+            "needs_approval": self._needs_manual_approval(comment_type, ghl_triggers)
+        }
+
+    def _analysis_request(self, comment_text: str, platform: str,
+                          post_context: Optional[str] = None) -> Dict:
+        """Build the single structured-JSON request used by one-shot analysis"""
+        
+        context_info = f"Post context: {post_context}\n" if post_context else ""
+        
+        system_prompt = self._reply_system_prompt() + """
+        In addition to drafting the reply, classify the comment and analyze its sentiment.
+        
+        CATEGORIES:
+        - LEAD: Shows buying interest, asks about services/products, wants more info
+        - PRAISE: Compliments, positive feedback, appreciation
+        - QUESTION: Asks genuine questions about content/topic
+        - COMPLAINT: Negative feedback, problems, dissatisfaction
+        - SPAM: Promotional, irrelevant, suspicious content
+        - GENERAL: Normal engagement, casual comments
+        
+        Respond ONLY with JSON in this format:
+        {
+            "type": "CATEGORY",
+            "confidence": 0.0-1.0,
+            "reasoning": "brief explanation",
+            "sentiment": "positive/negative/neutral",
+            "sentiment_confidence": 0.0-1.0,
+            "emotions": ["joy", "anger", "curiosity", etc.],
+            "urgency": "low/medium/high",
+            "reply": "the drafted reply"
+        }
+        """
+        
+        user_prompt = f"""
+        {context_info}
+        Platform: {platform}
+        Comment: "{comment_text}"
+        """
+        
+        return {
+            "model": "gpt-3.5-turbo",
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "response_format": {"type": "json_object"},
+            "temperature": 0.6,
+            "max_tokens": 400
+        }
+
+    def analyze_comment(self, comment_text: str, platform: str,
+                        post_context: Optional[str] = None) -> Optional[Dict]:
+        """Classify, score sentiment and draft a reply in a single structured-JSON call.
+        
+        Returns None when the call or its validation fails so callers can fall back
+        to the separate classify/reply/sentiment calls.
+        """
+        
+        try:
+            response = self._complete(
+                **self._analysis_request(comment_text, platform, post_context)
             )
             
-            reply_text = response.choices[0].message.content.strip()
+            result = json.loads(response.choices[0].message.content)
+            return self._store_analysis(comment_text, platform, self._parse_analysis(result, comment_text, platform))
             
-            # Detect GHL trigger keywords in the generated reply and original comment
-            ghl_triggers = self._detect_ghl_triggers(comment_text, reply_text)
+        except Exception as e:
+            logger.warning(f"One-shot analysis failed, falling back to separate calls: {e}")
+            return None
+
+    async def aanalyze_comment(self, comment_text: str, platform: str,
+                               post_context: Optional[str] = None) -> Optional[Dict]:
+        """Async variant of analyze_comment; rate-limit errors are re-raised for back-pressure"""
+        
+        try:
+            response = await self._acomplete(
+                **self._analysis_request(comment_text, platform, post_context)
+            )
             
-            return {
-                "reply": reply_text,
-                "platform": platform,
-                "comment_type": comment_type.value,
-                "ghl_triggers": ghl_triggers,
-                "timestamp": datetime.now().isoformat(),
-                "confidence": 0.8,
-                "needs_approval": self._needs_manual_approval(comment_type, ghl_triggers)
-            }
+            result = json.loads(response.choices[0].message.content)
+            return self._store_analysis(comment_text, platform, self._parse_analysis(result, comment_text, platform))
             
+        except openai.RateLimitError:
+            raise
         except Exception as e:
-            logger.error(f"Reply generation failed: {e}")
-            return {
-                "reply": "Thanks for your comment! I appreciate you being part of this community. 🙏",
-                "platform": platform,
-                "comment_type": comment_type.value,
-                "error": str(e),
-                "timestamp": datetime.now().isoformat(),
-                "needs_approval": True
+            logger.warning(f"One-shot analysis failed, falling back to separate calls: {e}")
+            return None
+
+    def _parse_analysis(self, result: Dict, comment_text: str, platform: str) -> Dict:
+        """Validate a one-shot analysis response and split it into classification, reply and sentiment"""
+        
+        comment_type = CommentType(str(result["type"]).lower())
+        
+        confidence = float(result["confidence"])
+        sentiment_confidence = float(result.get("sentiment_confidence", confidence))
+        if not (0.0 <= confidence <= 1.0 and 0.0 <= sentiment_confidence <= 1.0):
+            raise ValueError(f"Confidence out of range: {confidence}, {sentiment_confidence}")
+        
+        sentiment = str(result["sentiment"]).lower()
+        if sentiment not in ("positive", "negative", "neutral"):
+            raise ValueError(f"Invalid sentiment: {sentiment}")
+        
+        urgency = str(result["urgency"]).lower()
+        if urgency not in ("low", "medium", "high"):
+            raise ValueError(f"Invalid urgency: {urgency}")
+        
+        emotions = result.get("emotions") or []
+        if not isinstance(emotions, list):
+            raise ValueError(f"Invalid emotions: {emotions}")
+        
+        reply_text = str(result["reply"]).strip()
+        if not reply_text:
+            raise ValueError("Empty reply")
+        
+        return {
+            "comment_type": comment_type,
+            "classification": {
+                "confidence": confidence,
+                "reasoning": result.get("reasoning", ""),
+                "ai_classified": True,
+                "source": "llm",
+                "oneshot": True
+            },
+            "reply": self._build_reply_data(comment_text, reply_text, comment_type, platform),
+            "sentiment": {
+                "sentiment": sentiment,
+                "confidence": sentiment_confidence,
+                "emotions": [str(emotion) for emotion in emotions],
+                "urgency": urgency
             }
+        }
 
     def _detect_ghl_triggers(self, comment_text: str, reply_text: str) -> Dict:
         """Detect keywords that should trigger GHL workflows"""
@@ -244,10 +880,10 @@ class AIProcessor:
             "contact_fields": {}
         }
         
-        combined_text = (comment_text + " " + reply_text).lower()
+        matches = self.keyword_matcher.match(comment_text + " " + reply_text)
         
-        for trigger_type, keywords in self.engagement_keywords.items():
-            if any(keyword in combined_text for keyword in keywords):
+        for trigger_type in self.engagement_keywords:
+            if trigger_type in matches:
                 triggers["tags_to_add"].append(trigger_type)
                 
                 # Map to specific GHL workflows
@@ -282,9 +918,9 @@ class AIProcessor:
         
         return False
 
-    def generate_content(self, content_type: str, topic: str = None, series: str = None, 
-                        count: int = 1) -> List[Dict]:
-        """Generate content based on type (captions, devotionals, etc.)"""
+    def _content_request(self, content_type: str, topic: str = None, series: str = None,
+                         choices: int = 1) -> Dict:
+        """Build the chat-completion request for one or more pieces of generated content"""
         
         content_templates = {
             "social_caption": {
@@ -309,89 +945,189 @@ class AIProcessor:
             raise ValueError(f"Unsupported content type: {content_type}")
         
         template = content_templates[content_type]
-        generated_content = []
+        series_context = f" as part of the '{series}' series" if series else ""
         
-        try:
-            for i in range(count):
-                series_context = f" as part of the '{series}' series" if series else ""
-                
-                system_prompt = f"""
-                You are Ervin's content creator AI. Generate {content_type} that matches his brand:
-                
-                Brand Voice: {self.brand_voice['tone']}
-                Style: {self.brand_voice['style']}
-                Values: {', '.join(self.brand_voice['values'])}
-                
-                Make it authentic, inspiring, and actionable. Avoid generic motivational clichés.
-                """
-                
-                user_prompt = template["prompt"].format(
-                    topic=topic or "personal growth and faith",
-                    series=series_context
-                )
-                
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",  # ✅ supported by all accounts
-
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=0.8,
-                    max_tokens=template["max_tokens"]
+        system_prompt = f"""
+        You are Ervin's content creator AI. Generate {content_type} that matches his brand:
+        
+        Brand Voice: {self.brand_voice['tone']}
+        Style: {self.brand_voice['style']}
+        Values: {', '.join(self.brand_voice['values'])}
+        
+        Make it authentic, inspiring, and actionable. Avoid generic motivational clichés.
+        """
+        
+        user_prompt = template["prompt"].format(
+            topic=topic or "personal growth and faith",
+            series=series_context
+        )
+        
+        return {
+            "model": "gpt-3.5-turbo",  # ✅ supported by all accounts
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.8,
+            "max_tokens": template["max_tokens"],
+            # Several independent drafts from one request share the prompt tokens
+            "n": choices
+        }
+
+    def _generate_content_choices(self, request: Dict) -> List[str]:
+        """Run one content request and return the text of every choice"""
+        
+        response = self._complete(**request)
+        return [choice.message.content.strip() for choice in response.choices]
+
+    def generate_content_batch(self, content_requests: List[Dict]) -> List[List[Dict]]:
+        """Run several generate_content requests concurrently, keeping request order.
+        
+        Each entry holds generate_content keyword arguments. Failed calls and invalid
+        requests (e.g. an unsupported content type) are logged and skipped, so a request
+        may come back with fewer items (or none) without affecting the rest of the batch.
+        """
+        
+        # Split every request into calls of at most content_max_choices drafts, all sharing one pool
+        calls = []
+        for request_index, content_request in enumerate(content_requests):
+            count = content_request.get("count", 1)
+            for offset in range(0, count, self.content_max_choices):
+                choices = min(self.content_max_choices, count - offset)
+                try:
+                    request = self._content_request(
+                        content_request.get("content_type"), content_request.get("topic"),
+                        content_request.get("series"), choices
+                    )
+                except ValueError as e:
+                    logger.error(f"Skipping content request {request_index} in batch: {e}")
+                    break
+                calls.append((request_index, self.content_executor.submit(self._generate_content_choices, request)))
+        
+        generated_content = [[] for _ in content_requests]
+        for request_index, future in calls:
+            content_request = content_requests[request_index]
+            try:
+                texts = future.result()
+            except Exception as e:
+                logger.error(f"Content generation failed for {content_request.get('content_type')} "
+                             f"({content_request.get('topic')}): {e}")
+                continue
+            
+            for text in texts:
+                generated_content[request_index].append(
+                    self.build_content_item(content_request["content_type"], text, content_request.get("topic"),
+                                            content_request.get("series"), len(generated_content[request_index]))
                 )
+        
+        return generated_content
+
+    def build_content_item(self, content_type: str, text: str, topic: str = None, series: str = None,
+                           index: int = 0) -> Dict:
+        """Wrap generated text in a draft content record"""
+        
+        return {
+            "type": content_type,
+            "content": text,
+            "topic": topic,
+            "series": series,
+            "created_at": datetime.now().isoformat(),
+            "status": "draft",
+            "id": f"{content_type}_{datetime.now().timestamp()}_{index}"
+        }
+
+    def stream_content(self, content_type: str, topic: str = None, series: str = None) -> Iterator[str]:
+        """Streaming variant of generate_content that yields one piece of content as it is generated"""
+        
+        yield from self._stream_completion(self._content_request(content_type, topic, series))
+
+    def generate_content(self, content_type: str, topic: str = None, series: str = None, 
+                        count: int = 1) -> List[Dict]:
+        """Generate content based on type (captions, devotionals, etc.)"""
+        
+        # Validate up front so unsupported types raise instead of failing inside the pool
+        self._content_request(content_type, topic, series)
+        
+        generated_content = self.generate_content_batch([
+            {"content_type": content_type, "topic": topic, "series": series, "count": count}
+        ])[0]
+        
+        if count and not generated_content:
+            raise RuntimeError(f"Content generation failed for {content_type}")
+        
+        return generated_content
+
+    def _sentiment_request(self, text: str) -> Dict:
+        """Build the chat-completion request for sentiment analysis"""
+        
+        return {
+            "model": "gpt-3.5-turbo",
+            "messages": [{
+                "role": "user", 
+                "content": f"""Analyze the sentiment of this text and respond with JSON:
                 
-                content = {
-                    "type": content_type,
-                    "content": response.choices[0].message.content.strip(),
-                    "topic": topic,
-                    "series": series,
-                    "created_at": datetime.now().isoformat(),
-                    "status": "draft",
-                    "id": f"{content_type}_{datetime.now().timestamp()}_{i}"
-                }
-                
-                generated_content.append(content)
+                Text: "{text}"
                 
-        except Exception as e:
-            logger.error(f"Content generation failed: {e}")
-            raise
+                Response format: 
+                {{
+                    "sentiment": "positive/negative/neutral",
+                    "confidence": 0.0-1.0,
+                    "emotions": ["joy", "anger", "curiosity", etc.],
+                    "urgency": "low/medium/high"
+                }}
+                """
+            }],
+            "temperature": 0.6,
+            "max_tokens": 150
+        }
+
+    def _sentiment_fallback(self, error: Exception) -> Dict:
+        """Neutral sentiment used when analysis fails"""
         
-        return generated_content
+        return {
+            "sentiment": "neutral",
+            "confidence": 0.5,
+            "emotions": ["unknown"],
+            "urgency": "low",
+            "error": str(error)
+        }
 
     def analyze_sentiment(self, text: str) -> Dict:
         """Analyze sentiment of comment/message"""
         
+        cache_key = self.cache.make_key("sentiment", text, prompt_version=PROMPT_VERSION)
+        cached = self.cache.get(cache_key)
+        if cached:
+            return cached
+        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{
-                    "role": "user", 
-                    "content": f"""Analyze the sentiment of this text and respond with JSON:
-                    
-                    Text: "{text}"
-                    
-                    Response format: 
-                    {{
-                        "sentiment": "positive/negative/neutral",
-                        "confidence": 0.0-1.0,
-                        "emotions": ["joy", "anger", "curiosity", etc.],
-                        "urgency": "low/medium/high"
-                    }}
-                    """
-                }],
-                temperature=0.6,
-                max_tokens=150
-            )
+            response = self._complete(**self._sentiment_request(text))
             
-            return json.loads(response.choices[0].message.content)
+            sentiment_data = json.loads(response.choices[0].message.content)
+            self.cache.set(cache_key, sentiment_data)
+            return sentiment_data
             
         except Exception as e:
             logger.error(f"Sentiment analysis failed: {e}")
-            return {
-                "sentiment": "neutral",
-                "confidence": 0.5,
-                "emotions": ["unknown"],
-                "urgency": "low",
-                "error": str(e)
-            }
+            return self._sentiment_fallback(e)
+
+    async def aanalyze_sentiment(self, text: str) -> Dict:
+        """Async variant of analyze_sentiment; rate-limit errors are re-raised for back-pressure"""
+        
+        cache_key = self.cache.make_key("sentiment", text, prompt_version=PROMPT_VERSION)
+        cached = self.cache.get(cache_key)
+        if cached:
+            return cached
+        
+        try:
+            response = await self._acomplete(**self._sentiment_request(text))
+            
+            sentiment_data = json.loads(response.choices[0].message.content)
+            self.cache.set(cache_key, sentiment_data)
+            return sentiment_data
+            
+        except openai.RateLimitError:
+            raise
+        except Exception as e:
+            logger.error(f"Sentiment analysis failed: {e}")
+            return self._sentiment_fallback(e)
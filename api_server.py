@@ -1,8 +1,13 @@
-from fastapi import FastAPI, Body
+from fastapi import FastAPI, Body, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from .database_manager import DatabaseManager
 from .comment_processor import CommentProcessor
+from .event_bus import get_event_bus
+from typing import List, Optional
+from datetime import datetime
 import os
+import json
 
 app = FastAPI()
 db = DatabaseManager()
@@ -17,18 +22,22 @@ app.add_middleware(
 )
 
 @app.get("/comments")
-def get_comments(limit: int = 50):
-    comments = list(db.comments.find().sort("created_at", -1).limit(limit))
-    for c in comments:
-        c["_id"] = str(c["_id"])
-    return {"comments": comments}
+def get_comments(limit: int = Query(50, ge=1, le=200), platform: Optional[List[str]] = Query(None),
+                 comment_type: Optional[List[str]] = Query(None), status: Optional[List[str]] = Query(None),
+                 since: Optional[datetime] = None, until: Optional[datetime] = None, cursor: Optional[str] = None):
+    # Pass next_cursor back as cursor to get the following (older) page
+    try:
+        comments, next_cursor = db.get_comments_page(
+            platforms=platform, comment_types=comment_type, statuses=status,
+            time_range=(since, until) if since or until else None, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"comments": comments, "next_cursor": next_cursor}
 
 @app.get("/replies/pending")
-def get_pending_replies(limit: int = 50):
-    replies = list(db.replies.find({"status": "pending"}).sort("created_at", -1).limit(limit))
-    for r in replies:
-        r["_id"] = str(r["_id"])
-    return {"replies": replies}
+def get_pending_replies(limit: int = Query(50, ge=1, le=200)):
+    return {"replies": db.get_pending_replies(limit=limit)}
 
 @app.post("/reply/owner")
 def owner_reply(data: dict = Body(...)):
@@ -42,6 +51,144 @@ def owner_reply(data: dict = Body(...)):
     db.save_reply(reply_data)
     return {"status": "ok"}
 
+def _sse(chunks):
+    """Wrap text chunks as server-sent events, ending with a done event, or an error event if the stream fails"""
+    try:
+        for chunk in chunks:
+            yield f"data: {json.dumps({'text': chunk})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+@app.get("/stream/content")
+def stream_content(content_type: str, topic: str = None, series: str = None):
+    chunks = comment_processor.ai_processor.stream_content(content_type, topic=topic, series=series)
+    return StreamingResponse(_sse(chunks), media_type="text/event-stream")
+
+@app.post("/stream/reply")
+def stream_reply(data: dict = Body(...)):
+    chunks = comment_processor.stream_reply(
+        data["comment_text"], data.get("platform", "test"), data.get("post_context")
+    )
+    return StreamingResponse(_sse(chunks), media_type="text/event-stream")
+
+@app.on_event("startup")
+def start_event_bus():
+    get_event_bus()
+
+@app.on_event("shutdown")
+def stop_event_bus():
+    get_event_bus().stop()
+
+async def _live_events(last_event_id: int):
+    """Server-sent events for each comment/reply delta, with keepalives while idle"""
+    bus = get_event_bus()
+    while True:
+        # Waits on the event loop, so idle clients don't each hold a threadpool thread
+        events, last_event_id = await bus.await_events(last_event_id, timeout=15)
+        if not events:
+            yield ": keepalive\n\n"
+        for event in events:
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+@app.get("/events")
+def stream_events(since: Optional[int] = None, last_event_id: Optional[str] = Header(None)):
+    # Reconnecting EventSource clients send Last-Event-ID and resume from the buffer
+    try:
+        start = int(last_event_id) if last_event_id else since
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID header")
+    if start is None:
+        start = get_event_bus().latest_id()
+    return StreamingResponse(_live_events(start), media_type="text/event-stream")
+
+@app.websocket("/ws/events")
+async def websocket_events(websocket: WebSocket, since: Optional[int] = None):
+    await websocket.accept()
+    bus = get_event_bus()
+    last_event_id = since if since is not None else bus.latest_id()
+    try:
+        while True:
+            events, last_event_id = await bus.await_events(last_event_id, 15)
+            # Keepalives double as disconnect detection while idle
+            for event in events or [{"type": "keepalive", "id": last_event_id}]:
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+
+@app.get("/health/events")
+def get_event_bus_status():
+    return {"events": get_event_bus().get_status()}
+
+@app.get("/analytics/summary")
+def get_analytics_summary(days: int = Query(30, ge=1, le=365)):
+    return db.get_analytics_summary(days=days)
+
+@app.post("/analytics/refresh")
+def refresh_analytics():
+    return {"hours_refreshed": db.refresh_analytics_rollups()}
+
+@app.get("/health/db")
+def get_db_pool_stats():
+    return {"pool": db.get_pool_stats()}
+
+@app.get("/health/queue")
+def get_queue_stats():
+    return {"queue": db.get_comment_job_stats()}
+
+@app.get("/health/workers")
+def get_worker_leases():
+    return {"leases": db.get_leases()}
+
+def _published_by_workers(prefix: str) -> dict:
+    """Status each worker published under '<prefix><worker id>', keyed by worker id"""
+    published = db.get_settings_like(prefix)
+    return {key.split(":", 1)[1]: json.loads(value) for key, value in published.items()}
+
+def _sum_counters(stats: list, keys: tuple) -> dict:
+    return {key: sum(entry.get(key, 0) for entry in stats) for key in keys}
+
+@app.get("/health/rate-limits")
+def get_rate_limits():
+    # Each worker publishes its limiter state after every fetch cycle
+    return {"workers": _published_by_workers("rate_limits:")}
+
+@app.get("/health/circuits")
+def get_circuits():
+    # Each worker publishes its breaker states after every fetch cycle
+    return {"workers": _published_by_workers("circuits:")}
+
+@app.post("/jobs/requeue-dead")
+def requeue_dead_jobs():
+    return {"requeued": db.requeue_dead_comment_jobs()}
+
+@app.get("/health/llm-cache")
+def get_llm_cache_stats():
+    # The workers do the LLM calls; this process only serves the API's own requests
+    workers = _published_by_workers("llm_cache:")
+    api = comment_processor.ai_processor.cache.get_stats()
+    total = _sum_counters([api, *workers.values()], ("hits", "disk_hits", "misses", "writes", "evictions", "expired"))
+    lookups = total["hits"] + total["misses"]
+    total["hit_rate"] = total["hits"] / lookups if lookups else 0.0
+    return {"cache": total, "workers": workers, "api": api}
+
+@app.get("/health/local-classifier")
+def get_local_classifier_stats():
+    workers = _published_by_workers("local_classifier:")
+    api = comment_processor.ai_processor.local_classifier.get_stats()
+    total = _sum_counters([api, *workers.values()], ("rule_hits", "model_hits", "deferred", "llm_calls_saved"))
+    return {"classifier": total, "workers": workers, "api": api}
+
+@app.get("/settings/keywords")
+def get_keyword_sets():
+    return {"keyword_sets": comment_processor.ai_processor.keyword_matcher.keyword_sets}
+
+@app.post("/settings/keywords")
+def set_keyword_sets(data: dict = Body(...)):
+    db.set_setting("keyword_sets", json.dumps(data["keyword_sets"]))
+    comment_processor.ai_processor.reload_keywords(db)
+    return {"status": "ok"}
+
 @app.post("/owner/activity")
 def set_owner_activity(data: dict = Body(...)):
     db.set_owner_activity(data.get("active", False))
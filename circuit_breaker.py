@@ -0,0 +1,110 @@
+# circuit_breaker.py - Circuit breakers for failing platforms and LLM providers
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = None, base_backoff: float = None,
+                 max_backoff: float = None, jitter: float = 0.2):
+        """Initialize a closed circuit that opens after failure_threshold consecutive failures"""
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+        self.base_backoff = base_backoff or float(os.getenv("CIRCUIT_BASE_BACKOFF_SECONDS", "30"))
+        self.max_backoff = max_backoff or float(os.getenv("CIRCUIT_MAX_BACKOFF_SECONDS", "1800"))
+        self.jitter = jitter
+
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.consecutive_opens = 0  # drives the exponential backoff, reset once a trial succeeds
+        self.open_until = 0.0
+        self.last_error = None
+        self._trial_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Whether a call may go ahead; once the backoff expires a single trial call is let through"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() >= self.open_until:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+                logger.info(f"Circuit {self.name} half-open, allowing a trial call")
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """Whether calls are currently being short-circuited (does not claim the trial call)"""
+        with self._lock:
+            return self.state == OPEN and time.time() < self.open_until
+
+    def record_success(self):
+        """Close the circuit after a successful call"""
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit {self.name} closed after successful trial")
+            self.state = CLOSED
+            self.failures = 0
+            self.consecutive_opens = 0
+            self._trial_in_flight = False
+
+    def record_failure(self, error: Exception = None):
+        """Count a failure, opening the circuit with jittered exponential backoff when needed"""
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error else None
+            self._trial_in_flight = False
+
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                backoff = min(self.base_backoff * 2 ** self.consecutive_opens, self.max_backoff)
+                backoff *= 1 + random.uniform(-self.jitter, self.jitter)
+                self.state = OPEN
+                self.open_until = time.time() + backoff
+                self.consecutive_opens += 1
+                logger.error(f"Circuit {self.name} open for {backoff:.0f}s after {self.failures} failures: {error}")
+
+    def get_status(self) -> Dict:
+        """Get state, failure count and time until the next trial"""
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "consecutive_opens": self.consecutive_opens,
+                "retry_in": max(0.0, round(self.open_until - time.time(), 1)) if self.state == OPEN else 0.0,
+                "last_error": self.last_error
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Get the process-wide breaker for a dependency such as 'platform:youtube' or 'llm:openai'"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def get_all_statuses() -> Dict[str, Dict]:
+    """Get the status of every breaker created in this process"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.get_status() for name, breaker in breakers.items()}
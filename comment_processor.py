@@ -1,8 +1,10 @@
-from .ai_core import AIProcessor
+from .ai_core import AIProcessor, CommentType
 from .ghl_integration import GHLIntegrator
-from typing import Dict, List
+from .circuit_breaker import CircuitOpenError
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 import logging
+import asyncio
 import openai
 import os
 from . import facebook_integration, instagram_integration, youtube_integration, linkedin_integration, twitter_integration
@@ -12,13 +14,19 @@ from .database_manager import DatabaseManager  # Add the DatabaseManager import
 logger = logging.getLogger(__name__)
 
 class CommentProcessor:
-    def __init__(self, openai_api_key: str, ghl_api_key: str = None, db: DatabaseManager = None):
+    def __init__(self, openai_api_key: str, ghl_api_key: str = None, db: DatabaseManager = None,
+                 oneshot_analysis: bool = None):
         """Initialize comment processor with AI, GHL integration, and database manager"""
         self.ai_processor = AIProcessor(openai_api_key)
         self.ghl_integrator = GHLIntegrator(ghl_api_key)
         self.db = db  # Pass the database manager instance to store data
         openai.api_key = openai_api_key  # Set the API key directly
 
+        # One-shot mode fuses classify + reply + sentiment into a single LLM call
+        if oneshot_analysis is None:
+            oneshot_analysis = os.getenv("AI_ONESHOT_ANALYSIS", "false").lower() in ("1", "true", "yes")
+        self.oneshot_analysis = oneshot_analysis
+
     def generate_reply(self, comment_text):
         # Simple OpenAI completion example (adjust as needed)
         response = openai.ChatCompletion.create(
@@ -32,75 +40,227 @@ class CommentProcessor:
         )
         return response.choices[0].message['content'].strip()
 
-    def process_comment(self, comment_data: Dict) -> Dict:
-        """Main workflow to process incoming comments"""
-        try:
-            # Extract comment information
-            comment_text = comment_data["text"]
-            platform = comment_data["platform"]
-            commenter_info = comment_data.get("commenter", {})
-            post_context = comment_data.get("post_context")
+    def stream_reply(self, comment_text: str, platform: str = "test", post_context: str = None) -> Iterator[str]:
+        """Classify a comment, then yield its reply text as it is generated"""
+        comment_type, _ = self.ai_processor.classify_comment(comment_text, platform)
+        yield from self.ai_processor.stream_reply(comment_text, comment_type, platform, post_context)
+
+    def _precomputed_classification(self, comment_data: Dict) -> Optional[Tuple]:
+        """Classification already attached by a batched classify_comments call, if usable"""
+        classification = comment_data.get("classification")
+        if not classification or classification.get("metadata", {}).get("source") == "fallback":
+            return None
+        return CommentType(classification["type"]), classification.get("metadata", {})
+
+    def _analyze_comment(self, comment_text: str, platform: str, post_context: str = None,
+                         classification: Tuple = None) -> Tuple:
+        """Run the AI steps, using one fused call when enabled and three calls otherwise"""
+        # Step 1: Classify comment, unless it was already classified in a batch
+        if not classification and self.oneshot_analysis:
+            # Keywords, the local classifier and the cache settle many comments without the fused call
+            classification = self.ai_processor.quick_classification(comment_text, platform)
+        
+        if classification:
+            comment_type, classification_meta = classification
+        else:
+            if self.oneshot_analysis:
+                analysis = self.ai_processor.analyze_comment(comment_text, platform, post_context)
+                if analysis:
+                    return analysis["comment_type"], analysis["classification"], analysis["reply"], analysis["sentiment"]
 
-            # Step 1: Classify comment
             comment_type, classification_meta = self.ai_processor.classify_comment(comment_text, platform)
 
-            # Step 2: Generate reply
-            reply_data = self.ai_processor.generate_reply(comment_text, comment_type, platform, post_context)
+        # Step 2: Generate reply
+        reply_data = self.ai_processor.generate_reply(comment_text, comment_type, platform, post_context)
 
-            # Step 3: Analyze sentiment
-            sentiment_data = self.ai_processor.analyze_sentiment(comment_text)
+        # Step 3: Analyze sentiment
+        sentiment_data = self.ai_processor.analyze_sentiment(comment_text)
 
-            # Step 4: Handle GHL integration if needed
-            ghl_response = None
-            if reply_data.get("ghl_triggers", {}).get("workflows_to_trigger"):
-                # Create and update contact
-                contact_data = {
-                    "name": commenter_info.get("name", "Unknown"),
-                    "email": commenter_info.get("email"),
-                    "phone": commenter_info.get("phone"),
-                    "platform": platform,
-                    "tags": reply_data["ghl_triggers"]["tags_to_add"],
+        return comment_type, classification_meta, reply_data, sentiment_data
+
+    async def _aanalyze_comment(self, comment_text: str, platform: str, post_context: str = None,
+                                classification: Tuple = None) -> Tuple:
+        """Async variant of _analyze_comment built on the async OpenAI client"""
+        if not classification and self.oneshot_analysis:
+            classification = self.ai_processor.quick_classification(comment_text, platform)
+        
+        if classification:
+            comment_type, classification_meta = classification
+        else:
+            if self.oneshot_analysis:
+                analysis = await self.ai_processor.aanalyze_comment(comment_text, platform, post_context)
+                if analysis:
+                    return analysis["comment_type"], analysis["classification"], analysis["reply"], analysis["sentiment"]
+
+            comment_type, classification_meta = await self.ai_processor.aclassify_comment(comment_text, platform)
+
+        # Reply and sentiment only depend on the classification, so run them together
+        reply_data, sentiment_data = await asyncio.gather(
+            self.ai_processor.agenerate_reply(comment_text, comment_type, platform, post_context),
+            self.ai_processor.aanalyze_sentiment(comment_text)
+        )
+
+        return comment_type, classification_meta, reply_data, sentiment_data
+
+    def process_comment(self, comment_data: Dict, should_finalize: Callable[[Dict], bool] = None) -> Dict:
+        """Main workflow to process incoming comments.
+        
+        should_finalize is checked after the AI steps; when it returns False the GHL and
+        database side effects are skipped (e.g. another worker took over the comment's job).
+        """
+        try:
+            self._check_llm_circuit()
+            
+            # Steps 1-3: Classify comment, generate reply and analyze sentiment
+            analysis = self._analyze_comment(
+                comment_data["text"], comment_data["platform"], comment_data.get("post_context"),
+                self._precomputed_classification(comment_data)
+            )
+
+            if should_finalize and not should_finalize(comment_data):
+                return self._skipped_result(comment_data)
+            return self._finalize_comment(comment_data, *analysis)
+
+        except Exception as e:
+            logger.error(f"Comment processing failed: {e}")
+            return self._error_result(comment_data, e)
+
+    async def aprocess_comment(self, comment_data: Dict, should_finalize: Callable[[Dict], bool] = None) -> Dict:
+        """Async variant of process_comment; rate-limit errors are re-raised for back-pressure"""
+        try:
+            self._check_llm_circuit()
+            
+            analysis = await self._aanalyze_comment(
+                comment_data["text"], comment_data["platform"], comment_data.get("post_context"),
+                self._precomputed_classification(comment_data)
+            )
+
+            if should_finalize and not should_finalize(comment_data):
+                return self._skipped_result(comment_data)
+
+            # GHL and database calls are blocking, keep them off the event loop
+            return await asyncio.to_thread(self._finalize_comment, comment_data, *analysis)
+
+        except openai.RateLimitError:
+            raise
+        except Exception as e:
+            logger.error(f"Comment processing failed: {e}")
+            return self._error_result(comment_data, e)
+
+    def _check_llm_circuit(self):
+        """Fail fast while the LLM provider is down, rather than saving canned fallback replies"""
+        if self.ai_processor.llm_breaker.is_open():
+            raise CircuitOpenError("LLM provider circuit is open")
+
+    def _finalize_comment(self, comment_data: Dict, comment_type, classification_meta: Dict,
+                          reply_data: Dict, sentiment_data: Dict) -> Dict:
+        """Run GHL integration and persist the processed comment.
+        
+        For a queued comment (one with a job_id) the GHL calls are only prepared here, as
+        comment_data["ghl_request"]; the scheduler runs them once the job has completed.
+        """
+        comment_text = comment_data["text"]
+        platform = comment_data["platform"]
+        commenter_info = comment_data.get("commenter", {})
+
+        # Step 4: Handle GHL integration if needed
+        ghl_response = None
+        if reply_data.get("ghl_triggers", {}).get("workflows_to_trigger"):
+            # Create and update contact
+            contact_data = {
+                "name": commenter_info.get("name", "Unknown"),
+                "email": commenter_info.get("email"),
+                "phone": commenter_info.get("phone"),
+                "platform": platform,
+                "tags": reply_data["ghl_triggers"]["tags_to_add"],
+                "comment_text": comment_text,
+                "custom_fields": {
+                    "comment_sentiment": sentiment_data["sentiment"],
+                    "comment_type": comment_type.value,
+                    "engagement_platform": platform
+                }
+            }
+
+            comment_data["ghl_request"] = {
+                "contact": contact_data,
+                "workflows": reply_data["ghl_triggers"]["workflows_to_trigger"],
+                "workflow_data": {
                     "comment_text": comment_text,
-                    "custom_fields": {
-                        "comment_sentiment": sentiment_data["sentiment"],
-                        "comment_type": comment_type.value,
-                        "engagement_platform": platform
-                    }
+                    "platform": platform,
+                    "sentiment": sentiment_data["sentiment"]
                 }
+            }
+            if comment_data.get("job_id") is None:
+                ghl_response = self.run_ghl_integration(comment_data)
 
-                contact_result = self.ghl_integrator.create_or_update_contact(contact_data)
-
-                if contact_result["success"]:
-                    # Trigger workflows
-                    for workflow in reply_data["ghl_triggers"]["workflows_to_trigger"]:
-                        self.ghl_integrator.trigger_workflow(workflow, contact_result["contact_id"], {
-                            "comment_text": comment_text,
-                            "platform": platform,
-                            "sentiment": sentiment_data["sentiment"]
-                        })
-
-                ghl_response = contact_result
-
-            # Save processed comment to database
-            comment_data["classification"] = {"type": comment_type.value, "metadata": classification_meta}
-            comment_data["reply"] = reply_data["reply"]
-            comment_data["sentiment"] = sentiment_data
-            comment_data["ghl_integration"] = ghl_response
-            comment_data["processing_timestamp"] = datetime.now().isoformat()
-            comment_data["status"] = "processed"
-            comment_data["needs_approval"] = reply_data.get("needs_approval", False)
-
-            # Save to the database
+        # Save processed comment to database
+        comment_data["classification"] = {"type": comment_type.value, "metadata": classification_meta}
+        comment_data["reply"] = reply_data["reply"]
+        comment_data["reply_data"] = reply_data
+        comment_data["sentiment"] = sentiment_data
+        comment_data["ghl_integration"] = ghl_response
+        comment_data["processing_timestamp"] = datetime.now().isoformat()
+        comment_data["status"] = "processed"
+        comment_data["needs_approval"] = reply_data.get("needs_approval", False)
+
+        # Save to the database
+        if self.db:
             self.db.save_comment(comment_data)
 
-            logger.info(f"Successfully processed and saved comment: {comment_data.get('id')}")
-            return comment_data
+        logger.info(f"Successfully processed and saved comment: {comment_data.get('id')}")
+        return comment_data
+
+    def run_ghl_integration(self, comment_data: Dict) -> Optional[Dict]:
+        """Create/update the GHL contact and trigger workflows prepared for a comment, at most once.
+        
+        The sync is claimed in the database first, so a comment processed again (a retried job,
+        a second worker) does not upsert the contact or fire its workflows a second time.
+        """
+        ghl_request = comment_data.get("ghl_request")
+        if not ghl_request:
+            return None
+
+        comment_id = comment_data.get("comment_id")
+        if self.db and comment_id is not None and not self.db.claim_ghl_sync(comment_id):
+            logger.info(f"GHL sync for comment {comment_id} already ran, skipping")
+            return None
+
+        contact_result = {"success": False}
+        try:
+            contact_result = self.ghl_integrator.create_or_update_contact(ghl_request["contact"])
 
+            if contact_result["success"]:
+                # Trigger workflows
+                for workflow in ghl_request["workflows"]:
+                    self.ghl_integrator.trigger_workflow(workflow, contact_result["contact_id"],
+                                                         ghl_request["workflow_data"])
         except Exception as e:
-            logger.error(f"Comment processing failed: {e}")
-            return {
-                "status": "error",
-                "error": str(e),
-                "original_comment": comment_data.get("text", ""),
-                "platform": comment_data.get("platform", "")
-            }
+            logger.error(f"GHL integration failed for comment {comment_data.get('id')}: {e}")
+            contact_result = {"success": False, "error": str(e)}
+
+        if self.db and comment_id is not None:
+            try:
+                self.db.finish_ghl_sync(comment_id, "done" if contact_result["success"] else "failed",
+                                        contact_result.get("contact_id"))
+            except Exception:
+                pass  # The claim alone already keeps the sync from running twice
+        comment_data["ghl_integration"] = contact_result
+        return contact_result
+
+    def _skipped_result(self, comment_data: Dict) -> Dict:
+        """Build the result returned when a comment's side effects were skipped"""
+        logger.info(f"Skipping side effects for comment {comment_data.get('id')}")
+        return {
+            "status": "skipped",
+            "original_comment": comment_data.get("text", ""),
+            "platform": comment_data.get("platform", "")
+        }
+
+    def _error_result(self, comment_data: Dict, error: Exception) -> Dict:
+        """Build the result returned when processing a comment fails"""
+        return {
+            "status": "error",
+            "error": str(error),
+            "original_comment": comment_data.get("text", ""),
+            "platform": comment_data.get("platform", "")
+        }
@@ -1,5 +1,8 @@
 from .ai_core import AIProcessor
 from typing import List, Dict
+import logging
+
+logger = logging.getLogger(__name__)
 
 # content_manager.py - Content generation and management
 class ContentManager:
@@ -10,11 +13,14 @@ class ContentManager:
     def bulk_generate_captions(self, topics: List[str], series: str = None) -> List[Dict]:
         """Generate multiple social media captions"""
         
+        # All topics are generated concurrently; results stay in topic order
+        captions_per_topic = self.ai_processor.generate_content_batch([
+            {"content_type": "social_caption", "topic": topic, "series": series, "count": 3}
+            for topic in topics
+        ])
+        
         all_captions = []
-        for topic in topics:
-            captions = self.ai_processor.generate_content(
-                "social_caption", topic=topic, series=series, count=3
-            )
+        for captions in captions_per_topic:
             all_captions.extend(captions)
         
         return all_captions
@@ -36,11 +42,16 @@ class ContentManager:
     def generate_hashtag_library(self, categories: List[str]) -> Dict:
         """Generate hashtag sets for different content categories"""
         
+        hashtag_sets = self.ai_processor.generate_content_batch([
+            {"content_type": "hashtag_set", "topic": category, "count": 1}
+            for category in categories
+        ])
+        
         hashtag_library = {}
-        for category in categories:
-            hashtags = self.ai_processor.generate_content(
-                "hashtag_set", topic=category, count=1
-            )
+        for category, hashtags in zip(categories, hashtag_sets):
+            if not hashtags:
+                logger.warning(f"No hashtags generated for category: {category}")
+                continue
             hashtag_library[category] = hashtags[0]["content"]
         
         return hashtag_library
@@ -1,98 +1,605 @@
 import psycopg2
-from psycopg2 import sql
+from psycopg2 import sql, pool
+from psycopg2.extras import execute_values
 import logging
-from typing import Dict, List, Optional
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
 import os
+import json
+from datetime import datetime, timedelta
+
+from .event_bus import EVENT_CHANNEL
 
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
-    def __init__(self, connection_string: str = None, database_name: str = "karibvaiengageflowai"):
-        """Initialize PostgreSQL connection"""
+    def __init__(self, connection_string: str = None, database_name: str = "karibvaiengageflowai",
+                 pool_size: int = None, min_pool_size: int = None, pool_timeout: float = None):
+        """Initialize PostgreSQL connection pool"""
         self.connection_string = connection_string or os.getenv("POSTGRES_URL")
         self.database_name = database_name
 
+        # Pool settings; a pool_size of 1 serializes all queries like a single shared connection
+        self.pool_size = pool_size or int(os.getenv("POSTGRES_POOL_SIZE", "10"))
+        self.min_pool_size = min(min_pool_size or int(os.getenv("POSTGRES_POOL_MIN_SIZE", "1")), self.pool_size)
+        self.pool_timeout = pool_timeout or float(os.getenv("POSTGRES_POOL_TIMEOUT", "30"))
+
+        # ThreadedConnectionPool raises instead of waiting when exhausted, so slots are gated here
+        self._pool_slots = threading.BoundedSemaphore(self.pool_size)
+        self._stats_lock = threading.Lock()
+        self._pool_stats = {
+            "checked_out": 0,
+            "waiting": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+            "total_wait_time": 0.0,
+            "max_wait_time": 0.0
+        }
+
         try:
-            # Establish PostgreSQL connection
-            self.connection = psycopg2.connect(self.connection_string)
-            self.cursor = self.connection.cursor()
-            logger.info("PostgreSQL connection established")
+            # Establish PostgreSQL connection pool
+            self.pool = pool.ThreadedConnectionPool(self.min_pool_size, self.pool_size, self.connection_string)
+            logger.info(f"PostgreSQL connection pool established (size {self.pool_size})")
             # Create tables if they don't exist
             self._setup_tables()
         except Exception as e:
             logger.error(f"Failed to connect to PostgreSQL: {e}")
             raise
 
+    def _checkout(self):
+        """Borrow a connection from the pool, waiting up to pool_timeout"""
+        start = time.monotonic()
+        with self._stats_lock:
+            self._pool_stats["waiting"] += 1
+
+        acquired = self._pool_slots.acquire(timeout=self.pool_timeout)
+        waited = time.monotonic() - start
+
+        with self._stats_lock:
+            self._pool_stats["waiting"] -= 1
+            self._pool_stats["total_wait_time"] += waited
+            self._pool_stats["max_wait_time"] = max(self._pool_stats["max_wait_time"], waited)
+            if not acquired:
+                self._pool_stats["timeouts"] += 1
+
+        if not acquired:
+            raise TimeoutError(f"Timed out after {self.pool_timeout}s waiting for a database connection")
+
+        try:
+            connection = self.pool.getconn()
+        except Exception:
+            self._pool_slots.release()
+            raise
+
+        with self._stats_lock:
+            self._pool_stats["checked_out"] += 1
+            self._pool_stats["checkouts"] += 1
+        return connection
+
+    def _checkin(self, connection):
+        """Return a connection to the pool, discarding it if it was closed"""
+        try:
+            self.pool.putconn(connection, close=bool(connection.closed))
+        finally:
+            with self._stats_lock:
+                self._pool_stats["checked_out"] -= 1
+            self._pool_slots.release()
+
+    @contextmanager
+    def transaction(self):
+        """Yield a cursor on a pooled connection; commits on success and rolls back on error"""
+        connection = self._checkout()
+        try:
+            with connection.cursor() as cursor:
+                yield cursor
+            connection.commit()
+        except Exception:
+            if not connection.closed:
+                connection.rollback()
+            raise
+        finally:
+            self._checkin(connection)
+
+    def get_pool_stats(self) -> Dict:
+        """Get connection pool usage statistics"""
+        with self._stats_lock:
+            stats = dict(self._pool_stats)
+        stats["pool_size"] = self.pool_size
+        stats["avg_wait_time"] = stats["total_wait_time"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        return stats
+
+    def close(self):
+        """Close every pooled connection"""
+        self.pool.closeall()
+        logger.info("PostgreSQL connection pool closed")
+
     def _setup_tables(self):
         """Setup tables for comments, replies, content, and settings"""
         try:
-            # Create comments table
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS comments (
-                    comment_id SERIAL PRIMARY KEY,
-                    platform VARCHAR(255) NOT NULL,
-                    text TEXT,
-                    author VARCHAR(255),
-                    status VARCHAR(50),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            
-            # Create replies table
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS replies (
-                    reply_id SERIAL PRIMARY KEY,
-                    comment_id INTEGER REFERENCES comments(comment_id),
-                    reply TEXT,
-                    status VARCHAR(50),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            
-            # Create generated content table
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS generated_content (
-                    content_id SERIAL PRIMARY KEY,
-                    content_type VARCHAR(255),
-                    content TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-
-            # Create settings table
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS settings (
-                    setting_key VARCHAR(255) PRIMARY KEY,
-                    setting_value TEXT
-                );
-            """)
-            
-            # Commit the changes
-            self.connection.commit()
+            with self.transaction() as cursor:
+                # Create comments table
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS comments (
+                        comment_id SERIAL PRIMARY KEY,
+                        platform VARCHAR(255) NOT NULL,
+                        text TEXT,
+                        author VARCHAR(255),
+                        status VARCHAR(50),
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
+                
+                # Native platform id (YouTube thread id, Facebook comment id, tweet id) for idempotent upserts
+                cursor.execute("""
+                    ALTER TABLE comments ADD COLUMN IF NOT EXISTS external_id VARCHAR(255);
+                """)
+                cursor.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_comments_platform_external_id
+                    ON comments (platform, external_id);
+                """)
+                
+                # Classification label and where it came from (keyword, local, llm, fallback, manual)
+                cursor.execute("""
+                    ALTER TABLE comments ADD COLUMN IF NOT EXISTS comment_type VARCHAR(50);
+                """)
+                cursor.execute("""
+                    ALTER TABLE comments ADD COLUMN IF NOT EXISTS classification_source VARCHAR(50);
+                """)
+                
+                # Create replies table
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS replies (
+                        reply_id SERIAL PRIMARY KEY,
+                        comment_id INTEGER REFERENCES comments(comment_id),
+                        reply TEXT,
+                        status VARCHAR(50),
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
+                
+                # Keyset pagination walks these newest-first, per platform or per status
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_comments_created_at ON comments (created_at, comment_id);
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_comments_platform_created_at
+                    ON comments (platform, created_at, comment_id);
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_comments_status_created_at
+                    ON comments (status, created_at, comment_id);
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_replies_comment_id ON replies (comment_id);
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_replies_status_created_at
+                    ON replies (status, created_at, reply_id);
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_replies_created_at ON replies (created_at);
+                """)
+                
+                # Last change that matters to analytics (insert, classification, reply status), so
+                # refresh_analytics_rollups finds the hours to recompute however late the change came
+                for table in ("comments", "replies"):
+                    cursor.execute(f"""
+                        ALTER TABLE {table} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+                    """)
+                    cursor.execute(f"""
+                        CREATE INDEX IF NOT EXISTS idx_{table}_updated_at ON {table} (updated_at);
+                    """)
+                
+                # Analytics rollups per comment hour/day, platform and type, kept current by refresh_analytics_rollups
+                for table, bucket_type in (("analytics_hourly", "TIMESTAMP"), ("analytics_daily", "DATE")):
+                    cursor.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {table} (
+                            bucket {bucket_type} NOT NULL,
+                            platform VARCHAR(255) NOT NULL,
+                            comment_type VARCHAR(50) NOT NULL,
+                            comments INTEGER NOT NULL DEFAULT 0,
+                            replied_comments INTEGER NOT NULL DEFAULT 0,
+                            replies INTEGER NOT NULL DEFAULT 0,
+                            auto_approved INTEGER NOT NULL DEFAULT 0,
+                            response_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+                            PRIMARY KEY (bucket, platform, comment_type)
+                        );
+                    """)
+                
+                # Create generated content table
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS generated_content (
+                        content_id SERIAL PRIMARY KEY,
+                        content_type VARCHAR(255),
+                        content TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
+
+                # Create settings table
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS settings (
+                        setting_key VARCHAR(255) PRIMARY KEY,
+                        setting_value TEXT
+                    );
+                """)
+                
+                # Per-platform, per-post fetch cursors; post_id '' holds the platform-wide last check time
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS fetch_cursors (
+                        platform VARCHAR(255) NOT NULL,
+                        post_id VARCHAR(255) NOT NULL,
+                        last_seen_at TIMESTAMPTZ,
+                        last_seen_id VARCHAR(255),
+                        page_token TEXT,
+                        pending_seen_at TIMESTAMPTZ,
+                        updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (platform, post_id)
+                    );
+                """)
+                # Id of the newest item seen while older pages are still being drained
+                cursor.execute("""
+                    ALTER TABLE fetch_cursors ADD COLUMN IF NOT EXISTS pending_seen_id VARCHAR(255);
+                """)
+            
+                # Durable work queue between comment ingestion and AI processing
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS comment_jobs (
+                        job_id BIGSERIAL PRIMARY KEY,
+                        comment_id INTEGER UNIQUE REFERENCES comments(comment_id),
+                        payload JSONB NOT NULL,
+                        status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        max_attempts INTEGER NOT NULL DEFAULT 5,
+                        available_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        locked_by VARCHAR(255),
+                        locked_until TIMESTAMPTZ,
+                        last_error TEXT,
+                        created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_comment_jobs_status_available
+                    ON comment_jobs (status, available_at);
+                """)
+            
+                # One row per comment whose GHL contact/workflows were run, so a retried job never repeats them
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS ghl_syncs (
+                        comment_id INTEGER PRIMARY KEY REFERENCES comments(comment_id),
+                        status VARCHAR(20) NOT NULL DEFAULT 'running',
+                        contact_id VARCHAR(255),
+                        created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
+            
+                # Cluster-wide leases so periodic work (e.g. a platform fetch) runs on one worker at a time
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS leases (
+                        lease_name VARCHAR(255) PRIMARY KEY,
+                        holder VARCHAR(255) NOT NULL,
+                        expires_at TIMESTAMPTZ NOT NULL
+                    );
+                """)
+            
+                # Daily API quota units spent by every worker process, keyed by the provider's quota day
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS api_quota_usage (
+                        api_name VARCHAR(50) NOT NULL,
+                        quota_day DATE NOT NULL,
+                        units_used INTEGER NOT NULL DEFAULT 0,
+                        updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (api_name, quota_day)
+                    );
+                """)
+            
+                # New comments/replies and status changes are pushed to LISTEN clients as small deltas
+                cursor.execute("""
+                    CREATE OR REPLACE FUNCTION notify_dashboard_event() RETURNS trigger AS $$
+                    DECLARE
+                        payload JSON;
+                    BEGIN
+                        IF TG_TABLE_NAME = 'comments' THEN
+                            payload := json_build_object(
+                                'type', CASE WHEN TG_OP = 'INSERT' THEN 'new_comment' ELSE 'comment_updated' END,
+                                'comment_id', NEW.comment_id, 'platform', NEW.platform, 'author', NEW.author,
+                                'text', left(NEW.text, 500), 'status', NEW.status,
+                                'comment_type', NEW.comment_type, 'created_at', NEW.created_at
+                            );
+                        ELSE
+                            payload := json_build_object(
+                                'type', CASE WHEN TG_OP = 'INSERT' THEN 'new_reply' ELSE 'reply_updated' END,
+                                'reply_id', NEW.reply_id, 'comment_id', NEW.comment_id,
+                                'reply', left(NEW.reply, 500), 'status', NEW.status, 'created_at', NEW.created_at
+                            );
+                        END IF;
+                        PERFORM pg_notify(TG_ARGV[0], payload::text);
+                        RETURN NEW;
+                    END;
+                    $$ LANGUAGE plpgsql;
+                """)
+                # Re-fetched comments are upserted unchanged every cycle, so updates only notify on real changes
+                triggers = [
+                    ("comments_notify_insert", "INSERT", "comments", ""),
+                    ("comments_notify_update", "UPDATE", "comments",
+                     "WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.comment_type IS DISTINCT FROM NEW.comment_type)"),
+                    ("replies_notify_insert", "INSERT", "replies", ""),
+                    ("replies_notify_update", "UPDATE", "replies", "WHEN (OLD.status IS DISTINCT FROM NEW.status)")
+                ]
+                for trigger_name, event, table, condition in triggers:
+                    cursor.execute("SELECT 1 FROM pg_trigger WHERE tgname = %s;", (trigger_name,))
+                    if cursor.fetchone() is None:
+                        cursor.execute(
+                            f"CREATE TRIGGER {trigger_name} AFTER {event} ON {table} FOR EACH ROW {condition} "
+                            f"EXECUTE FUNCTION notify_dashboard_event('{EVENT_CHANNEL}');"
+                        )
+                
+                # Stamp updated_at on every writer (classification, auto-approval, dashboard approve/reject),
+                # but not on the unchanged upserts of re-fetched comments
+                cursor.execute("""
+                    CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+                    BEGIN
+                        NEW.updated_at := CURRENT_TIMESTAMP;
+                        RETURN NEW;
+                    END;
+                    $$ LANGUAGE plpgsql;
+                """)
+                touch_triggers = [
+                    ("comments_touch_updated_at", "comments",
+                     "OLD.comment_type IS DISTINCT FROM NEW.comment_type OR OLD.platform IS DISTINCT FROM NEW.platform "
+                     "OR OLD.created_at IS DISTINCT FROM NEW.created_at"),
+                    ("replies_touch_updated_at", "replies",
+                     "OLD.status IS DISTINCT FROM NEW.status OR OLD.comment_id IS DISTINCT FROM NEW.comment_id")
+                ]
+                for trigger_name, table, condition in touch_triggers:
+                    cursor.execute("SELECT 1 FROM pg_trigger WHERE tgname = %s;", (trigger_name,))
+                    if cursor.fetchone() is None:
+                        cursor.execute(
+                            f"CREATE TRIGGER {trigger_name} BEFORE UPDATE ON {table} FOR EACH ROW "
+                            f"WHEN ({condition}) EXECUTE FUNCTION touch_updated_at();"
+                        )
+            
             logger.info("Tables created successfully")
         except Exception as e:
-            self.connection.rollback()
             logger.error(f"Failed to setup tables: {e}")
             raise
 
+    def _comment_row(self, comment_data: Dict) -> tuple:
+        """Map comment data from the dashboard or the scheduler onto the comments columns"""
+        author = comment_data.get("author") or comment_data.get("commenter", {}).get("name")
+        external_id = comment_data.get("external_id") or comment_data.get("id")
+        classification = comment_data.get("classification") or {}
+        return (
+            comment_data["platform"], str(external_id) if external_id is not None else None,
+            comment_data["text"], author, comment_data.get("status", "new"),
+            classification.get("type"), classification.get("metadata", {}).get("source")
+        )
+
+    def _reply_row(self, reply_data: Dict) -> tuple:
+        """Map reply data onto the replies columns"""
+        return (reply_data["comment_id"], reply_data["reply"], reply_data["status"])
+
+    # Re-fetched comments arrive as 'new' and must not demote one that was already processed
+    _COMMENT_UPSERT_QUERY = """
+        INSERT INTO comments (platform, external_id, text, author, status, comment_type, classification_source)
+        VALUES {values}
+        ON CONFLICT (platform, external_id) DO UPDATE
+        SET text = EXCLUDED.text, author = EXCLUDED.author,
+            status = CASE WHEN EXCLUDED.status = 'new' THEN comments.status ELSE EXCLUDED.status END,
+            comment_type = COALESCE(EXCLUDED.comment_type, comments.comment_type),
+            classification_source = COALESCE(EXCLUDED.classification_source, comments.classification_source)
+        RETURNING comment_id, (xmax = 0) AS inserted;
+    """
+
+    def upsert_comment(self, comment_data: Dict) -> Tuple[str, bool]:
+        """Insert or update a comment keyed on (platform, external_id); returns (comment_id, is_new)"""
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(
+                    self._COMMENT_UPSERT_QUERY.format(values="(%s, %s, %s, %s, %s, %s, %s)"),
+                    self._comment_row(comment_data)
+                )
+                comment_id, inserted = cursor.fetchone()
+            logger.info(f"Comment {'saved' if inserted else 'updated'}: {comment_id}")
+            return str(comment_id), inserted
+        except Exception as e:
+            logger.error(f"Error saving comment: {e}")
+            raise
+
+    def upsert_comments_bulk(self, comments: List[Dict]) -> List[Tuple[str, bool]]:
+        """Upsert many comments in a single transaction; returns (comment_id, is_new) in input order"""
+        if not comments:
+            return []
+        try:
+            # A batch may repeat a platform id, and ON CONFLICT can't touch the same row twice
+            rows = []
+            positions = {}
+            row_index = []
+            for comment in comments:
+                row = self._comment_row(comment)
+                key = (row[0], row[1]) if row[1] is not None else None
+                if key is None or key not in positions:
+                    if key is not None:
+                        positions[key] = len(rows)
+                    row_index.append((len(rows), True))
+                    rows.append(row)
+                else:
+                    row_index.append((positions[key], False))
+
+            with self.transaction() as cursor:
+                results = execute_values(
+                    cursor, self._COMMENT_UPSERT_QUERY.format(values="%s"), rows,
+                    page_size=500, fetch=True
+                )
+
+            upserted = []
+            for index, first in row_index:
+                comment_id, inserted = results[index]
+                upserted.append((str(comment_id), inserted and first))
+
+            new_count = sum(1 for _, is_new in upserted if is_new)
+            logger.info(f"Bulk saved {len(upserted)} comments ({new_count} new)")
+            return upserted
+        except Exception as e:
+            logger.error(f"Error bulk saving comments: {e}")
+            raise
+
     def save_comment(self, comment_data: Dict) -> str:
         """Save comment to database"""
+        comment_id, _ = self.upsert_comment(comment_data)
+        return comment_id
+
+    def save_comments_bulk(self, comments: List[Dict]) -> List[str]:
+        """Save many comments in a single transaction, returning their ids in input order"""
+        return [comment_id for comment_id, _ in self.upsert_comments_bulk(comments)]
+
+    def get_labelled_comments(self, sources: tuple = ("llm", "manual"), limit: int = 50000) -> List[Tuple[str, str]]:
+        """Get (text, comment_type) training rows labelled by the LLM or by hand"""
         try:
-            insert_query = """
-                INSERT INTO comments (platform, text, author, status)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (comment_id) DO UPDATE
-                SET platform = EXCLUDED.platform, text = EXCLUDED.text, author = EXCLUDED.author, status = EXCLUDED.status;
-            """
-            self.cursor.execute(insert_query, (
-                comment_data["platform"], comment_data["text"], comment_data["author"], comment_data["status"]
-            ))
-            self.connection.commit()
-            logger.info(f"Comment saved: {comment_data['comment_id']}")
-            return str(comment_data["comment_id"])
-        except Exception as e:
-            self.connection.rollback()
-            logger.error(f"Error saving comment: {e}")
+            select_query = """
+                SELECT text, comment_type FROM comments
+                WHERE comment_type IS NOT NULL AND text IS NOT NULL AND classification_source = ANY(%s)
+                ORDER BY created_at DESC LIMIT %s;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(select_query, (list(sources), limit))
+                rows = cursor.fetchall()
+            return [(row[0], row[1]) for row in rows]
+        except Exception as e:
+            logger.error(f"Error fetching labelled comments: {e}")
+            raise
+
+    def _encode_comment_cursor(self, created_at: datetime, comment_id: int) -> str:
+        """Opaque keyset cursor pointing just past a comment"""
+        return f"{created_at.isoformat()}|{comment_id}"
+
+    def _decode_comment_cursor(self, cursor: str) -> Tuple[datetime, int]:
+        """Parse a cursor from _encode_comment_cursor; raises ValueError when malformed"""
+        created_at, comment_id = cursor.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(comment_id)
+
+    def get_comments_page(self, platforms: List[str] = None, comment_types: List[str] = None,
+                          statuses: List[str] = None, time_range: Tuple[datetime, datetime] = None,
+                          limit: int = 50, cursor: str = None) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of comments newest first, filtered in SQL; returns (comments, cursor for the next page).
+        
+        Pages are keyset-paginated on (created_at, comment_id), so every page is an index range
+        scan no matter how far back it is. Unclassified comments count as 'general'.
+        """
+        try:
+            conditions = []
+            params = []
+            if comment_types:
+                conditions.append("COALESCE(comment_type, 'general') = ANY(%s)")
+                params.append(list(comment_types))
+            if statuses:
+                conditions.append("status = ANY(%s)")
+                params.append(list(statuses))
+            if time_range:
+                start, end = time_range
+                if start:
+                    conditions.append("created_at >= %s")
+                    params.append(start)
+                if end:
+                    conditions.append("created_at <= %s")
+                    params.append(end)
+            if cursor:
+                conditions.append("(created_at, comment_id) < (%s, %s)")
+                params.extend(self._decode_comment_cursor(cursor))
+            
+            columns = "comment_id, platform, external_id, text, author, status, comment_type, classification_source, created_at"
+            order = "ORDER BY created_at DESC, comment_id DESC LIMIT %s"
+            
+            def page_query(extra_condition: str = None) -> str:
+                where = conditions + ([extra_condition] if extra_condition else [])
+                return f"SELECT {columns} FROM comments {'WHERE ' + ' AND '.join(where) if where else ''} {order}"
+            
+            if platforms and len(platforms) > 1:
+                # One ordered index scan per platform, merged; a single platform = ANY() scan would have to sort
+                query = "SELECT * FROM ({}) page {}".format(
+                    " UNION ALL ".join(f"({page_query('platform = %s')})" for _ in platforms), order
+                )
+                query_params = [value for platform in platforms for value in (*params, platform, limit)] + [limit]
+            elif platforms:
+                query = page_query("platform = %s")
+                query_params = params + [platforms[0], limit]
+            else:
+                query = page_query()
+                query_params = params + [limit]
+            
+            reply_query = """
+                SELECT DISTINCT comment_id FROM replies WHERE comment_id = ANY(%s);
+            """
+            with self.transaction() as db_cursor:
+                db_cursor.execute(query, query_params)
+                rows = db_cursor.fetchall()
+                db_cursor.execute(reply_query, ([row[0] for row in rows],))
+                replied = {row[0] for row in db_cursor.fetchall()}
+            
+            comments = [
+                {
+                    "id": row[0], "comment_id": row[0], "platform": row[1], "external_id": row[2],
+                    "text": row[3], "author": row[4], "status": row[5],
+                    "comment_type": row[6] or "general", "classification_source": row[7],
+                    "created_at": row[8], "published_at": row[8].isoformat() if row[8] else "",
+                    "has_reply": row[0] in replied
+                }
+                for row in rows
+            ]
+            next_cursor = None
+            if len(rows) == limit and rows[-1][8] is not None:
+                next_cursor = self._encode_comment_cursor(rows[-1][8], rows[-1][0])
+            return comments, next_cursor
+        except Exception as e:
+            logger.error(f"Error filtering comments: {e}")
+            raise
+
+    def filter_comments(self, platforms: List[str] = None, comment_types: List[str] = None,
+                        time_range: Tuple[datetime, datetime] = None, limit: int = 50,
+                        statuses: List[str] = None, cursor: str = None) -> List[Dict]:
+        """Get comments newest first matching the filters (first page unless a cursor is given)"""
+        comments, _ = self.get_comments_page(platforms, comment_types, statuses, time_range, limit, cursor)
+        return comments
+
+    def get_comment_by_id(self, comment_id: str) -> Optional[Dict]:
+        """Get a saved comment in the shape the AI pipeline takes, or None if it does not exist"""
+        try:
+            select_query = """
+                SELECT c.comment_id, c.platform, c.external_id, c.text, c.author, c.status,
+                       c.comment_type, c.created_at, j.payload
+                FROM comments c LEFT JOIN comment_jobs j ON j.comment_id = c.comment_id
+                WHERE c.comment_id = %s;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(select_query, (comment_id,))
+                row = cursor.fetchone()
+            if row is None:
+                return None
+            # The queued payload keeps what the comments table does not (post context, commenter details)
+            payload = row[8] if isinstance(row[8], dict) else json.loads(row[8]) if row[8] else {}
+            return {
+                **payload,
+                "id": row[2] or payload.get("id") or row[0], "comment_id": row[0], "platform": row[1],
+                "external_id": row[2], "text": row[3], "author": row[4], "status": row[5],
+                "comment_type": row[6] or "general", "created_at": row[7],
+                "commenter": payload.get("commenter") or {"name": row[4]}
+            }
+        except Exception as e:
+            logger.error(f"Error fetching comment {comment_id}: {e}")
+            raise
+
+    def has_reply(self, comment_id: str) -> bool:
+        """Check whether a comment already has a reply (an idx_replies_comment_id lookup)"""
+        try:
+            with self.transaction() as cursor:
+                cursor.execute("SELECT EXISTS (SELECT 1 FROM replies WHERE comment_id = %s);", (comment_id,))
+                return cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error checking replies for comment {comment_id}: {e}")
             raise
 
     def save_reply(self, reply_data: Dict) -> str:
@@ -103,27 +610,51 @@ class DatabaseManager:
                 VALUES (%s, %s, %s)
                 RETURNING reply_id;
             """
-            self.cursor.execute(insert_query, (
-                reply_data["comment_id"], reply_data["reply"], reply_data["status"]
-            ))
-            self.connection.commit()
-            reply_id = self.cursor.fetchone()[0]
+            with self.transaction() as cursor:
+                cursor.execute(insert_query, self._reply_row(reply_data))
+                reply_id = cursor.fetchone()[0]
             logger.info(f"Reply saved: {reply_id}")
             return str(reply_id)
         except Exception as e:
-            self.connection.rollback()
             logger.error(f"Error saving reply: {e}")
             raise
 
+    def save_replies_bulk(self, replies: List[Dict]) -> List[str]:
+        """Save many replies in a single transaction, returning their ids in input order"""
+        if not replies:
+            return []
+        try:
+            insert_query = """
+                INSERT INTO replies (comment_id, reply, status)
+                VALUES %s
+                RETURNING reply_id;
+            """
+            with self.transaction() as cursor:
+                rows = execute_values(
+                    cursor, insert_query, [self._reply_row(reply) for reply in replies],
+                    page_size=500, fetch=True
+                )
+            reply_ids = [str(row[0]) for row in rows]
+            logger.info(f"Bulk saved {len(reply_ids)} replies")
+            return reply_ids
+        except Exception as e:
+            logger.error(f"Error bulk saving replies: {e}")
+            raise
+
     def get_pending_replies(self, limit: int = 50) -> List[Dict]:
         """Get pending AI replies"""
         try:
             select_query = """
-                SELECT reply_id, comment_id, reply, status FROM replies WHERE status = 'pending' LIMIT %s;
+                SELECT reply_id, comment_id, reply, status, created_at FROM replies WHERE status = 'pending'
+                ORDER BY created_at DESC, reply_id DESC LIMIT %s;
             """
-            self.cursor.execute(select_query, (limit,))
-            rows = self.cursor.fetchall()
-            replies = [{"reply_id": row[0], "comment_id": row[1], "reply": row[2], "status": row[3]} for row in rows]
+            with self.transaction() as cursor:
+                cursor.execute(select_query, (limit,))
+                rows = cursor.fetchall()
+            replies = [
+                {"reply_id": row[0], "comment_id": row[1], "reply": row[2], "status": row[3], "created_at": row[4]}
+                for row in rows
+            ]
             return replies
         except Exception as e:
             logger.error(f"Error fetching pending replies: {e}")
@@ -135,14 +666,491 @@ class DatabaseManager:
             update_query = """
                 UPDATE replies SET status = %s WHERE reply_id = %s;
             """
-            self.cursor.execute(update_query, (status, reply_id))
-            self.connection.commit()
+            with self.transaction() as cursor:
+                cursor.execute(update_query, (status, reply_id))
             logger.info(f"Reply status updated: {reply_id}")
         except Exception as e:
-            self.connection.rollback()
             logger.error(f"Error updating reply status: {e}")
             raise
 
+    def enqueue_comment_jobs(self, comments: List[Dict], max_attempts: int = 5) -> int:
+        """Queue saved comments for AI processing; a comment already queued is not queued twice"""
+        if not comments:
+            return 0
+        try:
+            insert_query = """
+                INSERT INTO comment_jobs (comment_id, payload, max_attempts)
+                VALUES %s
+                ON CONFLICT (comment_id) DO NOTHING
+                RETURNING job_id;
+            """
+            rows = [
+                (comment["comment_id"], json.dumps(comment, default=str), max_attempts)
+                for comment in comments
+            ]
+            with self.transaction() as cursor:
+                queued = execute_values(cursor, insert_query, rows, page_size=500, fetch=True)
+            logger.info(f"Queued {len(queued)} comment jobs")
+            return len(queued)
+        except Exception as e:
+            logger.error(f"Error queueing comment jobs: {e}")
+            raise
+
+    def dequeue_comment_jobs(self, worker_id: str, limit: int = 10,
+                             visibility_timeout: float = 300) -> List[Dict]:
+        """Lease up to limit runnable jobs to a worker.
+        
+        Jobs whose lease expired (the worker died mid-job) become runnable again, or are
+        dead-lettered once they have used up their attempts.
+        """
+        try:
+            dead_letter_query = """
+                UPDATE comment_jobs
+                SET status = 'dead', last_error = 'visibility timeout exceeded', locked_by = NULL,
+                    locked_until = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'running' AND locked_until < CURRENT_TIMESTAMP AND attempts >= max_attempts;
+            """
+            lease_query = """
+                WITH picked AS (
+                    SELECT job_id FROM comment_jobs
+                    WHERE (status = 'queued' AND available_at <= CURRENT_TIMESTAMP)
+                       OR (status = 'running' AND locked_until < CURRENT_TIMESTAMP)
+                    ORDER BY available_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE comment_jobs AS jobs
+                SET status = 'running', attempts = jobs.attempts + 1, locked_by = %s,
+                    locked_until = CURRENT_TIMESTAMP + make_interval(secs => %s), updated_at = CURRENT_TIMESTAMP
+                FROM picked
+                WHERE jobs.job_id = picked.job_id
+                RETURNING jobs.job_id, jobs.payload, jobs.attempts, jobs.max_attempts;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(dead_letter_query)
+                cursor.execute(lease_query, (limit, worker_id, visibility_timeout))
+                rows = cursor.fetchall()
+            return [
+                {"job_id": row[0], "payload": row[1], "attempts": row[2], "max_attempts": row[3]}
+                for row in rows
+            ]
+        except Exception as e:
+            logger.error(f"Error dequeueing comment jobs: {e}")
+            raise
+
+    def renew_comment_job_leases(self, worker_id: str, job_ids: List[int],
+                                 visibility_timeout: float = 300) -> List[int]:
+        """Extend a worker's leases on running jobs; returns the ids it still holds"""
+        if not job_ids:
+            return []
+        try:
+            update_query = """
+                UPDATE comment_jobs
+                SET locked_until = CURRENT_TIMESTAMP + make_interval(secs => %s), updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ANY(%s) AND locked_by = %s AND status = 'running'
+                RETURNING job_id;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(update_query, (visibility_timeout, list(job_ids), worker_id))
+                return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error renewing comment job leases: {e}")
+            raise
+
+    def complete_comment_jobs(self, job_ids: List[int], worker_id: str) -> List[int]:
+        """Mark jobs still leased to the worker as done; returns the ids that were completed"""
+        if not job_ids:
+            return []
+        try:
+            update_query = """
+                UPDATE comment_jobs
+                SET status = 'done', locked_by = NULL, locked_until = NULL, last_error = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ANY(%s) AND locked_by = %s AND status = 'running'
+                RETURNING job_id;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(update_query, (list(job_ids), worker_id))
+                return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error completing comment jobs: {e}")
+            raise
+
+    def fail_comment_job(self, job_id: int, worker_id: str, error: str, retry_delay: float = 60) -> Optional[str]:
+        """Release a failed job for a later retry, or dead-letter it once attempts run out.
+        
+        Returns its new status, or None when the worker no longer holds the job's lease.
+        """
+        try:
+            update_query = """
+                UPDATE comment_jobs
+                SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+                    available_at = CURRENT_TIMESTAMP + make_interval(secs => %s),
+                    locked_by = NULL, locked_until = NULL, last_error = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = %s AND locked_by = %s AND status = 'running'
+                RETURNING status;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(update_query, (retry_delay, error, job_id, worker_id))
+                result = cursor.fetchone()
+            status = result[0] if result else None
+            if status == "dead":
+                logger.error(f"Comment job {job_id} dead-lettered: {error}")
+            return status
+        except Exception as e:
+            logger.error(f"Error failing comment job {job_id}: {e}")
+            raise
+
+    def requeue_dead_comment_jobs(self) -> int:
+        """Give dead-lettered jobs a fresh set of attempts"""
+        try:
+            update_query = """
+                UPDATE comment_jobs
+                SET status = 'queued', attempts = 0, available_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'dead';
+            """
+            with self.transaction() as cursor:
+                cursor.execute(update_query)
+                requeued = cursor.rowcount
+            logger.info(f"Requeued {requeued} dead comment jobs")
+            return requeued
+        except Exception as e:
+            logger.error(f"Error requeueing dead comment jobs: {e}")
+            raise
+
+    def get_comment_job_stats(self) -> Dict:
+        """Get job counts per status and the age of the oldest runnable job"""
+        try:
+            select_query = """
+                SELECT status, COUNT(*), EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - MIN(available_at))
+                FROM comment_jobs GROUP BY status;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(select_query)
+                rows = cursor.fetchall()
+            stats = {"queued": 0, "running": 0, "done": 0, "dead": 0, "oldest_queued_seconds": 0.0}
+            for status, count, oldest in rows:
+                stats[status] = count
+                if status == "queued":
+                    stats["oldest_queued_seconds"] = max(0.0, float(oldest or 0))
+            return stats
+        except Exception as e:
+            logger.error(f"Error fetching comment job stats: {e}")
+            raise
+
+    def claim_ghl_sync(self, comment_id: str) -> bool:
+        """Claim a comment's GHL sync; False if it was already claimed by an earlier attempt"""
+        try:
+            insert_query = """
+                INSERT INTO ghl_syncs (comment_id) VALUES (%s)
+                ON CONFLICT (comment_id) DO NOTHING
+                RETURNING comment_id;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(insert_query, (comment_id,))
+                claimed = cursor.fetchone() is not None
+            return claimed
+        except Exception as e:
+            logger.error(f"Error claiming GHL sync for comment {comment_id}: {e}")
+            raise
+
+    def finish_ghl_sync(self, comment_id: str, status: str, contact_id: str = None):
+        """Record how a claimed GHL sync ended (done or failed)"""
+        try:
+            update_query = """
+                UPDATE ghl_syncs SET status = %s, contact_id = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE comment_id = %s;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(update_query, (status, contact_id, comment_id))
+        except Exception as e:
+            logger.error(f"Error recording GHL sync for comment {comment_id}: {e}")
+            raise
+
+    def acquire_lease(self, lease_name: str, holder: str, ttl_seconds: float) -> bool:
+        """Take a lease if it is free or expired, or renew it if the holder already owns it"""
+        try:
+            upsert_query = """
+                INSERT INTO leases (lease_name, holder, expires_at)
+                VALUES (%s, %s, CURRENT_TIMESTAMP + make_interval(secs => %s))
+                ON CONFLICT (lease_name) DO UPDATE
+                SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at
+                WHERE leases.expires_at < CURRENT_TIMESTAMP OR leases.holder = EXCLUDED.holder
+                RETURNING holder;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(upsert_query, (lease_name, holder, ttl_seconds))
+                acquired = cursor.fetchone() is not None
+            return acquired
+        except Exception as e:
+            logger.error(f"Error acquiring lease {lease_name}: {e}")
+            raise
+
+    def charge_api_quota(self, api_name: str, quota_day: str, units: int, daily_quota: int) -> Optional[int]:
+        """Atomically spend quota units shared by all workers; returns units used today, or None if the quota can't cover them"""
+        try:
+            upsert_query = """
+                INSERT INTO api_quota_usage (api_name, quota_day, units_used)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (api_name, quota_day) DO UPDATE
+                SET units_used = api_quota_usage.units_used + EXCLUDED.units_used, updated_at = CURRENT_TIMESTAMP
+                WHERE api_quota_usage.units_used + EXCLUDED.units_used <= %s
+                RETURNING units_used;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(upsert_query, (api_name, quota_day, units, daily_quota))
+                result = cursor.fetchone()
+            return result[0] if result else None
+        except Exception as e:
+            logger.error(f"Error charging {api_name} quota: {e}")
+            raise
+
+    def get_api_quota_usage(self, api_name: str, quota_day: str) -> int:
+        """Get the quota units all workers have spent on an API for the day"""
+        try:
+            select_query = """
+                SELECT units_used FROM api_quota_usage WHERE api_name = %s AND quota_day = %s;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(select_query, (api_name, quota_day))
+                result = cursor.fetchone()
+            return result[0] if result else 0
+        except Exception as e:
+            logger.error(f"Error getting {api_name} quota usage: {e}")
+            raise
+
+    def exhaust_api_quota(self, api_name: str, quota_day: str, daily_quota: int):
+        """Record the day's quota as spent after the provider rejected a call for quota"""
+        try:
+            upsert_query = """
+                INSERT INTO api_quota_usage (api_name, quota_day, units_used)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (api_name, quota_day) DO UPDATE
+                SET units_used = GREATEST(api_quota_usage.units_used, EXCLUDED.units_used), updated_at = CURRENT_TIMESTAMP;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(upsert_query, (api_name, quota_day, daily_quota))
+        except Exception as e:
+            logger.error(f"Error exhausting {api_name} quota: {e}")
+            raise
+
+    def release_lease(self, lease_name: str, holder: str):
+        """Give up a lease early so another worker can take it"""
+        try:
+            delete_query = """
+                DELETE FROM leases WHERE lease_name = %s AND holder = %s;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(delete_query, (lease_name, holder))
+        except Exception as e:
+            logger.error(f"Error releasing lease {lease_name}: {e}")
+            raise
+
+    def get_leases(self) -> List[Dict]:
+        """Get every unexpired lease and its holder"""
+        try:
+            select_query = """
+                SELECT lease_name, holder, expires_at FROM leases
+                WHERE expires_at >= CURRENT_TIMESTAMP ORDER BY lease_name;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(select_query)
+                rows = cursor.fetchall()
+            return [{"lease_name": row[0], "holder": row[1], "expires_at": row[2].isoformat()} for row in rows]
+        except Exception as e:
+            logger.error(f"Error fetching leases: {e}")
+            raise
+
+    def get_setting(self, setting_key: str) -> Optional[str]:
+        """Get a raw setting value"""
+        try:
+            select_query = """
+                SELECT setting_value FROM settings WHERE setting_key = %s;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(select_query, (setting_key,))
+                result = cursor.fetchone()
+            return result[0] if result else None
+        except Exception as e:
+            logger.error(f"Error fetching setting {setting_key}: {e}")
+            raise
+
+    def get_settings_like(self, prefix: str) -> Dict[str, str]:
+        """Get every raw setting whose key starts with prefix"""
+        try:
+            select_query = """
+                SELECT setting_key, setting_value FROM settings WHERE setting_key LIKE %s;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(select_query, (prefix.replace("%", r"\%").replace("_", r"\_") + "%",))
+                rows = cursor.fetchall()
+            return {row[0]: row[1] for row in rows}
+        except Exception as e:
+            logger.error(f"Error fetching settings {prefix}*: {e}")
+            raise
+
+    def set_setting(self, setting_key: str, setting_value: str):
+        """Create or update a raw setting value"""
+        try:
+            upsert_query = """
+                INSERT INTO settings (setting_key, setting_value)
+                VALUES (%s, %s)
+                ON CONFLICT (setting_key) DO UPDATE SET setting_value = EXCLUDED.setting_value;
+            """
+            with self.transaction() as cursor:
+                cursor.execute(upsert_query, (setting_key, setting_value))
+            logger.info(f"Setting updated: {setting_key}")
+        except Exception as e:
+            logger.error(f"Error updating setting {setting_key}: {e}")
+            raise
+
+    def refresh_analytics_rollups(self, lookback_hours: float = None) -> int:
+        """Recompute the hourly and daily rollups touched since the last refresh; returns the hours recomputed.
+        
+        A comment hour is dirty when one of its comments or their replies was inserted or changed
+        (classification, reply status) since the previous refresh, going by updated_at; the lookback
+        covers transactions that were still open at the last refresh. Only those hours are re-aggregated,
+        so the cost tracks recent activity rather than history size. The first run backfills everything.
+        """
+        lookback = timedelta(hours=lookback_hours or float(os.getenv("ANALYTICS_ROLLUP_LOOKBACK_HOURS", "6")))
+        try:
+            with self.transaction() as cursor:
+                # Serialize refreshes; a concurrent one would recompute the same hours
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext('analytics_rollups'));")
+                cursor.execute("SELECT LOCALTIMESTAMP;")
+                refresh_started = cursor.fetchone()[0]
+                cursor.execute("SELECT setting_value FROM settings WHERE setting_key = 'analytics_rollup_watermark';")
+                row = cursor.fetchone()
+                since = datetime.fromisoformat(row[0]) - lookback if row else datetime.min
+                
+                cursor.execute("""
+                    SELECT date_trunc('hour', created_at) FROM comments WHERE updated_at >= %s
+                    UNION
+                    SELECT date_trunc('hour', c.created_at) FROM replies r
+                    JOIN comments c ON c.comment_id = r.comment_id
+                    WHERE r.updated_at >= %s;
+                """, (since, since))
+                dirty_hours = [row[0] for row in cursor.fetchall() if row[0] is not None]
+                
+                if dirty_hours:
+                    cursor.execute("DELETE FROM analytics_hourly WHERE bucket = ANY(%s);", (dirty_hours,))
+                    cursor.execute("""
+                        INSERT INTO analytics_hourly
+                            (bucket, platform, comment_type, comments, replied_comments, replies, auto_approved, response_seconds)
+                        SELECT date_trunc('hour', c.created_at), c.platform, COALESCE(c.comment_type, 'general'),
+                               COUNT(*), COUNT(r.first_reply_at), COALESCE(SUM(r.replies), 0),
+                               COALESCE(SUM(r.auto_approved), 0),
+                               COALESCE(SUM(GREATEST(EXTRACT(EPOCH FROM r.first_reply_at - c.created_at), 0)), 0)
+                        FROM unnest(%s::timestamp[]) AS dirty(hour)
+                        JOIN comments c ON c.created_at >= dirty.hour AND c.created_at < dirty.hour + INTERVAL '1 hour'
+                        LEFT JOIN LATERAL (
+                            SELECT COUNT(*) AS replies, MIN(created_at) AS first_reply_at,
+                                   COUNT(*) FILTER (WHERE status = 'auto_approved') AS auto_approved
+                            FROM replies WHERE replies.comment_id = c.comment_id
+                            HAVING COUNT(*) > 0
+                        ) r ON TRUE
+                        GROUP BY 1, 2, 3;
+                    """, (dirty_hours,))
+                    
+                    # Days are rebuilt from their hours, never from raw comments
+                    dirty_days = sorted({hour.date() for hour in dirty_hours})
+                    cursor.execute("DELETE FROM analytics_daily WHERE bucket = ANY(%s);", (dirty_days,))
+                    cursor.execute("""
+                        INSERT INTO analytics_daily
+                            (bucket, platform, comment_type, comments, replied_comments, replies, auto_approved, response_seconds)
+                        SELECT bucket::date, platform, comment_type, SUM(comments), SUM(replied_comments),
+                               SUM(replies), SUM(auto_approved), SUM(response_seconds)
+                        FROM analytics_hourly
+                        WHERE bucket >= %s AND bucket < %s AND bucket::date = ANY(%s)
+                        GROUP BY 1, 2, 3;
+                    """, (datetime.combine(dirty_days[0], datetime.min.time()),
+                          datetime.combine(dirty_days[-1], datetime.min.time()) + timedelta(days=1), dirty_days))
+                
+                cursor.execute("""
+                    INSERT INTO settings (setting_key, setting_value) VALUES ('analytics_rollup_watermark', %s)
+                    ON CONFLICT (setting_key) DO UPDATE SET setting_value = EXCLUDED.setting_value;
+                """, (refresh_started.isoformat(),))
+            
+            logger.info(f"Refreshed analytics rollups for {len(dirty_hours)} hours")
+            return len(dirty_hours)
+        except Exception as e:
+            logger.error(f"Error refreshing analytics rollups: {e}")
+            raise
+
+    def get_analytics_summary(self, days: int = 30) -> Dict:
+        """Get dashboard analytics from the daily rollups (totals, rates, breakdowns and daily_stats)"""
+        try:
+            with self.transaction() as cursor:
+                cursor.execute("""
+                    SELECT platform, comment_type, SUM(comments), SUM(replied_comments), SUM(replies),
+                           SUM(auto_approved), SUM(response_seconds)
+                    FROM analytics_daily GROUP BY platform, comment_type;
+                """)
+                breakdown_rows = cursor.fetchall()
+                cursor.execute("""
+                    SELECT bucket, SUM(comments), SUM(replied_comments), SUM(replies), SUM(response_seconds),
+                           SUM(comments) FILTER (WHERE comment_type = 'praise')
+                    FROM analytics_daily WHERE bucket > CURRENT_DATE - %s
+                    GROUP BY bucket ORDER BY bucket;
+                """, (max(days, 14),))
+                daily_rows = cursor.fetchall()
+                cursor.execute("SELECT setting_value FROM settings WHERE setting_key = 'analytics_rollup_watermark';")
+                watermark = cursor.fetchone()
+            
+            totals = {"comments": 0, "replied": 0, "replies": 0, "auto_approved": 0, "response_seconds": 0.0}
+            platform_breakdown = {}
+            comment_types = {}
+            for platform, comment_type, comments, replied, replies, auto_approved, response_seconds in breakdown_rows:
+                totals["comments"] += comments
+                totals["replied"] += replied
+                totals["replies"] += replies
+                totals["auto_approved"] += auto_approved
+                totals["response_seconds"] += response_seconds
+                platform_breakdown[platform] = platform_breakdown.get(platform, 0) + comments
+                comment_types[comment_type] = comment_types.get(comment_type, 0) + comments
+            
+            # This week vs the week before, for the trend figures
+            today = datetime.now().date()
+            periods = [{"comments": 0, "replied": 0, "response_seconds": 0.0, "praise": 0} for _ in range(2)]
+            daily_stats = []
+            for bucket, comments, replied, replies, response_seconds, praise in daily_rows:
+                age = max((today - bucket).days, 0)
+                if age < days:
+                    daily_stats.append({"date": bucket.isoformat(), "comments": comments, "replies": replies})
+                if age < 14:
+                    period = periods[age // 7]
+                    period["comments"] += comments
+                    period["replied"] += replied
+                    period["response_seconds"] += response_seconds
+                    period["praise"] += praise or 0
+            
+            def average_minutes(seconds: float, replied: int) -> float:
+                return round(seconds / replied / 60, 1) if replied else 0
+            
+            current, previous = periods
+            return {
+                "total_comments": totals["comments"],
+                "total_replies": totals["replies"],
+                "auto_approved": totals["auto_approved"],
+                "response_rate": round(100 * totals["replied"] / totals["comments"], 1) if totals["comments"] else 0,
+                "avg_response_time": average_minutes(totals["response_seconds"], totals["replied"]),
+                "comment_growth": round(100 * (current["comments"] - previous["comments"]) / previous["comments"], 1)
+                                  if previous["comments"] else 0,
+                "response_improvement": round(
+                    average_minutes(previous["response_seconds"], previous["replied"])
+                    - average_minutes(current["response_seconds"], current["replied"]), 1
+                ) if previous["replied"] and current["replied"] else 0,
+                # No per-comment sentiment is stored; the share of praise comments is the closest proxy
+                "positive_sentiment_pct": round(100 * current["praise"] / current["comments"]) if current["comments"] else 0,
+                "platform_breakdown": platform_breakdown,
+                "comment_types": comment_types,
+                "daily_stats": daily_stats,
+                "as_of": watermark[0] if watermark else None
+            }
+        except Exception as e:
+            logger.error(f"Error fetching analytics summary: {e}")
+            raise
+
     def set_owner_activity(self, active: bool):
         """Set owner activity flag in DB"""
         try:
@@ -151,11 +1159,10 @@ class DatabaseManager:
                 VALUES (%s, %s)
                 ON CONFLICT (setting_key) DO UPDATE SET setting_value = EXCLUDED.setting_value;
             """
-            self.cursor.execute(upsert_query, ("owner_active", str(active)))
-            self.connection.commit()
+            with self.transaction() as cursor:
+                cursor.execute(upsert_query, ("owner_active", str(active)))
             logger.info(f"Owner activity set to: {active}")
         except Exception as e:
-            self.connection.rollback()
             logger.error(f"Error updating owner activity: {e}")
             raise
 
@@ -165,9 +1172,81 @@ class DatabaseManager:
             select_query = """
                 SELECT setting_value FROM settings WHERE setting_key = %s;
             """
-            self.cursor.execute(select_query, ("owner_active",))
-            result = self.cursor.fetchone()
+            with self.transaction() as cursor:
+                cursor.execute(select_query, ("owner_active",))
+                result = cursor.fetchone()
             return result[0] == "True" if result else False
         except Exception as e:
             logger.error(f"Error fetching owner activity: {e}")
             raise
+
+    def get_fetch_cursors(self, platform: str) -> Dict[str, Dict]:
+        """Get all per-post fetch cursors for a platform, keyed by post id"""
+        try:
+            select_query = """
+                SELECT post_id, last_seen_at, last_seen_id, page_token, pending_seen_at, pending_seen_id
+                FROM fetch_cursors WHERE platform = %s AND post_id <> '';
+            """
+            with self.transaction() as cursor:
+                cursor.execute(select_query, (platform,))
+                rows = cursor.fetchall()
+            return {
+                row[0]: {
+                    "last_seen_at": row[1],
+                    "last_seen_id": row[2],
+                    "page_token": row[3],
+                    "pending_seen_at": row[4],
+                    "pending_seen_id": row[5]
+                } for row in rows
+            }
+        except Exception as e:
+            logger.error(f"Error fetching cursors for {platform}: {e}")
+            raise
+
+    def update_fetch_cursors(self, platform: str, cursors: Dict[str, Dict]):
+        """Persist per-post fetch cursors for a platform in one transaction"""
+        if not cursors:
+            return
+        try:
+            upsert_query = """
+                INSERT INTO fetch_cursors (platform, post_id, last_seen_at, last_seen_id, page_token,
+                                           pending_seen_at, pending_seen_id)
+                VALUES %s
+                ON CONFLICT (platform, post_id) DO UPDATE
+                SET last_seen_at = EXCLUDED.last_seen_at, last_seen_id = EXCLUDED.last_seen_id,
+                    page_token = EXCLUDED.page_token, pending_seen_at = EXCLUDED.pending_seen_at,
+                    pending_seen_id = EXCLUDED.pending_seen_id, updated_at = CURRENT_TIMESTAMP;
+            """
+            rows = [
+                (platform, post_id, c.get("last_seen_at"), c.get("last_seen_id"),
+                 c.get("page_token"), c.get("pending_seen_at"), c.get("pending_seen_id"))
+                for post_id, c in cursors.items()
+            ]
+            with self.transaction() as cursor:
+                execute_values(cursor, upsert_query, rows)
+            logger.info(f"Updated {len(rows)} fetch cursors for {platform}")
+        except Exception as e:
+            logger.error(f"Error updating cursors for {platform}: {e}")
+            raise
+
+    def get_last_check_time(self, platform: str) -> Optional[datetime]:
+        """Get the last time a platform was fetched"""
+        try:
+            select_query = """
+                SELECT last_seen_at FROM fetch_cursors WHERE platform = %s AND post_id = '';
+            """
+            with self.transaction() as cursor:
+                cursor.execute(select_query, (platform,))
+                result = cursor.fetchone()
+            return result[0] if result else None
+        except Exception as e:
+            logger.error(f"Error fetching last check time for {platform}: {e}")
+            raise
+
+    def update_last_check_time(self, platform: str, check_time: datetime):
+        """Record the last time a platform was fetched"""
+        try:
+            self.update_fetch_cursors(platform, {"": {"last_seen_at": check_time}})
+        except Exception as e:
+            logger.error(f"Error updating last check time for {platform}: {e}")
+            raise
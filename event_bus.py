@@ -0,0 +1,185 @@
+# event_bus.py - Live comment and reply events from Postgres LISTEN/NOTIFY
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+# Channel the comments/replies triggers notify on (see DatabaseManager._setup_tables)
+EVENT_CHANNEL = "dashboard_events"
+
+
+class EventBus:
+    def __init__(self, connection_string: str = None, channel: str = EVENT_CHANNEL, buffer_size: int = None):
+        """Initialize a listener that buffers recent events for SSE, WebSocket and dashboard consumers"""
+        self.connection_string = connection_string or os.getenv("POSTGRES_URL")
+        self.channel = channel
+        self.buffer_size = buffer_size or int(os.getenv("EVENT_BUFFER_SIZE", "1000"))
+
+        self._events = deque(maxlen=self.buffer_size)
+        # Ids continue from the boot time in milliseconds, so they keep growing across restarts
+        # and an id from before this boot is recognizable as such
+        self._base_id = int(time.time() * 1000)
+        self._last_id = self._base_id
+        self._condition = threading.Condition()
+        self._waiters = set()  # (event loop, asyncio.Event) of async consumers
+        self._stop = threading.Event()
+        self._thread = None
+        self.connected = False
+        self.stats = {"received": 0, "reconnects": 0}
+
+    def start(self):
+        """Start listening in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen_loop, name="event-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop listening and close the connection"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    def _listen_loop(self):
+        """Hold a dedicated LISTEN connection, reconnecting with backoff when it drops"""
+        backoff = 1
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = psycopg2.connect(self.connection_string)
+                connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with connection.cursor() as cursor:
+                    cursor.execute(sql.SQL("LISTEN {};").format(sql.Identifier(self.channel)))
+
+                if self.stats["received"] or self.stats["reconnects"]:
+                    # Notifications sent while disconnected are lost; tell consumers to refetch
+                    self._publish([{"type": "resync"}])
+                self.connected = True
+                backoff = 1
+                logger.info(f"Listening for {self.channel} notifications")
+
+                while not self._stop.is_set():
+                    # Sleep on the socket until Postgres delivers something, waking up to check for stop
+                    if select.select([connection], [], [], 5)[0]:
+                        connection.poll()
+                        payloads = [self._parse(notify.payload) for notify in connection.notifies]
+                        connection.notifies.clear()
+                        self._publish(payloads)
+
+            except Exception as e:
+                logger.error(f"Event bus connection lost: {e}")
+                self.stats["reconnects"] += 1
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                self.connected = False
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def _parse(self, payload: str) -> Dict:
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return {"type": "unknown", "payload": payload}
+
+    def _publish(self, payloads: List[Dict]):
+        """Number and buffer events, waking any waiting consumers"""
+        if not payloads:
+            return
+        with self._condition:
+            for payload in payloads:
+                self._last_id += 1
+                self._events.append({**payload, "id": self._last_id})
+            self.stats["received"] += len(payloads)
+            self._condition.notify_all()
+            waiters = list(self._waiters)
+
+        for loop, wakeup in waiters:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass  # The consumer's loop has closed
+
+    def latest_id(self) -> int:
+        """Id of the newest event, for consumers that only want what happens from now on"""
+        with self._condition:
+            return self._last_id
+
+    def events_since(self, last_id: int) -> Tuple[List[Dict], int]:
+        """Get buffered events newer than last_id without blocking; returns (events, new last id)"""
+        with self._condition:
+            if last_id < self._base_id or last_id > self._last_id:
+                # The id is from before this process started; whatever happened since is unknown
+                return [{"type": "resync", "id": self._last_id}], self._last_id
+
+            events = [event for event in self._events if event["id"] > last_id]
+            if events and events[0]["id"] > last_id + 1:
+                # The consumer fell further behind than the buffer holds
+                events.insert(0, {"type": "resync", "id": events[0]["id"] - 1})
+            return events, self._last_id
+
+    def wait_for_events(self, last_id: int, timeout: float = 15) -> Tuple[List[Dict], int]:
+        """Block until events newer than last_id arrive or timeout passes; returns (events, new last id)"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_id != last_id, timeout=timeout)
+        return self.events_since(last_id)
+
+    async def await_events(self, last_id: int, timeout: float = 15) -> Tuple[List[Dict], int]:
+        """Async wait_for_events that parks on the event loop instead of holding a thread"""
+        wakeup = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), wakeup)
+        with self._condition:
+            ready = self._last_id != last_id
+            if not ready:
+                self._waiters.add(waiter)
+
+        if not ready:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._condition:
+                    self._waiters.discard(waiter)
+        return self.events_since(last_id)
+
+    def get_status(self) -> Dict:
+        """Get connection state and event counters"""
+        with self._condition:
+            return {
+                "connected": self.connected,
+                "channel": self.channel,
+                "last_event_id": self._last_id,
+                "buffered": len(self._events),
+                "async_waiters": len(self._waiters),
+                **self.stats
+            }
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_event_bus() -> EventBus:
+    """Get the process-wide event bus, starting its listener on first use"""
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = EventBus()
+            _bus.start()
+        return _bus
@@ -2,19 +2,38 @@
 import requests
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
+
+from .rate_limiter import RateLimiter, get_rate_limiter
+from .http_client import get_session
+from .graph_batch import GraphBatchItemError, execute_batch, relative_url
 
 logger = logging.getLogger(__name__)
 
+# Only the comment fields the pipeline reads; the stream filter returns replies inline with their parent id
+COMMENT_FIELDS = "id,message,from{id,name},created_time,like_count,parent{id}"
+
 class FacebookIntegrator:
-    def __init__(self, access_token: str, page_id: str = None):
+    def __init__(self, access_token: str, page_id: str = None, rate_limiter: RateLimiter = None,
+                 session: requests.Session = None):
         """Initialize Facebook Graph API client"""
         self.access_token = access_token
         self.page_id = page_id
         self.base_url = "https://graph.facebook.com/v18.0"
+        # Pooled keep-alive session with default timeouts and retries, shared across integrators
+        self.session = session or get_session()
+        # Facebook and Instagram calls share the app's Graph API usage budget
+        self.rate_limiter = rate_limiter or get_rate_limiter("graph")
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a Graph API request through the rate limiter and adapt to its usage headers"""
+        self.rate_limiter.acquire()
+        response = self.session.request(method, url, **kwargs)
+        self.rate_limiter.update_from_headers(response.headers)
+        return response
         
     def get_page_posts(self, limit: int = 25) -> List[Dict]:
-        """Get recent posts from Facebook page"""
+        """Get recent posts from Facebook page; API errors are raised so callers can tell them from an empty page"""
         
         try:
             url = f"{self.base_url}/{self.page_id}/posts"
@@ -24,7 +43,7 @@ class FacebookIntegrator:
                 "fields": "id,message,created_time,permalink_url,comments{id,message,from,created_time,like_count}"
             }
             
-            response = requests.get(url, params=params)
+            response = self._request("GET", url, params=params)
             response.raise_for_status()
             
             data = response.json()
@@ -35,40 +54,125 @@ class FacebookIntegrator:
             
         except Exception as e:
             logger.error(f"Failed to get Facebook posts: {e}")
+            raise
+
+    def get_post_comments(self, post_id: str, max_results: int = 1000) -> List[Dict]:
+        """Get comments for a specific Facebook post, following paging"""
+        
+        try:
+            comments, _ = self.get_post_comments_since(post_id, max_results=max_results)
+            return comments
+        except Exception as e:
+            logger.error(f"Failed to get Facebook comments: {e}")
             return []
 
-    def get_post_comments(self, post_id: str) -> List[Dict]:
-        """Get comments for a specific Facebook post"""
+    def get_post_comments_since(self, post_id: str, since: datetime = None, after: str = None,
+                                max_results: int = 500) -> Tuple[List[Dict], Optional[str]]:
+        """Get comments and replies newer than since, newest first, stopping once already-seen ones are reached.
+        
+        Replies come through the stream filter by their own timestamp, so a new reply on an old
+        thread is found too. Returns the comments and an 'after' paging cursor to resume from
+        when max_results was hit.
+        """
         
         try:
             url = f"{self.base_url}/{post_id}/comments"
-            params = {
-                "access_token": self.access_token,
-                "fields": "id,message,from,created_time,like_count,comments{id,message,from,created_time}"
-            }
+            comments = []
+            while True:
+                params = {"access_token": self.access_token, **self._comments_params(since, after)}
+                response = self._request("GET", url, params=params)
+                response.raise_for_status()
+                
+                after = self._consume_comments_page(response.json(), post_id, since, comments)
+                if not after or len(comments) >= max_results:
+                    break
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
+            logger.info(f"Retrieved {len(comments)} new comments for post {post_id}")
+            return comments, after
             
-            data = response.json()
-            comments = []
+        except Exception as e:
+            logger.error(f"Failed to get new Facebook comments: {e}")
+            raise
+
+    def get_comments_batch_since(self, cursors: Dict[str, Dict], max_results: int = 500
+                                 ) -> Dict[str, Union[Tuple[List[Dict], Optional[str]], Exception]]:
+        """Get new comments for many posts through Graph API batch calls, following each thread's paging.
+        
+        cursors maps post_id to {"since": datetime, "after": paging cursor}. Returns (comments,
+        resume cursor) per post like get_post_comments_since, or the error for a post whose request failed.
+        """
+        
+        try:
+            comments = {post_id: [] for post_id in cursors}
+            pending = {post_id: cursor.get("after") for post_id, cursor in cursors.items()}
+            outcomes = {}
             
-            for comment in data.get("data", []):
-                parsed_comment = self._parse_facebook_comment(comment, post_id)
-                comments.append(parsed_comment)
+            # Each round fetches the next page of every unfinished thread, 50 threads per call
+            while pending:
+                post_ids = list(pending)
+                urls = [
+                    relative_url(f"{post_id}/comments", self._comments_params(cursors[post_id].get("since"), pending[post_id]))
+                    for post_id in post_ids
+                ]
+                responses = execute_batch(self._request, self.base_url, self.access_token, urls)
                 
-                # Add nested replies
-                if "comments" in comment:
-                    for reply in comment["comments"]["data"]:
-                        parsed_reply = self._parse_facebook_comment(reply, post_id, comment["id"])
-                        comments.append(parsed_reply)
+                for post_id, (status, body) in zip(post_ids, responses):
+                    if status != 200:
+                        error = (body.get("error") or {}).get("message", body)
+                        outcomes[post_id] = GraphBatchItemError(f"Comments for post {post_id} failed ({status}): {error}")
+                        del pending[post_id]
+                        continue
+                    
+                    after = self._consume_comments_page(body, post_id, cursors[post_id].get("since"), comments[post_id])
+                    if after and len(comments[post_id]) < max_results:
+                        pending[post_id] = after
+                    else:
+                        outcomes[post_id] = (comments[post_id], after)
+                        del pending[post_id]
             
-            logger.info(f"Retrieved {len(comments)} comments for post {post_id}")
-            return comments
+            total = sum(len(post_comments) for post_comments in comments.values())
+            logger.info(f"Retrieved {total} new comments for {len(cursors)} Facebook posts")
+            return outcomes
             
         except Exception as e:
-            logger.error(f"Failed to get Facebook comments: {e}")
-            return []
+            logger.error(f"Failed to batch fetch Facebook comments: {e}")
+            raise
+
+    def _comments_params(self, since: datetime = None, after: str = None) -> Dict:
+        """Query parameters for one page of a post's comments and replies, newest first"""
+        params = {
+            "fields": COMMENT_FIELDS,
+            "filter": "stream",
+            "order": "reverse_chronological",
+            "limit": 100
+        }
+        if since:
+            params["since"] = int(since.timestamp())
+        if after:
+            params["after"] = after
+        return params
+
+    def _consume_comments_page(self, data: Dict, post_id: str, since: Optional[datetime],
+                               comments: List[Dict]) -> Optional[str]:
+        """Append a page's comments and replies newer than since; returns the next page's cursor, or None when done"""
+        reached_seen = False
+        for comment in data.get("data", []):
+            parent_id = (comment.get("parent") or {}).get("id")
+            parsed_comment = self._parse_facebook_comment(comment, post_id, parent_id)
+            if since and self._published_at(parsed_comment) <= since:
+                reached_seen = True
+                break
+            comments.append(parsed_comment)
+        
+        paging = data.get("paging", {})
+        after = paging.get("cursors", {}).get("after")
+        if reached_seen or not paging.get("next") or not after:
+            return None
+        return after
+
+    def _published_at(self, comment: Dict) -> datetime:
+        """Parse a Graph API created_time such as 2024-01-01T12:00:00+0000"""
+        return datetime.strptime(comment["published_at"], "%Y-%m-%dT%H:%M:%S%z")
 
     def _parse_facebook_comment(self, comment: Dict, post_id: str, parent_id: str = None) -> Dict:
         """Parse Facebook comment data"""
@@ -96,7 +200,7 @@ class FacebookIntegrator:
                 "message": reply_text
             }
             
-            response = requests.post(url, data=data)
+            response = self._request("POST", url, data=data)
             response.raise_for_status()
             
             result = response.json()
@@ -3,14 +3,20 @@ import logging
 from datetime import datetime
 from typing import Dict, List
 
+import requests
+
+from .http_client import get_session
+
 # ghl_integration.py - GoHighLevel integration module
 logger = logging.getLogger(__name__)
 
 class GHLIntegrator:
-    def __init__(self, ghl_api_key: str = None):
+    def __init__(self, ghl_api_key: str = None, session: requests.Session = None):
         """Initialize GHL integration (API key to be provided later)"""
         self.api_key = ghl_api_key
         self.base_url = "https://rest.gohighlevel.com/v1"  # Update when you get the actual endpoint
+        # Use this pooled session (default timeouts and retries) for the real API calls
+        self.session = session or get_session()
         
     def create_or_update_contact(self, contact_data: Dict) -> Dict:
         """Create or update contact in GHL CRM"""
@@ -0,0 +1,52 @@
+# graph_batch.py - Graph API batch requests shared by the Facebook and Instagram integrators
+import json
+import logging
+from typing import Callable, List, Tuple
+from urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+# The Graph API accepts at most 50 requests per batch call
+GRAPH_BATCH_LIMIT = 50
+
+
+class GraphBatchItemError(Exception):
+    """A single request inside a Graph API batch failed"""
+
+
+def relative_url(path: str, params: dict) -> str:
+    """Build a batch item's relative URL from a node/edge path and query parameters"""
+    return f"{path}?{urlencode(params)}" if params else path
+
+
+def execute_batch(send_request: Callable, base_url: str, access_token: str,
+                  relative_urls: List[str]) -> List[Tuple[int, dict]]:
+    """Run GET requests as Graph API batches of up to 50; returns (status code, body) per URL in order.
+
+    send_request is the integrator's rate-limited request function. A failed batch call
+    raises; a failed item comes back with its error status and body.
+    """
+    results = []
+    for start in range(0, len(relative_urls), GRAPH_BATCH_LIMIT):
+        chunk = relative_urls[start:start + GRAPH_BATCH_LIMIT]
+        response = send_request("POST", f"{base_url}/", data={
+            "access_token": access_token,
+            "include_headers": "false",
+            "batch": json.dumps([{"method": "GET", "relative_url": url} for url in chunk])
+        })
+        response.raise_for_status()
+
+        for item in response.json():
+            # Items the server could not run in time come back as null
+            if item is None:
+                results.append((504, {"error": {"message": "batch item timed out"}}))
+                continue
+            try:
+                body = json.loads(item.get("body") or "{}")
+            except ValueError:
+                body = {"error": {"message": item.get("body")}}
+            results.append((item.get("code", 500), body))
+
+    logger.info(f"Graph batch fetched {len(relative_urls)} requests in "
+                f"{(len(relative_urls) + GRAPH_BATCH_LIMIT - 1) // GRAPH_BATCH_LIMIT} calls")
+    return results
@@ -0,0 +1,73 @@
+# http_client.py - Shared pooled HTTP session for the REST-based platform integrators
+import logging
+import os
+import threading
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Per-host connection pool sizes; hosts not listed get HTTP_POOL_MAXSIZE
+HOST_POOL_SIZES = {
+    "https://graph.facebook.com/": 20,
+    "https://api.linkedin.com/": 5,
+    "https://rest.gohighlevel.com/": 5
+}
+
+
+class TimeoutSession(requests.Session):
+    """requests.Session that applies a default (connect, read) timeout to every request"""
+
+    def __init__(self, timeout: tuple):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_session(connect_timeout: float = None, read_timeout: float = None, retries: int = None,
+                   pool_maxsize: int = None, host_pool_sizes: Dict[str, int] = None) -> requests.Session:
+    """Create a keep-alive session with default timeouts, retries and per-host pool sizing.
+
+    Only idempotent requests are retried (on connection errors and 5xx responses); posting
+    a reply is never repeated. 429s are left to the rate limiter.
+    """
+    timeout = (
+        connect_timeout or float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+        read_timeout or float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+    )
+    retry = Retry(
+        total=retries if retries is not None else int(os.getenv("HTTP_RETRIES", "3")),
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        raise_on_status=False
+    )
+    default_pool_size = pool_maxsize or int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+
+    session = TimeoutSession(timeout)
+    session.mount("https://", HTTPAdapter(pool_maxsize=default_pool_size, max_retries=retry))
+    session.mount("http://", HTTPAdapter(pool_maxsize=default_pool_size, max_retries=retry))
+    # Longest prefix wins, so host-specific adapters take precedence over the defaults
+    for host, size in (host_pool_sizes or HOST_POOL_SIZES).items():
+        session.mount(host, HTTPAdapter(pool_maxsize=size, max_retries=retry))
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Get the process-wide shared session, creating it on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+            logger.info("Shared HTTP session created")
+        return _session
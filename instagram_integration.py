@@ -1,19 +1,42 @@
 # instagram_integration.py - Instagram Business API integration
 import requests
 import logging
-from typing import List, Dict
+import os
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple, Union
+
+from .rate_limiter import RateLimiter, get_rate_limiter
+from .http_client import get_session
+from .graph_batch import GraphBatchItemError, execute_batch, relative_url
 
 logger = logging.getLogger(__name__)
 
+# Only the comment fields the pipeline reads
+COMMENT_FIELDS = "id,text,username,timestamp,like_count,replies{id,text,username,timestamp}"
+
 class InstagramIntegrator:
-    def __init__(self, access_token: str, instagram_business_account_id: str):
+    def __init__(self, access_token: str, instagram_business_account_id: str, rate_limiter: RateLimiter = None,
+                 session: requests.Session = None):
         """Initialize Instagram Business API client"""
         self.access_token = access_token
         self.account_id = instagram_business_account_id
         self.base_url = "https://graph.facebook.com/v18.0"
+        # Pooled keep-alive session with default timeouts and retries, shared across integrators
+        self.session = session or get_session()
+        # Facebook and Instagram calls share the app's Graph API usage budget
+        self.rate_limiter = rate_limiter or get_rate_limiter("graph")
+        # Already-seen threads checked for new replies before paging stops
+        self.reply_rescan_threads = int(os.getenv("REPLY_RESCAN_THREADS", "20"))
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a Graph API request through the rate limiter and adapt to its usage headers"""
+        self.rate_limiter.acquire()
+        response = self.session.request(method, url, **kwargs)
+        self.rate_limiter.update_from_headers(response.headers)
+        return response
         
     def get_recent_media(self, limit: int = 25) -> List[Dict]:
-        """Get recent Instagram media posts"""
+        """Get recent Instagram media posts; API errors are raised so callers can tell them from no media"""
         
         try:
             url = f"{self.base_url}/{self.account_id}/media"
@@ -23,7 +46,7 @@ class InstagramIntegrator:
                 "fields": "id,caption,media_type,media_url,permalink,timestamp,comments{id,text,username,timestamp,like_count}"
             }
             
-            response = requests.get(url, params=params)
+            response = self._request("GET", url, params=params)
             response.raise_for_status()
             
             data = response.json()
@@ -34,40 +57,133 @@ class InstagramIntegrator:
             
         except Exception as e:
             logger.error(f"Failed to get Instagram media: {e}")
+            raise
+
+    def get_media_comments(self, media_id: str, max_results: int = 1000) -> List[Dict]:
+        """Get comments for Instagram media, following paging"""
+        
+        try:
+            comments, _ = self.get_media_comments_since(media_id, max_results=max_results)
+            return comments
+        except Exception as e:
+            logger.error(f"Failed to get Instagram comments: {e}")
             return []
 
-    def get_media_comments(self, media_id: str) -> List[Dict]:
-        """Get comments for Instagram media"""
+    def get_media_comments_since(self, media_id: str, since: datetime = None, after: str = None,
+                                 max_results: int = 500) -> Tuple[List[Dict], Optional[str]]:
+        """Get comments newer than since, stopping shortly after the first already-seen comment.
+        
+        The comments edge has no since filter but returns newest comments first, so paging
+        stops once reply_rescan_threads seen threads were checked for new replies. Returns the
+        comments and an 'after' paging cursor to resume from when max_results was hit.
+        """
         
         try:
             url = f"{self.base_url}/{media_id}/comments"
-            params = {
-                "access_token": self.access_token,
-                "fields": "id,text,username,timestamp,like_count,replies{id,text,username,timestamp}"
-            }
+            comments = []
+            rescanned = 0
+            while True:
+                params = {"access_token": self.access_token, **self._comments_params(after)}
+                response = self._request("GET", url, params=params)
+                response.raise_for_status()
+                
+                after, rescanned = self._consume_comments_page(response.json(), media_id, since, comments, rescanned)
+                if not after or len(comments) >= max_results:
+                    break
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
+            logger.info(f"Retrieved {len(comments)} new comments for media {media_id}")
+            return comments, after
             
-            data = response.json()
-            comments = []
+        except Exception as e:
+            logger.error(f"Failed to get new Instagram comments: {e}")
+            raise
+
+    def get_comments_batch_since(self, cursors: Dict[str, Dict], max_results: int = 500
+                                 ) -> Dict[str, Union[Tuple[List[Dict], Optional[str]], Exception]]:
+        """Get new comments for many media through Graph API batch calls, following each thread's paging.
+        
+        cursors maps media_id to {"since": datetime, "after": paging cursor}. Returns (comments,
+        resume cursor) per media like get_media_comments_since, or the error for media whose request failed.
+        """
+        
+        try:
+            comments = {media_id: [] for media_id in cursors}
+            pending = {media_id: cursor.get("after") for media_id, cursor in cursors.items()}
+            rescanned = {media_id: 0 for media_id in cursors}
+            outcomes = {}
             
-            for comment in data.get("data", []):
-                parsed_comment = self._parse_instagram_comment(comment, media_id)
-                comments.append(parsed_comment)
+            # Each round fetches the next page of every unfinished thread, 50 threads per call
+            while pending:
+                media_ids = list(pending)
+                urls = [relative_url(f"{media_id}/comments", self._comments_params(pending[media_id])) for media_id in media_ids]
+                responses = execute_batch(self._request, self.base_url, self.access_token, urls)
                 
-                # Add replies
-                if "replies" in comment:
-                    for reply in comment["replies"]["data"]:
-                        parsed_reply = self._parse_instagram_comment(reply, media_id, comment["id"])
-                        comments.append(parsed_reply)
+                for media_id, (status, body) in zip(media_ids, responses):
+                    if status != 200:
+                        error = (body.get("error") or {}).get("message", body)
+                        outcomes[media_id] = GraphBatchItemError(f"Comments for media {media_id} failed ({status}): {error}")
+                        del pending[media_id]
+                        continue
+                    
+                    after, rescanned[media_id] = self._consume_comments_page(
+                        body, media_id, cursors[media_id].get("since"), comments[media_id], rescanned[media_id]
+                    )
+                    if after and len(comments[media_id]) < max_results:
+                        pending[media_id] = after
+                    else:
+                        outcomes[media_id] = (comments[media_id], after)
+                        del pending[media_id]
             
-            logger.info(f"Retrieved {len(comments)} comments for media {media_id}")
-            return comments
+            total = sum(len(media_comments) for media_comments in comments.values())
+            logger.info(f"Retrieved {total} new comments for {len(cursors)} Instagram media")
+            return outcomes
             
         except Exception as e:
-            logger.error(f"Failed to get Instagram comments: {e}")
-            return []
+            logger.error(f"Failed to batch fetch Instagram comments: {e}")
+            raise
+
+    def _comments_params(self, after: str = None) -> Dict:
+        """Query parameters for one page of a media's comments (the edge has no since filter)"""
+        params = {"fields": COMMENT_FIELDS, "limit": 50}
+        if after:
+            params["after"] = after
+        return params
+
+    def _consume_comments_page(self, data: Dict, media_id: str, since: Optional[datetime],
+                               comments: List[Dict], rescanned: int = 0) -> Tuple[Optional[str], int]:
+        """Append a page's comments and replies newer than since.
+        
+        Seen threads still get their new replies collected until reply_rescan_threads of them were
+        checked. Returns the next page's cursor (None when done) and the seen threads checked so far.
+        """
+        reached_seen = False
+        for comment in data.get("data", []):
+            parsed_comment = self._parse_instagram_comment(comment, media_id)
+            if since and self._published_at(parsed_comment) <= since:
+                # Replies on older threads are not ordered with them, so check a bounded number
+                if rescanned >= self.reply_rescan_threads:
+                    reached_seen = True
+                    break
+                rescanned += 1
+            else:
+                comments.append(parsed_comment)
+            
+            # Add replies
+            if "replies" in comment:
+                for reply in comment["replies"]["data"]:
+                    parsed_reply = self._parse_instagram_comment(reply, media_id, comment["id"])
+                    if not since or self._published_at(parsed_reply) > since:
+                        comments.append(parsed_reply)
+        
+        paging = data.get("paging", {})
+        after = paging.get("cursors", {}).get("after")
+        if reached_seen or not paging.get("next") or not after:
+            return None, rescanned
+        return after, rescanned
+
+    def _published_at(self, comment: Dict) -> datetime:
+        """Parse a Graph API timestamp such as 2024-01-01T12:00:00+0000"""
+        return datetime.strptime(comment["published_at"], "%Y-%m-%dT%H:%M:%S%z")
 
     def _parse_instagram_comment(self, comment: Dict, media_id: str, parent_id: str = None) -> Dict:
         """Parse Instagram comment data"""
@@ -94,7 +210,7 @@ class InstagramIntegrator:
                 "message": reply_text
             }
             
-            response = requests.post(url, data=data)
+            response = self._request("POST", url, data=data)
             response.raise_for_status()
             
             result = response.json()
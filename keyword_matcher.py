@@ -0,0 +1,81 @@
+# keyword_matcher.py - Single-pass multi-pattern keyword matching for comment triage
+from collections import deque
+from typing import Dict, List
+
+class KeywordMatcher:
+    def __init__(self, keyword_sets: Dict[str, List[str]]):
+        """Build one Aho-Corasick automaton over every keyword of every category"""
+        self.keyword_sets = {
+            category: [" ".join(keyword.lower().split()) for keyword in keywords if keyword.strip()]
+            for category, keywords in keyword_sets.items()
+        }
+
+        # A keyword may belong to several categories ("price" is both a lead and purchase intent)
+        self._categories_by_keyword = {}
+        for category, keywords in self.keyword_sets.items():
+            for keyword in keywords:
+                categories = self._categories_by_keyword.setdefault(keyword, [])
+                if category not in categories:
+                    categories.append(category)
+
+        # Trie transitions, failure links and the keywords ending at each state
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for keyword in self._categories_by_keyword:
+            state = 0
+            for char in keyword:
+                if char not in self._goto[state]:
+                    self._goto[state][char] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = self._goto[state][char]
+            self._output[state].append(keyword)
+
+        # Breadth-first, so a state's failure target is always finished before its children
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                # Shorter keywords ending inside a longer one ("want" in "i want to") are reported too
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+                queue.append(child)
+
+    def _is_word_char(self, char: str) -> bool:
+        return char.isalnum() or char == "_"
+
+    def _bounded(self, text: str, keyword: str, start: int) -> bool:
+        """Check word boundaries on a keyword's alphanumeric edges only ("www." has none on the right)"""
+        end = start + len(keyword)
+        if keyword[0].isalnum() and start > 0 and self._is_word_char(text[start - 1]):
+            return False
+        if keyword[-1].isalnum() and end < len(text) and self._is_word_char(text[end]):
+            return False
+        return True
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """Return {category: [matched keywords]} from a single scan of the text, overlapping matches included"""
+        matches = {}
+        if len(self._goto) == 1 or not text:
+            return matches
+
+        text = " ".join(text.lower().split())
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+
+            for keyword in self._output[state]:
+                if not self._bounded(text, keyword, position - len(keyword) + 1):
+                    continue
+                for category in self._categories_by_keyword[keyword]:
+                    keywords = matches.setdefault(category, [])
+                    if keyword not in keywords:
+                        keywords.append(keyword)
+        return matches
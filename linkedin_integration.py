@@ -3,14 +3,28 @@ import requests
 import logging
 from typing import List, Dict
 
+from .rate_limiter import RateLimiter, get_rate_limiter
+from .http_client import get_session
+
 logger = logging.getLogger(__name__)
 
 class LinkedInIntegrator:
-    def __init__(self, access_token: str, organization_id: str = None):
+    def __init__(self, access_token: str, organization_id: str = None, rate_limiter: RateLimiter = None,
+                 session: requests.Session = None):
         """Initialize LinkedIn API client"""
         self.access_token = access_token
         self.organization_id = organization_id
         self.base_url = "https://api.linkedin.com/v2"
+        # Pooled keep-alive session with default timeouts and retries, shared across integrators
+        self.session = session or get_session()
+        self.rate_limiter = rate_limiter or get_rate_limiter("linkedin")
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a LinkedIn API request through the rate limiter"""
+        self.rate_limiter.acquire()
+        response = self.session.request(method, url, **kwargs)
+        self.rate_limiter.update_from_headers(response.headers)
+        return response
         
     def get_posts(self, limit: int = 25) -> List[Dict]:
         """Get recent LinkedIn posts"""
@@ -33,7 +47,7 @@ class LinkedInIntegrator:
                 url = f"{self.base_url}/shares"
                 params = {"q": "owners", "owners": "urn:li:person:current", "count": limit}
             
-            response = requests.get(url, headers=headers, params=params)
+            response = self._request("GET", url, headers=headers, params=params)
             response.raise_for_status()
             
             data = response.json()
@@ -57,7 +71,7 @@ class LinkedInIntegrator:
             
             url = f"{self.base_url}/socialActions/{post_urn}/comments"
             
-            response = requests.get(url, headers=headers)
+            response = self._request("GET", url, headers=headers)
             response.raise_for_status()
             
             data = response.json()
@@ -0,0 +1,253 @@
+# llm_cache.py - Persistent LLM response cache keyed on normalized comment text
+import copy
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import atexit
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Default directory for the cache file; set APP_DATA_DIR to keep data elsewhere
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def normalize_comment_text(text: str) -> str:
+    """Normalize comment text so near-identical comments share a cache key"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    # Drop punctuation but keep emoji and other symbols ("Amen 🙏" != "Amen")
+    text = "".join(ch for ch in text if not unicodedata.category(ch).startswith("P"))
+    # Collapse stretched characters ("sooooo good" -> "soo good", "🙏🙏🙏🙏" -> "🙏🙏")
+    text = re.sub(r"(.)\1{2,}", r"\1\1", text)
+    return " ".join(text.split())
+
+
+class LLMCache:
+    def __init__(self, path: str = None, ttl_seconds: float = None, max_entries: int = None,
+                 enabled: bool = None, flush_seconds: float = None, flush_size: int = None):
+        """Initialize an LRU cache with TTL, backed by a SQLite file unless LLM_CACHE_PATH is set empty.
+        
+        The file is shared by every process using the same path: a miss in memory is looked up
+        on disk, and writes and access times are committed in batches (every flush_seconds or
+        flush_size changes) rather than one commit per LLM result.
+        """
+        if enabled is None:
+            enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        if path is None:
+            path = os.getenv("LLM_CACHE_PATH",
+                             os.path.join(os.getenv("APP_DATA_DIR", DEFAULT_DATA_DIR), "llm_cache.sqlite3"))
+        self.path = path
+        self.ttl_seconds = ttl_seconds or float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+        self.flush_seconds = flush_seconds or float(os.getenv("LLM_CACHE_FLUSH_SECONDS", "5"))
+        self.flush_size = flush_size or int(os.getenv("LLM_CACHE_FLUSH_SIZE", "50"))
+
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self._db = None
+        self._pending = {}  # key -> (value json, expires_at) to write, or None to delete
+        self._touched = {}  # key -> accessed_at not yet written
+        self._last_flush = time.time()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expired": 0}
+
+        if self.enabled and self.path:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # Several processes may share the file, so wait on their write locks briefly
+                self._db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                """)
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed_at ON llm_cache (accessed_at)")
+                self._db.commit()
+                self._load()
+                atexit.register(self.flush)
+            except Exception as e:
+                logger.error(f"Failed to open LLM cache at {self.path}, using memory only: {e}")
+                self._db = None
+
+    def _load(self):
+        """Drop expired and least recently used rows, then warm the in-memory LRU, most recently used last"""
+        now = time.time()
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE cache_key NOT IN "
+            "(SELECT cache_key FROM llm_cache ORDER BY accessed_at DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+        rows = self._db.execute(
+            "SELECT cache_key, value, expires_at FROM llm_cache ORDER BY accessed_at DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+        for cache_key, value, expires_at in reversed(rows):
+            self._entries[cache_key] = (expires_at, json.loads(value))
+        self._db.commit()
+        logger.info(f"Loaded {len(rows)} LLM cache entries from {self.path}")
+
+    def make_key(self, kind: str, text: str, **parts) -> str:
+        """Build a cache key from the call kind, normalized text and extra parts (type, platform, prompt version)"""
+        key_parts = [kind, normalize_comment_text(text)]
+        key_parts.extend(f"{name}={parts[name]}" for name in sorted(parts))
+        return hashlib.sha256("|".join(key_parts).encode("utf-8")).hexdigest()
+
+    def get(self, cache_key: str):
+        """Get a copy of a cached value, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            now = time.time()
+            entry = self._entries.get(cache_key)
+            if entry and entry[0] <= now:
+                self._delete(cache_key)
+                self.stats["expired"] += 1
+                entry = None
+
+            if not entry:
+                # Another process (or this one before a restart) may have cached it since
+                entry = self._read_disk(cache_key, now)
+                if not entry:
+                    self.stats["misses"] += 1
+                    self._maybe_flush()
+                    return None
+                self._remember(cache_key, entry)
+                self.stats["disk_hits"] += 1
+
+            self._entries.move_to_end(cache_key)
+            self.stats["hits"] += 1
+            if self._db:
+                self._touched[cache_key] = now
+            self._maybe_flush()
+            # Callers decorate results, so they never get the cached object itself
+            return copy.deepcopy(entry[1])
+
+    def _read_disk(self, cache_key: str, now: float) -> Optional[tuple]:
+        """Look up an unexpired entry in the SQLite file; caller holds the lock"""
+        if not self._db or cache_key in self._pending:
+            # A pending write is already in memory; a pending delete must not come back from disk
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE cache_key = ? AND expires_at > ?",
+                (cache_key, now)
+            ).fetchone()
+        except Exception as e:
+            logger.error(f"Failed to read LLM cache entry: {e}")
+            return None
+        return (row[1], json.loads(row[0])) if row else None
+
+    def _remember(self, cache_key: str, entry: tuple):
+        """Put an entry in the in-memory LRU, evicting from memory only; caller holds the lock"""
+        self._entries[cache_key] = entry
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def set(self, cache_key: str, value):
+        """Store a value, evicting least recently used entries beyond max_entries"""
+        if not self.enabled:
+            return
+
+        expires_at = time.time() + self.ttl_seconds
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(cache_key, (expires_at, value))
+            self.stats["writes"] += 1
+            if self._db:
+                self._pending[cache_key] = (json.dumps(value), expires_at)
+            self._maybe_flush()
+
+    def _delete(self, cache_key: str):
+        """Remove an entry from memory and, at the next flush, from disk; caller holds the lock"""
+        self._entries.pop(cache_key, None)
+        if self._db:
+            self._pending[cache_key] = None
+            self._touched.pop(cache_key, None)
+
+    def _maybe_flush(self):
+        """Flush once enough changes piled up or enough time passed; caller holds the lock"""
+        if not self._pending and not self._touched:
+            return
+        if (len(self._pending) + len(self._touched) >= self.flush_size
+                or time.time() - self._last_flush >= self.flush_seconds):
+            self._flush()
+
+    def _flush(self):
+        """Write pending entries, deletes and access times in one transaction; caller holds the lock"""
+        self._last_flush = time.time()
+        if not self._db:
+            return
+        pending, self._pending = self._pending, {}
+        touched, self._touched = self._touched, {}
+        now = time.time()
+        try:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO llm_cache (cache_key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                [(key, entry[0], entry[1], now) for key, entry in pending.items() if entry is not None]
+            )
+            self._db.executemany(
+                "DELETE FROM llm_cache WHERE cache_key = ?",
+                [(key,) for key, entry in pending.items() if entry is None]
+            )
+            self._db.executemany(
+                "UPDATE llm_cache SET accessed_at = MAX(accessed_at, ?) WHERE cache_key = ?",
+                [(accessed_at, key) for key, accessed_at in touched.items() if key not in pending]
+            )
+            self._db.commit()
+        except Exception as e:
+            logger.error(f"Failed to persist {len(pending) + len(touched)} LLM cache changes: {e}")
+            try:
+                self._db.rollback()
+            except Exception:
+                pass
+
+    def flush(self):
+        """Commit pending cache changes to disk now (also run at interpreter exit)"""
+        with self._lock:
+            self._flush()
+
+    def get_reply_variant(self, cache_key: str, min_variants: int) -> Optional[str]:
+        """Pick a random cached reply once at least min_variants have been collected for the key"""
+        variants = self.get(cache_key) or []
+        if len(variants) < min_variants:
+            return None
+        return random.choice(variants)
+
+    def add_reply_variant(self, cache_key: str, reply: str, max_variants: int):
+        """Remember another reply for the key so reuse doesn't repeat the same wording"""
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._entries.get(cache_key) or self._read_disk(cache_key, time.time())
+            variants: List[str] = list(entry[1]) if entry else []
+        if reply not in variants:
+            variants.append(reply)
+        self.set(cache_key, variants[-max_variants:])
+
+    def get_stats(self) -> Dict:
+        """Get cache size and hit-rate metrics"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+            stats["unflushed"] = len(self._pending) + len(self._touched)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["enabled"] = self.enabled
+        stats["persistent"] = self._db is not None
+        return stats
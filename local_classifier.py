@@ -0,0 +1,247 @@
+# local_classifier.py - Local fast-path comment classifier that defers to the LLM only when unsure
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from .llm_cache import normalize_comment_text
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# High-precision patterns checked before the model, as (comment type, pattern, confidence)
+RULES = [
+    ("spam", re.compile(r"https?://|www\.|\b(?:click here|follow me|check my profile|dm me)\b"), 0.95),
+    ("lead", re.compile(r"\b(?:how much|price|pricing|sign me up|where can i (?:buy|order|get))\b"), 0.9),
+    ("praise", re.compile(
+        r"^\W*(?:amen|thank you(?: so much)?|thanks|great (?:video|message|word)|love (?:this|it)|"
+        r"so good|beautiful|powerful|so true|needed this)\W*$"
+    ), 0.95),
+    ("praise", re.compile(r"^[\s🙏❤🔥👏💯🙌\ufe0f]+$"), 0.95),
+    ("question", re.compile(r"^\W*(?:what|how|why|when|where|who|which|can you|do you|is there)\b.*\?\s*$"), 0.9),
+]
+
+
+class LocalCommentClassifier:
+    def __init__(self, model_path: str = None, threshold: float = None, n_features: int = 2 ** 18):
+        """Initialize rule stage and load a trained hashed-feature model if one exists"""
+        self.model_path = model_path or os.getenv("LOCAL_CLASSIFIER_MODEL_PATH", "local_classifier_model.json")
+        self.threshold = threshold if threshold is not None else float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.9"))
+        self.n_features = n_features
+        self.alpha = 1.0  # Laplace smoothing
+
+        self.model = None
+        self._stats_lock = threading.Lock()
+        self.stats = {"rule_hits": 0, "model_hits": 0, "deferred": 0}
+
+        if self.model_path and os.path.exists(self.model_path):
+            self.load(self.model_path)
+
+    def _features(self, text: str) -> List[int]:
+        """Hash unigram and bigram tokens into a fixed feature space"""
+        tokens = TOKEN_PATTERN.findall(normalize_comment_text(text))
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return [zlib.crc32(gram.encode("utf-8")) % self.n_features for gram in grams]
+
+    def classify(self, comment_text: str) -> Optional[Tuple[str, Dict]]:
+        """Classify locally; returns (comment type, metadata) or None to defer to the LLM"""
+        comment_lower = comment_text.lower().strip()
+
+        for comment_type, pattern, confidence in RULES:
+            if confidence >= self.threshold and pattern.search(comment_lower):
+                self._count("rule_hits")
+                return comment_type, {"confidence": confidence, "reason": "local_rules", "source": "local"}
+
+        prediction = self.predict(comment_text)
+        if prediction and prediction[1] >= self.threshold:
+            self._count("model_hits")
+            return prediction[0], {"confidence": round(prediction[1], 4), "reason": "local_model", "source": "local"}
+
+        self._count("deferred")
+        return None
+
+    def predict(self, comment_text: str) -> Optional[Tuple[str, float]]:
+        """Predict (comment type, calibrated probability) with the naive Bayes model"""
+        log_probs = self._log_probs(comment_text)
+        if not log_probs:
+            return None
+        return self._softmax(log_probs, self.model.get("temperature", 1.0))
+
+    def _log_probs(self, comment_text: str) -> Optional[Dict[str, float]]:
+        """Unnormalized naive Bayes log-probability of each class"""
+        if not self.model:
+            return None
+
+        buckets = self._features(comment_text)
+        if not buckets:
+            return None
+
+        total_docs = sum(self.model["class_docs"].values())
+        vocab_size = self.model["vocab_size"]
+        log_probs = {}
+        for label, docs in self.model["class_docs"].items():
+            counts = self.model["feature_counts"][label]
+            denominator = self.model["total_features"][label] + self.alpha * vocab_size
+            log_prob = math.log(docs / total_docs)
+            for bucket in buckets:
+                log_prob += math.log((counts.get(bucket, 0) + self.alpha) / denominator)
+            log_probs[label] = log_prob
+        return log_probs
+
+    def _softmax(self, log_probs: Dict[str, float], temperature: float) -> Tuple[str, float]:
+        """Best class and its probability under a temperature-scaled softmax"""
+        best_label = max(log_probs, key=log_probs.get)
+        normalizer = sum(math.exp((lp - log_probs[best_label]) / temperature) for lp in log_probs.values())
+        return best_label, 1.0 / normalizer
+
+    def calibrate(self, rows: List[Tuple[str, str]]) -> float:
+        """Fit a softmax temperature on held-out rows so confidences match accuracy.
+
+        Naive Bayes multiplies many feature likelihoods as if independent, so its raw
+        posteriors sit near 1.0; the temperature minimizing held-out log loss is stored
+        in the model and applied by predict.
+        """
+        scored = []
+        for text, label in rows:
+            log_probs = self._log_probs(text)
+            if log_probs and label in log_probs:
+                scored.append((log_probs, label))
+        if not scored:
+            return self.model.get("temperature", 1.0)
+
+        def log_loss(temperature: float) -> float:
+            loss = 0.0
+            for log_probs, label in scored:
+                top = max(log_probs.values())
+                normalizer = sum(math.exp((lp - top) / temperature) for lp in log_probs.values())
+                loss -= (log_probs[label] - top) / temperature - math.log(normalizer)
+            return loss
+
+        # Overconfidence only ever needs softening, so search temperatures from 1 to 2^15
+        temperature = min((2 ** (step / 4) for step in range(61)), key=log_loss)
+        self.model["temperature"] = temperature
+        logger.info(f"Calibrated local classifier temperature to {temperature:.2f} on {len(scored)} comments")
+        return temperature
+
+    def train(self, rows: List[Tuple[str, str]]) -> Dict:
+        """Train the model from (text, comment type) rows"""
+        class_docs = {}
+        feature_counts = {}
+        total_features = {}
+        seen_buckets = set()
+
+        for text, label in rows:
+            buckets = self._features(text)
+            if not buckets:
+                continue
+            class_docs[label] = class_docs.get(label, 0) + 1
+            counts = feature_counts.setdefault(label, {})
+            for bucket in buckets:
+                counts[bucket] = counts.get(bucket, 0) + 1
+                seen_buckets.add(bucket)
+            total_features[label] = total_features.get(label, 0) + len(buckets)
+
+        if len(class_docs) < 2:
+            raise ValueError("Need labelled comments from at least two comment types to train")
+
+        self.model = {
+            "class_docs": class_docs,
+            "feature_counts": feature_counts,
+            "total_features": total_features,
+            "vocab_size": len(seen_buckets),
+            "n_features": self.n_features
+        }
+        logger.info(f"Trained local classifier on {sum(class_docs.values())} comments")
+        return class_docs
+
+    def evaluate(self, rows: List[Tuple[str, str]]) -> Dict:
+        """Accuracy and coverage of the model alone at the current threshold"""
+        confident = correct = 0
+        for text, label in rows:
+            prediction = self.predict(text)
+            if prediction and prediction[1] >= self.threshold:
+                confident += 1
+                correct += prediction[0] == label
+        return {
+            "rows": len(rows),
+            "coverage": confident / len(rows) if rows else 0.0,
+            "accuracy": correct / confident if confident else 0.0
+        }
+
+    def save(self, path: str = None):
+        """Save the trained model as JSON"""
+        path = path or self.model_path
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.model, f)
+        logger.info(f"Saved local classifier model to {path}")
+
+    def load(self, path: str = None):
+        """Load a trained model from JSON"""
+        path = path or self.model_path
+        try:
+            with open(path, encoding="utf-8") as f:
+                model = json.load(f)
+            # JSON object keys are strings; feature buckets are ints
+            model["feature_counts"] = {
+                label: {int(bucket): count for bucket, count in counts.items()}
+                for label, counts in model["feature_counts"].items()
+            }
+            self.n_features = model.get("n_features", self.n_features)
+            self.model = model
+            logger.info(f"Loaded local classifier model from {path}")
+        except Exception as e:
+            logger.error(f"Failed to load local classifier model from {path}: {e}")
+
+    def refresh_from_db(self, db, limit: int = 50000, holdout: float = 0.1) -> Dict:
+        """Retrain from LLM-labelled comments stored in the database, calibrate on the holdout and save the model"""
+        rows = db.get_labelled_comments(limit=limit)
+        random.Random(0).shuffle(rows)
+        split = int(len(rows) * (1 - holdout))
+        class_docs = self.train(rows[:split])
+        temperature = self.calibrate(rows[split:])
+        report = self.evaluate(rows[split:])
+        self.train(rows)
+        self.model["temperature"] = temperature
+        self.save()
+        return {"class_docs": class_docs, "temperature": temperature, "holdout": report}
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def get_stats(self) -> Dict:
+        """Get threshold, model status and how many LLM calls were saved"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["llm_calls_saved"] = stats["rule_hits"] + stats["model_hits"]
+        stats["threshold"] = self.threshold
+        stats["model_loaded"] = self.model is not None
+        return stats
+
+
+def main():
+    """Command-line entry point: python -m dashboard.local_classifier train"""
+    from .database_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Local comment classifier")
+    parser.add_argument("command", choices=["train"])
+    parser.add_argument("--model-path", default=None)
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--limit", type=int, default=50000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    classifier = LocalCommentClassifier(model_path=args.model_path, threshold=args.threshold)
+    report = classifier.refresh_from_db(DatabaseManager(), limit=args.limit)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
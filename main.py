@@ -2,25 +2,18 @@ import streamlit as st
 from dashboard.database_manager import DatabaseManager
 from dashboard.comment_processor import CommentProcessor
 from dashboard.content_manager import ContentManager
+from dashboard.event_bus import get_event_bus
 import os
+from concurrent.futures import ThreadPoolExecutor
 import json
 
 from datetime import datetime, timedelta
 import time
 from dotenv import load_dotenv
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-
-# Initialize processors
-db = DatabaseManager()
-comment_processor = CommentProcessor(OPENAI_API_KEY)
-content_manager = ContentManager(OPENAI_API_KEY)
-
 # Page config
 st.set_page_config(
     page_title="Ervin's AI Social Media Dashboard",
@@ -29,6 +22,111 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+
+# Streamlit reruns this script on every interaction, so clients and the connection
+# pool are created once per server process and shared by all sessions
+@st.cache_resource(show_spinner=False)
+def get_database() -> DatabaseManager:
+    return DatabaseManager()
+
+
+@st.cache_resource(show_spinner=False)
+def get_comment_processor() -> CommentProcessor:
+    return CommentProcessor(OPENAI_API_KEY)
+
+
+@st.cache_resource(show_spinner=False)
+def get_content_manager() -> ContentManager:
+    return ContentManager(OPENAI_API_KEY)
+
+
+# Query results are cached briefly so reruns within the TTL skip the database
+@st.cache_data(ttl=10, show_spinner=False)
+def load_owner_activity() -> bool:
+    return get_database().get_owner_activity()
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def load_comments(platforms: list, comment_types: list, time_range: str, limit: int = 50, cursor: str = None) -> tuple:
+    # Keyed on the range label rather than a timestamp, so reruns hit the cache
+    range_starts = {
+        "Last Hour": timedelta(hours=1),
+        "Last 24 Hours": timedelta(days=1),
+        "Last 7 Days": timedelta(days=7),
+        "Last 30 Days": timedelta(days=30)
+    }
+    now = datetime.now()
+    time_tuple = (now - range_starts[time_range], now) if time_range in range_starts else None
+    return get_database().get_comments_page(
+        platforms=platforms,
+        comment_types=comment_types,
+        time_range=time_tuple,
+        limit=limit,
+        cursor=cursor
+    )
+
+
+@st.cache_data(ttl=10, show_spinner=False)
+def load_pending_replies(limit: int = 50) -> list:
+    return get_database().get_pending_replies(limit=limit)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_analytics_summary() -> dict:
+    return get_database().get_analytics_summary()
+
+
+def clear_query_cache():
+    """Drop cached query results after a write so the next render shows it"""
+    load_owner_activity.clear()
+    load_comments.clear()
+    load_pending_replies.clear()
+    load_analytics_summary.clear()
+
+
+EVENT_ICONS = {
+    "new_comment": "💬",
+    "comment_updated": "🏷️",
+    "new_reply": "🤖",
+    "reply_updated": "✅"
+}
+
+
+def render_live_feed():
+    """Show comments and replies pushed since the last check, without rerunning the page"""
+    # Events arrive over the process-wide LISTEN connection, so polling the buffer costs no queries
+    bus = get_event_bus()
+    if "live_event_id" not in st.session_state:
+        st.session_state.live_event_id = bus.latest_id()
+        st.session_state.live_events = []
+
+    events, st.session_state.live_event_id = bus.events_since(st.session_state.live_event_id)
+    if events:
+        clear_query_cache()
+        st.session_state.live_events = (events[::-1] + st.session_state.live_events)[:20]
+        # The comment list and stats are outside this fragment; rerun the page so they show the change
+        st.rerun()
+
+    if not bus.connected:
+        st.caption("⚠️ Live updates disconnected, reconnecting...")
+    for event in st.session_state.live_events:
+        icon = EVENT_ICONS.get(event["type"], "🔄")
+        if event["type"] == "new_comment":
+            st.markdown(f"{icon} **{event.get('author') or 'Unknown'}** on {event.get('platform')}: {event.get('text') or ''}")
+        elif event["type"] == "new_reply":
+            st.markdown(f"{icon} Reply drafted for comment {event.get('comment_id')} ({event.get('status')}): {event.get('reply') or ''}")
+        elif event["type"] == "reply_updated":
+            st.markdown(f"{icon} Reply {event.get('reply_id')} is now {event.get('status')}")
+        elif event["type"] == "comment_updated":
+            st.markdown(f"{icon} Comment {event.get('comment_id')} is now {event.get('status')} ({event.get('comment_type')})")
+        else:
+            st.markdown(f"{icon} Live feed reconnected, refresh to load anything missed")
+
+
+db = get_database()
+comment_processor = get_comment_processor()
+content_manager = get_content_manager()
+
 st.markdown("""
 <style>
     /* General background */
@@ -125,7 +223,7 @@ with st.sidebar:
     
     # Owner Activity Toggle
     try:
-        owner_active = db.get_owner_activity()
+        owner_active = load_owner_activity()
     except Exception as e:
         owner_active = False
         st.error(f"DB error: {e}")
@@ -140,6 +238,7 @@ with st.sidebar:
         if new_owner_active != owner_active:
             try:
                 db.set_owner_activity(new_owner_active)
+                load_owner_activity.clear()
                 st.success("Mode updated!")
                 st.rerun()
             except Exception as e:
@@ -148,7 +247,7 @@ with st.sidebar:
     st.markdown("---")
     
     # Auto-refresh toggle
-    st.session_state.auto_refresh = st.checkbox("Auto-refresh (10s)", value=st.session_state.auto_refresh)
+    st.session_state.auto_refresh = st.checkbox("Live updates", value=st.session_state.auto_refresh)
     
     # Platform filters
     st.subheader("🔍 Filters")
@@ -163,41 +262,50 @@ with st.sidebar:
         ["lead", "praise", "question", "complaint", "general"],
         default=["lead", "praise", "question", "complaint", "general"]
     )
-    from datetime import datetime, timedelta
     # Time range
     time_range = st.selectbox(
         "Time Range",
         ["Last Hour", "Last 24 Hours", "Last 7 Days", "Last 30 Days", "All Time"]
     )
-    if time_range == "Last Hour":
-     start = datetime.now() - timedelta(hours=1)
-    elif time_range == "Last 24 Hours":
-     start = datetime.now() - timedelta(days=1)
-    elif time_range == "Last 7 Days":
-     start = datetime.now() - timedelta(days=7)
-    elif time_range == "Last 30 Days":
-     start = datetime.now() - timedelta(days=30)
-    else:
-     start = None
 
-    if start:
-     time_tuple = (start, datetime.now())
-    else:
-     time_tuple = None
-
-    comments = db.filter_comments(
-    platforms=platforms,
-    comment_types=comment_types,
-    time_range=time_tuple,
-    limit=50
-     )
+    try:
+        comments, next_cursor = load_comments(platforms, comment_types, time_range, limit=50)
+    except Exception as e:
+        comments, next_cursor = [], None
+        st.error(f"Failed to fetch comments: {e}")
+    
+    # Older pages are fetched by keyset cursor and kept until the filters change
+    filter_key = (tuple(platforms), tuple(comment_types), time_range)
+    if st.session_state.get("comment_filter_key") != filter_key:
+        st.session_state.comment_filter_key = filter_key
+        st.session_state.older_comments = []
+        st.session_state.older_cursor = None
+        st.session_state.older_anchor = None
+        st.session_state.older_loaded = False
+    if st.session_state.older_loaded and next_cursor and next_cursor != st.session_state.older_anchor:
+        # New comments pushed the first page down; reload the older pages from its new end so the
+        # comments that slid off it are not left in a gap between the two
+        try:
+            st.session_state.older_comments, st.session_state.older_cursor = load_comments(
+                platforms, comment_types, time_range,
+                limit=max(len(st.session_state.older_comments), 50), cursor=next_cursor
+            )
+            st.session_state.older_anchor = next_cursor
+        except Exception as e:
+            st.session_state.older_comments = []
+            st.session_state.older_cursor = None
+            st.session_state.older_loaded = False
+            st.error(f"Failed to fetch older comments: {e}")
+    if st.session_state.older_loaded:
+        comments = comments + st.session_state.older_comments
+        next_cursor = st.session_state.older_cursor
     # Analytics summary
     st.markdown("---")
     st.subheader("📊 Quick Stats")
     
     # Fetch analytics
     try:
-         analytics = db.get_analytics_summary()
+         analytics = load_analytics_summary()
     except:
         analytics = {
             "total_comments": 0,
@@ -214,26 +322,32 @@ with st.sidebar:
         st.metric("Response Rate", f"{analytics.get('response_rate', 0):.1f}%")
         st.metric("Avg Response Time", f"{analytics.get('avg_response_time', 0):.1f}m")
 
-# Main content area
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
+# Only the selected view runs; Streamlit would execute the body of every tab on each rerun
+VIEWS = [
     "📥 Live Comment Stream", 
     "🤖 AI Reply Queue", 
     "📝 Content Generator",
     "📊 Analytics",
     "⚙️ Settings"
-])
+]
+view = st.radio("View", VIEWS, horizontal=True, label_visibility="collapsed", key="view")
 
 # Tab 1: Live Comment Stream
-with tab1:
+if view == VIEWS[0]:
     col1, col2, col3 = st.columns([3, 1, 1])
     with col1:
         st.subheader("💬 Real-Time Comments")
     with col2:
         if st.button("🔄 Refresh Now"):
+            clear_query_cache()
             st.rerun()
     with col3:
         bulk_action = st.selectbox("Bulk Action", ["Select...", "Approve All", "AI Reply All"])
     
+    # Only this fragment reruns on its timer, picking up pushed deltas
+    with st.expander("⚡ Live Activity", expanded=True):
+        st.fragment(run_every=2 if st.session_state.auto_refresh else None)(render_live_feed)()
+    
     # Fetch comments with filters
     params = {
         "platforms": platforms,
@@ -243,7 +357,7 @@ with tab1:
     }
     
     try:
-        pending_replies = db.get_pending_replies(limit=50)
+        pending_replies = load_pending_replies(limit=50)
     except:
         comments = []
         st.error("Failed to fetch comments")
@@ -251,14 +365,17 @@ with tab1:
     if not comments:
         st.info("No comments found. They will appear here as they come in! 🎯")
     else:
-        # Group comments by platform
-        for platform in platforms:
-            platform_comments = [c for c in comments if c.get("platform") == platform]
+        # Group comments by platform; the query already applied the filters
+        comments_by_platform = {}
+        for comment in comments:
+            comments_by_platform.setdefault(comment["platform"], []).append(comment)
+        
+        for platform, platform_comments in comments_by_platform.items():
             if platform_comments:
                 st.markdown(f"### <span class='platform-badge {platform}'>{platform.upper()}</span>", 
                            unsafe_allow_html=True)
                 
-                for comment in platform_comments[:10]:  # Show latest 10 per platform
+                for comment in platform_comments:
                     with st.container():
                         col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
                         
@@ -287,6 +404,7 @@ with tab1:
                                 if st.button("🤖 AI Reply", key=f"ai_{comment['id']}"):
                                     # Trigger AI reply
                                     db.update_reply_status(str(comment["_id"]), "approved")
+                                    clear_query_cache()
                                     st.success("AI reply generated!")
                                     time.sleep(1)
                                     st.rerun()
@@ -294,14 +412,24 @@ with tab1:
                         with col4:
                             if st.button("👁️ View", key=f"view_{comment['id']}"):
                                 st.session_state.selected_comment = comment
+        
+        if next_cursor and st.button("⬇️ Load older comments"):
+            older, st.session_state.older_cursor = load_comments(
+                platforms, comment_types, time_range, limit=50, cursor=next_cursor
+            )
+            st.session_state.older_comments = st.session_state.older_comments + older
+            if not st.session_state.older_loaded:
+                st.session_state.older_anchor = next_cursor
+            st.session_state.older_loaded = True
+            st.rerun()
 
 
-with tab2:
+if view == VIEWS[1]:
     st.subheader("🤖 AI Generated Replies - Pending Approval")
     
     
     try:
-        pending_replies = db.get_pending_replies(limit=50)
+        pending_replies = load_pending_replies(limit=50)
         
     except:
         pending_replies = []
@@ -313,6 +441,7 @@ with tab2:
         if st.button("✅ Approve All Visible"):
             for reply in pending_replies:
                 db.update_reply_status(str(reply["_id"]), "approved")
+            clear_query_cache()
             st.success("All replies approved!")
             time.sleep(1)
             st.rerun()
@@ -349,12 +478,14 @@ with tab2:
                     st.markdown("<br>", unsafe_allow_html=True)
                     if st.button("✅ Approve", key=f"approve_{reply['_id']}"):
                         db.update_reply_status(str(reply["_id"]), "approved")
+                        clear_query_cache()
                         st.success("Approved!")
                         time.sleep(0.5)
                         st.rerun()
                     
                     if st.button("❌ Reject", key=f"reject_{reply['_id']}"):
                         db.update_reply_status(str(reply["_id"]), "approved")
+                        clear_query_cache()
                         st.warning("Rejected")
                         time.sleep(0.5)
                         st.rerun()
@@ -363,7 +494,7 @@ with tab2:
                         st.session_state.editing_reply = reply
 
 # Tab 3: Content Generator
-with tab3:
+if view == VIEWS[2]:
     st.subheader("📝 AI Content Generator")
     
     col1, col2 = st.columns([2, 1])
@@ -393,36 +524,53 @@ with tab3:
             st.session_state.content_preset = "hashtag_lib"
     
     if st.button("🚀 Generate Content", type="primary"):
-        with st.spinner("Creating amazing content..."):
-            try:
-                content = content_manager.ai_processor.generate_content(
-                    content_type, topic=topic, series=series, count=count
-                )
+        ai_processor = content_manager.ai_processor
+        try:
+            with ThreadPoolExecutor(max_workers=1) as background:
+                # Draft the remaining pieces in the background while the first one streams in
+                remaining = None
+                if count > 1:
+                    remaining = background.submit(
+                        ai_processor.generate_content, content_type, topic=topic, series=series, count=count - 1
+                    )
                 
-                st.success(f"✅ Generated {len(content)} pieces of content!")
+                preview = st.empty()
+                with preview.container():
+                    st.markdown(f"**{content_type} #1**")
+                    first_text = st.write_stream(
+                        ai_processor.stream_content(content_type, topic=topic, series=series)
+                    )
+                content = [ai_processor.build_content_item(content_type, first_text, topic, series)]
                 
-                # Display generated content
-                for i, item in enumerate(content):
-                    with st.expander(f"{content_type} #{i+1}"):
-                        st.write(item['content'])
-                        
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            if st.button("💾 Save", key=f"save_content_{i}"):
-                                # Save to database
-                                st.success("Saved!")
-                        with col2:
-                            if st.button("📋 Copy", key=f"copy_content_{i}"):
-                                st.write("Copied to clipboard!")
-                        with col3:
-                            if st.button("🔄 Regenerate", key=f"regen_content_{i}"):
-                                st.rerun()
+                if remaining:
+                    with st.spinner("Creating amazing content..."):
+                        content.extend(remaining.result())
+                preview.empty()
                 
-            except Exception as e:
-                st.error(f"Generation failed: {str(e)}")
+            st.success(f"✅ Generated {len(content)} pieces of content!")
+            
+            # Display generated content
+            for i, item in enumerate(content):
+                with st.expander(f"{content_type} #{i+1}"):
+                    st.write(item['content'])
+                    
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        if st.button("💾 Save", key=f"save_content_{i}"):
+                            # Save to database
+                            st.success("Saved!")
+                    with col2:
+                        if st.button("📋 Copy", key=f"copy_content_{i}"):
+                            st.write("Copied to clipboard!")
+                    with col3:
+                        if st.button("🔄 Regenerate", key=f"regen_content_{i}"):
+                            st.rerun()
+            
+        except Exception as e:
+            st.error(f"Generation failed: {str(e)}")
 
 # Tab 4: Analytics
-with tab4:
+if view == VIEWS[3]:
     st.subheader("📊 Performance Analytics")
     
     # Date range selector
@@ -436,7 +584,7 @@ with tab4:
     
     # Fetch analytics data
     try:
-        analytics = db.get_analytics_summary()  
+        analytics = load_analytics_summary()
     except:
         analytics= {}
     
@@ -495,6 +643,7 @@ with tab4:
     with col1:
         # Comments by platform
         if analytics.get('platform_breakdown'):
+            import plotly.express as px  # plotting libraries load only once there is data to chart
             fig_platform = px.pie(
                 values=list(analytics['platform_breakdown'].values()),
                 names=list(analytics['platform_breakdown'].keys()),
@@ -505,6 +654,7 @@ with tab4:
     with col2:
         # Comment types
         if analytics.get('comment_types'):
+            import plotly.express as px
             fig_types = px.bar(
                 x=list(analytics['comment_types'].keys()),
                 y=list(analytics['comment_types'].values()),
@@ -514,6 +664,8 @@ with tab4:
     
     # Time series
     if analytics.get('daily_stats'):
+        import pandas as pd
+        import plotly.graph_objects as go
         df_daily = pd.DataFrame(analytics['daily_stats'])
         fig_timeline = go.Figure()
         
@@ -543,7 +695,7 @@ with tab4:
         st.plotly_chart(fig_timeline, use_container_width=True)
 
 # Tab 5: Settings
-with tab5:
+if view == VIEWS[4]:
     st.subheader("⚙️ Configuration")
     
     col1, col2 = st.columns(2)
@@ -583,11 +735,6 @@ with tab5:
             # Save settings to database
             st.success("Settings saved!")
 
-# Auto-refresh logic
-if st.session_state.auto_refresh:
-    time.sleep(10)
-    st.rerun()
-
 # Footer
 st.markdown("---")
 st.markdown(
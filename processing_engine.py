@@ -0,0 +1,164 @@
+# processing_engine.py - Async concurrent comment processing with bounded in-flight LLM requests
+import asyncio
+import logging
+import os
+import random
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+class _FairQueue:
+    """Per-platform queues drained round-robin, capped by in-flight items per platform"""
+
+    def __init__(self, comments: List[Dict], max_per_platform: int):
+        self.max_per_platform = max_per_platform
+        self.queues = {}
+        self.in_flight = {}
+        for index, comment in enumerate(comments):
+            platform = comment.get("platform", "unknown")
+            self.queues.setdefault(platform, deque()).append(index)
+            self.in_flight.setdefault(platform, 0)
+        self.rotation = deque(self.queues.keys())
+
+    def next_item(self) -> Optional[tuple]:
+        """Pick the next comment from the first platform in rotation that has spare capacity"""
+        for _ in range(len(self.rotation)):
+            platform = self.rotation[0]
+            self.rotation.rotate(-1)
+            if self.queues[platform] and self.in_flight[platform] < self.max_per_platform:
+                self.in_flight[platform] += 1
+                return platform, self.queues[platform].popleft()
+        return None
+
+    def has_pending(self) -> bool:
+        return any(self.queues.values())
+
+
+class CommentProcessingEngine:
+    def __init__(self, comment_processor, max_concurrency: int = None, max_per_platform: int = None,
+                 max_retries: int = 5, base_backoff: float = 2.0, max_backoff: float = 60.0):
+        """Initialize engine with concurrency limits and rate-limit back-off settings"""
+        self.comment_processor = comment_processor
+        self.max_concurrency = max_concurrency or int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+        self.max_per_platform = max_per_platform or int(
+            os.getenv("AI_MAX_CONCURRENCY_PER_PLATFORM", str(max(1, self.max_concurrency // 2)))
+        )
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        # One long-lived loop keeps the async OpenAI client's connection pool valid between batches
+        self._loop = asyncio.new_event_loop()
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+        self._backoff = base_backoff
+
+        self.stats = {"processed": 0, "errors": 0, "rate_limited": 0}
+
+    def process_batch(self, comments: List[Dict], on_result: Callable[[Dict, Dict], None] = None,
+                      should_process: Callable[[Dict], bool] = None) -> List[Dict]:
+        """Process comments concurrently and return results in input order.
+
+        on_result is called (in a worker thread) as soon as each comment finishes.
+        should_process is checked before a comment starts and again before its side
+        effects; a comment it rejects is skipped and its result left as None.
+        """
+        if not comments:
+            return []
+
+        with self._lock:
+            return self._loop.run_until_complete(self._process_batch(comments, on_result, should_process))
+
+    async def _process_batch(self, comments: List[Dict], on_result, should_process) -> List[Dict]:
+        """Run a fixed pool of workers over the fair queue"""
+        results = [None] * len(comments)
+        queue = _FairQueue(comments, self.max_per_platform)
+        condition = asyncio.Condition()
+
+        async def worker():
+            while True:
+                async with condition:
+                    item = queue.next_item()
+                    while item is None and queue.has_pending():
+                        await condition.wait()
+                        item = queue.next_item()
+                    if item is None:
+                        return
+
+                platform, index = item
+                try:
+                    if should_process and not should_process(comments[index]):
+                        logger.info(f"Skipping comment {comments[index].get('id')}, no longer ours to process")
+                        continue
+                    results[index] = await self._process_with_backoff(comments[index], should_process)
+                    if on_result:
+                        await asyncio.to_thread(on_result, comments[index], results[index])
+                except Exception as e:
+                    logger.error(f"Result handling failed for comment {comments[index].get('id')}: {e}")
+                finally:
+                    async with condition:
+                        queue.in_flight[platform] -= 1
+                        condition.notify_all()
+
+        worker_count = min(self.max_concurrency, len(comments))
+        await asyncio.gather(*(worker() for _ in range(worker_count)))
+
+        logger.info(f"Processed batch of {len(comments)} comments with {worker_count} workers")
+        return results
+
+    async def _process_with_backoff(self, comment_data: Dict,
+                                    should_process: Callable[[Dict], bool] = None) -> Dict:
+        """Process a comment, pausing every worker while the provider is rate limiting"""
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_backoff()
+            try:
+                result = await self.comment_processor.aprocess_comment(comment_data, should_finalize=should_process)
+                self._backoff = self.base_backoff
+
+                if result.get("status") == "error":
+                    self.stats["errors"] += 1
+                elif result.get("status") == "skipped":
+                    pass
+                else:
+                    self.stats["processed"] += 1
+                return result
+
+            except openai.RateLimitError as e:
+                self.stats["rate_limited"] += 1
+                delay = self._retry_after(e) or self._backoff
+                delay = min(delay, self.max_backoff) * (1 + random.uniform(0, 0.25))
+                self._resume_at = max(self._resume_at, loop.time() + delay)
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+                logger.warning(f"LLM rate limited (attempt {attempt + 1}), pausing for {delay:.1f}s")
+
+        self.stats["errors"] += 1
+        return self.comment_processor._error_result(
+            comment_data, RuntimeError(f"Rate limited after {self.max_retries} retries")
+        )
+
+    async def _wait_for_backoff(self):
+        """Sleep until the shared rate-limit pause has expired"""
+        loop = asyncio.get_running_loop()
+        while True:
+            remaining = self._resume_at - loop.time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    def _retry_after(self, error: openai.RateLimitError) -> Optional[float]:
+        """Read the provider's retry-after hint, if any"""
+        try:
+            return float(error.response.headers.get("retry-after"))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def close(self):
+        """Close the event loop"""
+        with self._lock:
+            self._loop.close()
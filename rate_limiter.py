@@ -0,0 +1,304 @@
+# rate_limiter.py - Token-bucket rate limiting and quota budgeting for platform API calls
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+class QuotaExceededError(Exception):
+    """Raised when a call would wait longer than allowed for rate limit or quota budget"""
+
+
+# Per-platform defaults: steady request rate, burst size, daily quota units and per-operation cost.
+# YouTube Data API v3 bills quota units per method (10,000/day by default); the others are header driven.
+DEFAULT_LIMITS = {
+    "youtube": {
+        "rate": 5.0, "burst": 10, "daily_quota": 10000,
+        "costs": {"list": 1, "comments.insert": 50}
+    },
+    "graph": {"rate": 5.0, "burst": 10, "daily_quota": None, "costs": {}},
+    "twitter": {"rate": 1.0, "burst": 5, "daily_quota": None, "costs": {}},
+    "linkedin": {"rate": 2.0, "burst": 5, "daily_quota": None, "costs": {}}
+}
+
+# YouTube quotas reset at midnight Pacific time, daylight saving included
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+# Graph API usage percentage above which calls are slowed down, and at which they pause
+GRAPH_USAGE_SLOWDOWN = 75
+GRAPH_USAGE_PAUSE = 95
+
+
+class RateLimiter:
+    def __init__(self, name: str, rate: float, burst: int, daily_quota: Optional[int] = None,
+                 costs: Dict[str, int] = None, max_wait: float = None):
+        """Initialize a token bucket with an optional daily quota budget"""
+        self.name = name
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.daily_quota = daily_quota
+        self.costs = costs or {}
+        self.max_wait = max_wait or float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0  # wall-clock time
+        self._quota_used = 0
+        self._quota_day = self._quota_period()
+        # With a shared store (the DatabaseManager) quota usage is counted across processes and restarts
+        self.quota_store = None
+        self.quota_sync_seconds = float(os.getenv("QUOTA_SYNC_SECONDS", "30"))
+        self._quota_synced = 0.0
+        self.usage_percent = 0.0  # provider-reported usage, when the provider reports it
+        self.stats = {"calls": 0, "throttled": 0, "wait_time": 0.0, "rejected": 0}
+
+    def _quota_now(self) -> datetime:
+        return datetime.now(QUOTA_TIMEZONE)
+
+    def _quota_period(self) -> str:
+        """Quota day; YouTube quotas reset at midnight Pacific time"""
+        return self._quota_now().strftime("%Y-%m-%d")
+
+    def _seconds_until_quota_reset(self) -> float:
+        now = self._quota_now()
+        tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        # Compared in UTC: the day before a DST change is 23 or 25 hours long
+        return (tomorrow.astimezone(timezone.utc) - now.astimezone(timezone.utc)).total_seconds()
+
+    def _refill(self):
+        """Add tokens for the time elapsed; caller holds the lock"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+        if self._quota_day != self._quota_period():
+            self._quota_day = self._quota_period()
+            self._quota_used = 0
+            self._quota_synced = 0.0
+
+    def set_quota_store(self, store):
+        """Count daily quota in a store shared by every worker process instead of in this process only"""
+        with self._lock:
+            self.quota_store = store
+            self._quota_synced = 0.0
+
+    def _charge_quota(self, cost: int, quota_day: str):
+        """Spend cost units of the daily quota, in the shared store when there is one"""
+        store = self.quota_store
+        if store is not None:
+            try:
+                used = store.charge_api_quota(self.name, quota_day, cost, self.daily_quota)
+            except Exception as e:
+                logger.error(f"Shared {self.name} quota unavailable, counting locally: {e}")
+            else:
+                with self._lock:
+                    if used is None:
+                        # Other workers spent it; refresh the local copy on the next call
+                        self._quota_synced = 0.0
+                        self.stats["rejected"] += 1
+                        raise QuotaExceededError(f"{self.name} daily quota exhausted across workers ({self.daily_quota} units)")
+                    self._quota_used = used
+                    self._quota_synced = time.monotonic()
+                return
+
+        with self._lock:
+            self._quota_used += cost
+
+    def _sync_quota(self):
+        """Refresh usage from the shared store when the local copy is stale (other workers spend it too)"""
+        store = self.quota_store
+        if store is None or not self.daily_quota or time.monotonic() - self._quota_synced < self.quota_sync_seconds:
+            return
+        quota_day = self._quota_period()
+        try:
+            used = store.get_api_quota_usage(self.name, quota_day)
+        except Exception as e:
+            logger.error(f"Failed to read shared {self.name} quota usage: {e}")
+            return
+        with self._lock:
+            if self._quota_day == quota_day:
+                self._quota_used = used
+                self._quota_synced = time.monotonic()
+
+    def acquire(self, operation: str = None, cost: int = None):
+        """Block until a call is allowed and charge its quota cost.
+
+        Raises QuotaExceededError instead of waiting longer than max_wait, or when the
+        daily quota cannot cover the call.
+        """
+        cost = cost if cost is not None else self.costs.get(operation, 1)
+        started = time.monotonic()
+        self._sync_quota()
+
+        while True:
+            with self._lock:
+                self._refill()
+
+                if self.daily_quota is not None and self._quota_used + cost > self.daily_quota:
+                    self.stats["rejected"] += 1
+                    raise QuotaExceededError(
+                        f"{self.name} daily quota exhausted ({self._quota_used}/{self.daily_quota} units)"
+                    )
+
+                wait = max(self._paused_until - time.time(), 0.0)
+                if not wait and self._tokens >= 1:
+                    self._tokens -= 1
+                    self.stats["calls"] += 1
+                    waited = time.monotonic() - started
+                    if waited > 0.001:
+                        self.stats["throttled"] += 1
+                        self.stats["wait_time"] += waited
+                    quota_day = self._quota_day
+                    break
+
+                wait = wait or (1 - self._tokens) / self.rate
+                if time.monotonic() - started + wait > self.max_wait:
+                    self.stats["rejected"] += 1
+                    raise QuotaExceededError(f"{self.name} rate limited for another {wait:.0f}s")
+
+            time.sleep(wait)
+
+        if self.daily_quota is not None:
+            # Charged outside the lock: the shared store is a database round trip
+            self._charge_quota(cost, quota_day)
+
+    def pause(self, seconds: float):
+        """Stop issuing calls for a while (provider asked us to back off)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.time() + seconds)
+        logger.warning(f"{self.name} API calls paused for {seconds:.0f}s")
+
+    def exhaust_quota(self):
+        """Mark today's quota as spent after the provider rejected a call for quota"""
+        with self._lock:
+            if self.daily_quota is not None:
+                self._quota_used = self.daily_quota
+            quota_day = self._quota_day
+        if self.quota_store is not None and self.daily_quota is not None:
+            try:
+                self.quota_store.exhaust_api_quota(self.name, quota_day, self.daily_quota)
+            except Exception as e:
+                logger.error(f"Failed to record exhausted {self.name} quota: {e}")
+        self.pause(self._seconds_until_quota_reset())
+
+    def update_from_headers(self, headers):
+        """Adapt to rate-limit headers from Graph API (usage percentages) or Twitter (remaining/reset)"""
+        try:
+            usage_headers = [headers.get("x-app-usage"), headers.get("x-business-use-case-usage")]
+            if any(usage_headers):
+                self._update_from_graph_usage(usage_headers)
+
+            remaining = headers.get("x-rate-limit-remaining")
+            reset = headers.get("x-rate-limit-reset")
+            if remaining is not None and reset is not None:
+                limit = headers.get("x-rate-limit-limit")
+                if limit:
+                    self.usage_percent = 100.0 * (1 - int(remaining) / max(int(limit), 1))
+                if int(remaining) <= 0:
+                    self.pause(max(float(reset) - time.time(), 1.0))
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Unreadable rate-limit headers for {self.name}: {e}")
+
+    def _update_from_graph_usage(self, usage_headers):
+        """Slow down as Graph API usage approaches 100%, pausing near the limit"""
+        usage = 0.0
+        regain_minutes = 0
+        for header in usage_headers:
+            if not header:
+                continue
+            data = json.loads(header)
+            # Business use case usage is keyed by business id, each holding a list of usage entries
+            entries = [entry for values in data.values() for entry in values] if "call_count" not in data else [data]
+            for entry in entries:
+                usage = max(usage, *(float(entry.get(key, 0)) for key in ("call_count", "total_time", "total_cputime")))
+                regain_minutes = max(regain_minutes, int(entry.get("estimated_time_to_regain_access", 0)))
+
+        self.usage_percent = usage
+        with self._lock:
+            if usage >= GRAPH_USAGE_SLOWDOWN:
+                remaining_share = max(100 - usage, 1) / (100 - GRAPH_USAGE_SLOWDOWN)
+                self.rate = self.base_rate * min(remaining_share, 1.0)
+            else:
+                self.rate = self.base_rate
+
+        if usage >= GRAPH_USAGE_PAUSE or regain_minutes:
+            self.pause(max(regain_minutes * 60, 60))
+
+    def remaining_fraction(self) -> float:
+        """Share of budget left (0.0-1.0), from the daily quota or provider-reported usage"""
+        self._sync_quota()
+        with self._lock:
+            self._refill()
+            if time.time() < self._paused_until:
+                return 0.0
+            fractions = [1.0 - self.usage_percent / 100.0]
+            if self.daily_quota:
+                fractions.append(1.0 - self._quota_used / self.daily_quota)
+        return max(0.0, min(fractions))
+
+    def get_status(self) -> Dict:
+        """Get current rate, quota and pause state"""
+        remaining = self.remaining_fraction()
+        with self._lock:
+            return {
+                "rate": round(self.rate, 3),
+                "tokens": round(self._tokens, 2),
+                "daily_quota": self.daily_quota,
+                "quota_used": self._quota_used,
+                "quota_shared": self.quota_store is not None,
+                "usage_percent": round(self.usage_percent, 1),
+                "remaining_fraction": round(remaining, 3),
+                "paused_for": max(0.0, round(self._paused_until - time.time(), 1)),
+                **self.stats
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+_quota_store = None
+
+
+def get_rate_limiter(name: str) -> RateLimiter:
+    """Get the process-wide limiter for an API, so every integrator instance shares one budget.
+
+    Defaults can be overridden with <NAME>_RATE_PER_SECOND, <NAME>_RATE_BURST and <NAME>_DAILY_QUOTA.
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            defaults = DEFAULT_LIMITS.get(name, {"rate": 2.0, "burst": 5, "daily_quota": None, "costs": {}})
+            prefix = name.upper()
+            daily_quota = os.getenv(f"{prefix}_DAILY_QUOTA", defaults["daily_quota"])
+            _limiters[name] = RateLimiter(
+                name,
+                rate=float(os.getenv(f"{prefix}_RATE_PER_SECOND", defaults["rate"])),
+                burst=int(os.getenv(f"{prefix}_RATE_BURST", defaults["burst"])),
+                daily_quota=int(daily_quota) if daily_quota else None,
+                costs=defaults["costs"]
+            )
+            if _quota_store is not None:
+                _limiters[name].set_quota_store(_quota_store)
+        return _limiters[name]
+
+
+def set_quota_store(store):
+    """Share daily quota usage of every limiter, present and future, through store (a DatabaseManager)"""
+    global _quota_store
+    with _limiters_lock:
+        _quota_store = store
+        limiters = list(_limiters.values())
+    for limiter in limiters:
+        limiter.set_quota_store(store)
+
+
+def get_all_statuses() -> Dict[str, Dict]:
+    """Get the status of every limiter created in this process"""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.get_status() for name, limiter in limiters.items()}
@@ -2,10 +2,18 @@
 import schedule
 import time
 import threading
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import asyncio
+import json
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+from .processing_engine import CommentProcessingEngine
+from .rate_limiter import get_all_statuses as get_rate_limit_statuses, set_quota_store
+from .circuit_breaker import OPEN, get_all_statuses as get_circuit_statuses, get_circuit_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +24,7 @@ class TaskScheduler:
         self.db = database_manager
         self.running = False
         self.scheduler_thread = None
+        self.job_worker_thread = None
         self.error_count = {}  # Track errors per platform
         self.max_retries = 3
         
@@ -25,13 +34,62 @@ class TaskScheduler:
         # Real-time update callbacks
         self.update_callbacks = []
 
+        # Concurrent AI processing of fetched comments
+        self.processing_engine = CommentProcessingEngine(comment_processor)
+        
+        # Generated replies are buffered and written in bulk
+        self.reply_flush_size = 50
+        self._reply_buffer = []
+        self._reply_buffer_lock = threading.Lock()
+        
+        # Platforms are fetched concurrently, each bounded by its own timeout
+        self.fetch_timeout = float(os.getenv("FETCH_TIMEOUT_SECONDS", "120"))
+        self.platform_timeouts = {}
+        self.fetch_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="platform-fetch")
+        self._fetches_in_flight = {}
+        
+        # Posts within a platform are fetched concurrently up to this limit.
+        # The YouTube integrator keeps a client per thread, so its videos are paged in parallel.
+        # Facebook and Instagram bundle all posts into Graph API batch calls instead,
+        # and Twitter ORs conversation ids into a few searches.
+        self.post_fetch_concurrency = {"youtube": int(os.getenv("YOUTUBE_FETCH_CONCURRENCY", "4"))}
+        self.default_post_fetch_concurrency = 4
+        
+        # Fetchers enqueue new comments; a worker leases them from the durable job queue
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.job_batch_size = int(os.getenv("JOB_BATCH_SIZE", str(self.processing_engine.max_concurrency * 2)))
+        self.job_visibility_timeout = float(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "300"))
+        self.job_max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+        self.job_retry_delay = float(os.getenv("JOB_RETRY_DELAY_SECONDS", "30"))
+        self.job_poll_interval = float(os.getenv("JOB_POLL_SECONDS", "2"))
+        # Leases on the running batch are renewed well inside the visibility timeout;
+        # a job another worker took over is tracked as lost and its side effects are skipped
+        self._leased_jobs = set()
+        self._lost_jobs = set()
+        self._job_lease_lock = threading.Lock()
+        # Job workers pick up keyword sets edited from the dashboard/API on this interval
+        self.keyword_reload_seconds = float(os.getenv("KEYWORD_RELOAD_SECONDS", "60"))
+        # Job workers own the LLM circuit, so they publish breaker and limiter state too
+        self.status_publish_seconds = float(os.getenv("STATUS_PUBLISH_SECONDS", "30"))
+        
+        # With several worker processes, a platform is only fetched by the node holding its lease
+        self.fetch_interval_minutes = int(os.getenv("FETCH_INTERVAL_MINUTES", "5"))
+        
+        # Below this share of remaining API budget, only the most engaged posts are fetched.
+        # Daily quotas are counted in the database so every worker process draws on one budget.
+        self.quota_low_watermark = float(os.getenv("QUOTA_LOW_WATERMARK", "0.2"))
+        set_quota_store(self.db)
+        
+        # Dashboard analytics read rollups that one worker refreshes on this interval
+        self.analytics_rollup_minutes = int(os.getenv("ANALYTICS_ROLLUP_MINUTES", "5"))
+
     def setup_integrators(self, api_keys: Dict):
         """Setup platform integrators with validation"""
-        from youtube_integration import YouTubeIntegrator
-        from facebook_integration import FacebookIntegrator
-        from instagram_integration import InstagramIntegrator
-        from linkedin_integration import LinkedInIntegrator
-        from twitter_integration import TwitterIntegrator
+        from .youtube_integration import YouTubeIntegrator
+        from .facebook_integration import FacebookIntegrator
+        from .instagram_integration import InstagramIntegrator
+        from .linkedin_integration import LinkedInIntegrator
+        from .twitter_integration import TwitterIntegrator
         
         # Validate and setup each integrator
         if api_keys.get("youtube_api_key"):
@@ -51,10 +109,34 @@ class TaskScheduler:
             except Exception as e:
                 logger.error(f"Failed to initialize Facebook: {e}")
                 
+        if api_keys.get("instagram_access_token") and api_keys.get("instagram_account_id"):
+            try:
+                self.integrators["instagram"] = InstagramIntegrator(
+                    api_keys["instagram_access_token"],
+                    api_keys["instagram_account_id"]
+                )
+                logger.info("Instagram integrator initialized")
+            except Exception as e:
+                logger.error(f"Failed to initialize Instagram: {e}")
+                
+        if api_keys.get("twitter_bearer_token") and api_keys.get("twitter_username"):
+            try:
+                self.integrators["twitter"] = TwitterIntegrator(
+                    api_keys["twitter_bearer_token"],
+                    api_keys.get("twitter_api_key"),
+                    api_keys.get("twitter_api_secret"),
+                    api_keys.get("twitter_access_token"),
+                    api_keys.get("twitter_access_token_secret"),
+                    username=api_keys["twitter_username"]
+                )
+                logger.info("Twitter integrator initialized")
+            except Exception as e:
+                logger.error(f"Failed to initialize Twitter: {e}")
+                
         # Similar setup for other platforms...
 
     def register_update_callback(self, callback):
-        """Register callback for real-time updates"""
+        """Register callback for real-time updates in this process (other processes follow the event bus)"""
         self.update_callbacks.append(callback)
 
     def _notify_update(self, update_type: str, data: Dict):
@@ -65,16 +147,27 @@ class TaskScheduler:
             except Exception as e:
                 logger.error(f"Callback error: {e}")
 
-    def start_scheduler(self):
-        """Start the background scheduler with error recovery"""
+    def start_scheduler(self, fetch: bool = True, jobs: bool = None):
+        """Start the background scheduler with error recovery.
+        
+        fetch runs the periodic platform fetches and jobs runs the AI job worker; jobs defaults
+        to JOB_WORKER_ENABLED so the dashboard can leave AI work to standalone worker processes.
+        """
+        if jobs is None:
+            jobs = os.getenv("JOB_WORKER_ENABLED", "true").lower() in ("1", "true", "yes")
+        
         if not self.running:
             self.running = True
-            self.scheduler_thread = threading.Thread(
-                target=self._run_scheduler_with_recovery, 
-                daemon=True
-            )
-            self.scheduler_thread.start()
-            logger.info("Task scheduler started with error recovery")
+            if fetch:
+                self.scheduler_thread = threading.Thread(
+                    target=self._run_scheduler_with_recovery, 
+                    daemon=True
+                )
+                self.scheduler_thread.start()
+            if jobs:
+                self.job_worker_thread = threading.Thread(target=self._run_job_worker, daemon=True)
+                self.job_worker_thread.start()
+            logger.info(f"Task scheduler started with error recovery (fetch={fetch}, jobs={jobs})")
 
     def _run_scheduler_with_recovery(self):
         """Run scheduler with automatic recovery from errors"""
@@ -91,139 +184,565 @@ class TaskScheduler:
         self.fetch_all_comments()
         
         # Schedule regular fetches
-        schedule.every(5).minutes.do(self.fetch_all_comments)
-        schedule.every(1).minutes.do(self.process_pending_comments)
+        schedule.every(self.fetch_interval_minutes).minutes.do(self.fetch_all_comments)
+        schedule.every(1).minutes.do(self._run_exclusive, "pending-replies", 60, self.process_pending_comments)
+        schedule.every(self.analytics_rollup_minutes).minutes.do(
+            self._run_exclusive, "analytics-rollup", self.analytics_rollup_minutes * 60, self.refresh_analytics
+        )
         
         while self.running:
             schedule.run_pending()
             time.sleep(1)
 
     def fetch_all_comments(self):
-        """Fetch new comments from all platforms with error isolation"""
+        """Fetch new comments from all platforms concurrently, then process them as one batch"""
         logger.info("Starting scheduled comment fetch")
+        cycle_started = time.monotonic()
+        
+        # Pick up keyword sets edited from the dashboard/API since the last cycle
+        self.comment_processor.ai_processor.reload_keywords(self.db)
         
+        futures = {}
         for platform, integrator in self.integrators.items():
+            previous = self._fetches_in_flight.get(platform)
+            if previous and not previous.done():
+                # A timed-out fetch from an earlier cycle is still running
+                logger.warning(f"{platform} fetch still in flight from a previous cycle, skipping")
+                continue
+            
+            # A platform whose circuit is open is skipped without taking its lease or waiting on its timeout
+            breaker = get_circuit_breaker(f"platform:{platform}")
+            if breaker.is_open():
+                logger.info(f"{platform} circuit open, skipping fetch")
+                continue
+            
+            # The lease outlives one interval, so its holder keeps renewing it and others take over if it dies
+            lease_ttl = self.fetch_interval_minutes * 60 + self.platform_timeouts.get(platform, self.fetch_timeout)
+            if not self._acquire_lease(f"fetch:{platform}", lease_ttl):
+                logger.info(f"{platform} is being fetched by another worker, skipping")
+                continue
+            
+            # Claimed only once the lease is held, so a half-open trial is never taken and then not made
+            if not breaker.allow_request():
+                logger.info(f"{platform} circuit trial already in flight, skipping fetch")
+                self._release_lease(f"fetch:{platform}")
+                continue
+            
+            futures[platform] = self.fetch_executor.submit(self._fetch_platform_comments, platform, integrator)
+            self._fetches_in_flight[platform] = futures[platform]
+        
+        fetched = {}
+        for platform, future in futures.items():
+            timeout = self.platform_timeouts.get(platform, self.fetch_timeout)
+            remaining = max(0.0, cycle_started + timeout - time.monotonic())
             try:
-                self._fetch_platform_comments(platform, integrator)
+                fetched[platform] = future.result(timeout=remaining)
                 # Reset error count on success
                 self.error_count[platform] = 0
+                get_circuit_breaker(f"platform:{platform}").record_success()
+            except FuturesTimeoutError:
+                self._handle_platform_error(platform, TimeoutError(f"fetch exceeded {timeout:.0f}s"))
             except Exception as e:
                 self._handle_platform_error(platform, e)
+        
+        # Process every platform's new comments together so the engine can interleave them fairly
+        self._process_comments([comment for new_comments, _, _ in fetched.values() for comment in new_comments])
+        
+        # Persist high-water marks only after the batch was handled
+        for platform, (_, updated_cursors, fetch_started) in fetched.items():
+            try:
+                self.db.update_fetch_cursors(platform, updated_cursors)
+                self.db.update_last_check_time(platform, fetch_started)
+            except Exception as e:
+                logger.error(f"Failed to save fetch cursors for {platform}: {e}")
+        
+        self._publish_status()
+        
+        logger.info(f"Comment fetch cycle finished in {time.monotonic() - cycle_started:.1f}s")
+
+    def _publish_status(self):
+        """Publish API budgets, circuit states and AI fast-path stats for the dashboard/API, which run in other processes"""
+        ai_processor = self.comment_processor.ai_processor
+        try:
+            self.db.set_setting(f"rate_limits:{self.worker_id}", json.dumps(get_rate_limit_statuses()))
+            self.db.set_setting(f"circuits:{self.worker_id}", json.dumps(get_circuit_statuses()))
+            self.db.set_setting(f"llm_cache:{self.worker_id}", json.dumps(ai_processor.cache.get_stats()))
+            self.db.set_setting(f"local_classifier:{self.worker_id}",
+                                json.dumps(ai_processor.local_classifier.get_stats()))
+        except Exception as e:
+            logger.error(f"Failed to publish worker status: {e}")
+
+    def _acquire_lease(self, name: str, ttl: float) -> bool:
+        """Take or renew a cluster-wide lease for this worker"""
+        try:
+            return self.db.acquire_lease(name, self.worker_id, ttl)
+        except Exception as e:
+            logger.error(f"Failed to acquire lease {name}: {e}")
+            return False
+
+    def _release_lease(self, name: str):
+        """Give up a cluster-wide lease so another worker can take it right away"""
+        try:
+            self.db.release_lease(name, self.worker_id)
+        except Exception as e:
+            logger.error(f"Failed to release lease {name}: {e}")
+
+    def _run_exclusive(self, name: str, ttl: float, task):
+        """Run a periodic task only on the worker that holds its lease"""
+        if self._acquire_lease(name, ttl):
+            task()
 
     def _handle_platform_error(self, platform: str, error: Exception):
-        """Handle platform-specific errors with retry logic"""
+        """Handle platform-specific errors; repeated failures open the platform's circuit with backoff"""
         self.error_count[platform] = self.error_count.get(platform, 0) + 1
         
-        if self.error_count[platform] >= self.max_retries:
-            logger.error(f"{platform} failed {self.max_retries} times. Disabling temporarily.")
-            # Implement exponential backoff or temporary disable
+        breaker = get_circuit_breaker(f"platform:{platform}")
+        breaker.record_failure(error)
+        if breaker.state == OPEN:
+            logger.error(f"{platform} failed {self.error_count[platform]} times. Disabling for {breaker.get_status()['retry_in']:.0f}s.")
         else:
             logger.warning(f"{platform} error (attempt {self.error_count[platform]}): {error}")
 
-    def _fetch_platform_comments(self, platform: str, integrator):
-        """Fetch comments for specific platform with streaming updates"""
-        last_check = self.db.get_last_check_time(platform) or datetime.now() - timedelta(hours=2)
+    def _fetch_platform_comments(self, platform: str, integrator) -> Tuple[List[Dict], Dict, datetime]:
+        """Fetch comments newer than each post's cursor; returns (new comments, next cursors, fetch start)"""
+        fetch_started = datetime.now(timezone.utc)
+        default_since = self.db.get_last_check_time(platform) or fetch_started - timedelta(hours=2)
+        cursors = self.db.get_fetch_cursors(platform)
+        posts = self._prioritize_posts(platform, integrator, self._list_recent_posts(platform, integrator))
+        
+        def fetch_post(post):
+            post_id, post_data = post
+            cursor = cursors.get(post_id, {})
+            since = cursor.get("last_seen_at") or default_since
+            comments, page_token = self._fetch_new_post_comments(platform, integrator, post_id, since, cursor)
+            return post_id, post_data, comments, self._advance_cursor(cursor, comments, page_token, since)
         
+        if platform in ("facebook", "instagram", "twitter"):
+            results = self._fetch_batched_post_comments(platform, integrator, posts, cursors, default_since)
+        else:
+            max_workers = self.post_fetch_concurrency.get(platform, self.default_post_fetch_concurrency)
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{platform}-posts") as executor:
+                results = list(executor.map(fetch_post, posts))
+        
+        new_comments = []
+        updated_cursors = {}
+        for post_id, post_data, comments, next_cursor in results:
+            new_comments.extend(self._build_comment_data(comment, platform, post_data) for comment in comments)
+            updated_cursors[post_id] = next_cursor
+        
+        logger.info(f"Fetched {len(new_comments)} new {platform} comments from {len(posts)} posts")
+        return new_comments, updated_cursors, fetch_started
+
+    def _list_recent_posts(self, platform: str, integrator) -> List[Tuple[str, Dict]]:
+        """List (post_id, post_data) for the recent posts whose comments are watched"""
         if platform == "youtube":
-            videos = integrator.get_channel_videos(max_results=10)
-            
-            for video in videos:
-                comments = integrator.get_video_comments(video["video_id"])
-                
-                for comment in comments:
-                    # Filter new comments
-                    comment_time = datetime.fromisoformat(comment["published_at"].replace('Z', '+00:00'))
-                    if comment_time > last_check:
-                        self._process_single_comment(comment, platform, video)
-                        
+            return [(video["video_id"], video) for video in integrator.get_channel_videos(max_results=10)]
         elif platform == "facebook":
-            posts = integrator.get_page_posts(limit=10)
-            
-            for post in posts:
-                comments = integrator.get_post_comments(post["id"])
-                
-                for comment in comments:
-                    comment_time = datetime.fromisoformat(comment["published_at"])
-                    if comment_time > last_check:
-                        self._process_single_comment(comment, platform, post)
-                        
+            return [(post["id"], post) for post in integrator.get_page_posts(limit=10)]
+        elif platform == "instagram":
+            return [(media["id"], media) for media in integrator.get_recent_media(limit=10)]
+        elif platform == "twitter":
+            return [(str(tweet["id"]), tweet) for tweet in integrator.get_user_tweets(max_results=10)]
+        
         # Similar for other platforms...
+        return []
+
+    def _prioritize_posts(self, platform: str, integrator, posts: List[Tuple[str, Dict]]) -> List[Tuple[str, Dict]]:
+        """When the platform's API budget runs low, keep only the most engaged posts"""
+        rate_limiter = getattr(integrator, "rate_limiter", None)
+        if not rate_limiter or not posts:
+            return posts
         
-        # Update last check time
-        self.db.update_last_check_time(platform, datetime.now())
+        remaining = rate_limiter.remaining_fraction()
+        if remaining >= self.quota_low_watermark:
+            return posts
+        
+        # Shrink the post list in proportion to the budget left; the sort is stable so recency breaks ties
+        keep = max(1, int(len(posts) * remaining / self.quota_low_watermark))
+        ranked = sorted(posts, key=lambda post: self._post_engagement(platform, post[1]), reverse=True)
+        logger.warning(f"{platform} API budget at {remaining:.0%}, fetching only the top {keep} of {len(posts)} posts")
+        return ranked[:keep]
 
-    def _process_single_comment(self, comment: Dict, platform: str, post_data: Dict):
-        """Process single comment and notify dashboard"""
-        try:
-            # Format comment data
-            comment_data = {
-                "id": comment["id"],
-                "text": comment["text"],
-                "platform": platform,
-                "commenter": {
-                    "name": comment.get("author", comment.get("username", "Unknown")),
-                    "id": comment.get("author_id", comment.get("author_channel_id"))
-                },
-                "post_context": self._get_post_context(platform, post_data),
-                "published_at": comment.get("published_at"),
-                "metrics": {
-                    "likes": comment.get("like_count", 0),
-                    "replies": comment.get("reply_count", 0)
-                }
+    def _post_engagement(self, platform: str, post_data: Dict) -> int:
+        """Rough engagement score of a post from the data its listing already returned"""
+        if platform == "twitter":
+            metrics = post_data.get("public_metrics") or {}
+            return metrics.get("reply_count", 0) * 2 + metrics.get("like_count", 0)
+        elif platform in ("facebook", "instagram"):
+            return len((post_data.get("comments") or {}).get("data", []))
+        # YouTube listings carry no statistics; keep the newest-first order
+        return 0
+
+    def _fetch_batched_post_comments(self, platform: str, integrator, posts: List[Tuple[str, Dict]],
+                                     cursors: Dict[str, Dict], default_since: datetime) -> List[Tuple]:
+        """Fetch every post's new comments through the integrator's batch fetcher; returns (post_id, post_data, comments, next cursor)"""
+        since_by_post = {}
+        batch_cursors = {}
+        for post_id, _ in posts:
+            cursor = cursors.get(post_id, {})
+            since_by_post[post_id] = cursor.get("last_seen_at") or default_since
+            batch_cursors[post_id] = {
+                "since": since_by_post[post_id],
+                "after": cursor.get("page_token"),
+                "since_id": cursor.get("last_seen_id")
             }
-            
+        
+        outcomes = integrator.get_comments_batch_since(batch_cursors) if posts else {}
+        
+        # A cycle where every post failed (e.g. an expired token or a 5xx) is a platform failure, not an empty fetch
+        errors = [outcomes.get(post_id) for post_id, _ in posts if not isinstance(outcomes.get(post_id), tuple)]
+        if posts and len(errors) == len(posts):
+            first_error = next((error for error in errors if isinstance(error, Exception)), None)
+            raise RuntimeError(f"All {len(posts)} {platform} post fetches failed: {first_error}") from first_error
+        
+        results = []
+        for post_id, post_data in posts:
+            cursor = cursors.get(post_id, {})
+            since = since_by_post[post_id]
+            outcome = outcomes.get(post_id)
+            if isinstance(outcome, Exception) or outcome is None:
+                # Keep this post's position so the next cycle retries it from the same point
+                logger.warning(f"Skipping {platform} post {post_id} this cycle: {outcome}")
+                results.append((post_id, post_data, [], {**cursor, "last_seen_at": since}))
+                continue
+            comments, page_token = outcome
+            results.append((post_id, post_data, comments, self._advance_cursor(cursor, comments, page_token, since)))
+        return results
+
+    def _fetch_new_post_comments(self, platform: str, integrator, post_id: str, since: datetime,
+                                 cursor: Dict) -> Tuple[List[Dict], Optional[str]]:
+        """Fetch comments on one post past its cursor; returns (comments, resume page token)"""
+        if platform == "youtube":
+            return integrator.get_video_comments_since(post_id, since=since, page_token=cursor.get("page_token"))
+        return [], None
+
+    def _advance_cursor(self, cursor: Dict, comments: List[Dict], page_token: Optional[str],
+                        since: datetime) -> Dict:
+        """Compute a post's next cursor from the comments just fetched"""
+        # Items without a timestamp (e.g. a tweet missing created_at) cannot move the high-water mark
+        dated = [comment for comment in comments if comment.get("published_at")]
+        newest = max(dated, key=lambda c: self._parse_timestamp(c["published_at"]), default=None)
+        newest_at = self._parse_timestamp(newest["published_at"]) if newest else None
+        
+        pending_at = cursor.get("pending_seen_at")
+        pending_at = self._parse_timestamp(pending_at) if pending_at else None
+        if pending_at and (not newest_at or pending_at >= newest_at):
+            # The newest item was seen on the first page of the drain, not in this batch
+            newest_at, newest_id = pending_at, cursor.get("pending_seen_id")
+        else:
+            newest_id = str(newest["id"]) if newest else None
+        
+        if page_token:
+            # Still catching up on older pages: keep the high-water mark until they are drained
+            return {
+                **cursor,
+                "page_token": page_token,
+                "pending_seen_at": newest_at,
+                "pending_seen_id": newest_id
+            }
+        
+        return {
+            "last_seen_at": self._latest(since, newest_at),
+            "last_seen_id": newest_id or cursor.get("last_seen_id"),
+            "page_token": None,
+            "pending_seen_at": None,
+            "pending_seen_id": None
+        }
+
+    def _parse_timestamp(self, value) -> datetime:
+        """Parse integrator timestamps (ISO strings with Z or +0000 offsets) as aware datetimes"""
+        if isinstance(value, datetime):
+            parsed = value
+        else:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+    def _latest(self, *timestamps) -> Optional[datetime]:
+        """Latest of the given timestamps, ignoring missing ones"""
+        present = [self._parse_timestamp(ts) for ts in timestamps if ts]
+        return max(present) if present else None
+
+    def _build_comment_data(self, comment: Dict, platform: str, post_data: Dict) -> Dict:
+        """Format raw integrator comment into the processor's comment data"""
+        return {
+            "id": comment["id"],
+            "text": comment["text"],
+            "platform": platform,
+            "commenter": {
+                "name": comment.get("author", comment.get("username", "Unknown")),
+                "id": comment.get("author_id", comment.get("author_channel_id"))
+            },
+            "post_context": self._get_post_context(platform, post_data),
+            "published_at": comment.get("published_at"),
+            "metrics": {
+                "likes": comment.get("like_count", 0),
+                "replies": comment.get("reply_count", 0)
+            }
+        }
+
+    def _save_new_comments(self, comments: List[Dict]) -> List[Dict]:
+        """Upsert a batch of comments in one transaction; returns only the ones not seen before"""
+        if not comments:
+            return []
+        try:
             # Save to database
-            self.db.save_comment(comment_data)
+            upserted = self.db.upsert_comments_bulk(comments)
+        except Exception as e:
+            logger.error(f"Failed to save {len(comments)} comments: {e}")
+            return []
+        
+        new_comments = []
+        for comment_data, (comment_id, is_new) in zip(comments, upserted):
+            comment_data["comment_id"] = comment_id
+            if not is_new:
+                # Already seen on an earlier fetch, skip notification and LLM work
+                continue
             
             # Notify dashboard in real-time
             self._notify_update("new_comment", comment_data)
+            new_comments.append(comment_data)
+        
+        skipped = len(comments) - len(new_comments)
+        if skipped:
+            logger.info(f"Skipped {skipped} already-seen comments")
+        return new_comments
+
+    def _process_comments(self, comments: List[Dict]):
+        """Save a batch of fetched comments and queue the new ones for AI replies"""
+        saved_comments = self._save_new_comments(comments)
+        if not saved_comments:
+            return
+        
+        # Process based on owner activity
+        if self.db.get_owner_activity():
+            # Mark for manual review
+            logger.info(f"{len(saved_comments)} comments queued for manual review")
+            return
+        
+        # AI processes and auto-replies in the job worker, so slow LLM calls never stall fetching
+        try:
+            self.db.enqueue_comment_jobs(saved_comments, self.job_max_attempts)
+        except Exception as e:
+            logger.error(f"Failed to queue {len(saved_comments)} comments for AI processing: {e}")
+
+    def process_queued_jobs(self, limit: int = None) -> int:
+        """Lease a batch of queued comment jobs and run AI replies on them; returns how many were leased"""
+        jobs = self.db.dequeue_comment_jobs(self.worker_id, limit or self.job_batch_size, self.job_visibility_timeout)
+        if not jobs:
+            return 0
+        
+        comments = []
+        for job in jobs:
+            comment_data = dict(job["payload"])
+            comment_data["job_id"] = job["job_id"]
+            comment_data["job_attempts"] = job["attempts"]
+            comments.append(comment_data)
+        
+        with self._job_lease_lock:
+            self._leased_jobs = {job["job_id"] for job in jobs}
+            self._lost_jobs = set()
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_job_leases, args=(stop_heartbeat,), daemon=True)
+        heartbeat.start()
+        
+        try:
+            # Classify the whole batch up front so comments needing the LLM share a few requests
+            if not self.comment_processor.oneshot_analysis:
+                self._classify_comments(comments)
             
-            # Process based on owner activity
-            owner_active = self.db.get_owner_activity()
+            # Jobs are settled as results come in; any left unsettled become visible again after their lease
+            self.processing_engine.process_batch(comments, on_result=self._handle_ai_result,
+                                                 should_process=self._holds_job_lease)
+            self._flush_replies()
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+            with self._job_lease_lock:
+                self._leased_jobs = set()
+                self._lost_jobs = set()
+        return len(jobs)
+
+    def _heartbeat_job_leases(self, stop: threading.Event):
+        """Keep renewing the running batch's leases until it finishes"""
+        while not stop.wait(self.job_visibility_timeout / 3):
+            self._renew_job_leases()
+
+    def _renew_job_leases(self):
+        """Extend this worker's leases on unsettled jobs, marking any taken over by another worker as lost"""
+        with self._job_lease_lock:
+            job_ids = list(self._leased_jobs)
+        if not job_ids:
+            return
+        try:
+            held = set(self.db.renew_comment_job_leases(self.worker_id, job_ids, self.job_visibility_timeout))
+        except Exception as e:
+            logger.error(f"Failed to renew {len(job_ids)} job leases: {e}")
+            return
+        
+        with self._job_lease_lock:
+            # Jobs settled while the renewal ran are no longer leased, which is not a loss
+            lost = (set(job_ids) - held) & self._leased_jobs
+            self._leased_jobs -= lost
+            self._lost_jobs |= lost
+        if lost:
+            logger.warning(f"Lost the lease on {len(lost)} comment jobs to another worker, skipping their side effects")
+
+    def _holds_job_lease(self, comment_data: Dict) -> bool:
+        """Whether this worker may still act on a comment; comments not from the job queue always may"""
+        job_id = comment_data.get("job_id")
+        if job_id is None:
+            return True
+        with self._job_lease_lock:
+            return job_id not in self._lost_jobs
+
+    def _release_jobs(self, job_ids: List[int]):
+        """Stop renewing settled jobs"""
+        with self._job_lease_lock:
+            self._leased_jobs.difference_update(job_ids)
+
+    def _run_job_worker(self):
+        """Drain the comment job queue until the scheduler stops"""
+        keywords_reloaded_at = status_published_at = None
+        while self.running:
+            try:
+                # Jobs-only workers never run a fetch cycle, so keyword edits are reloaded here too
+                if keywords_reloaded_at is None or time.monotonic() - keywords_reloaded_at >= self.keyword_reload_seconds:
+                    self.comment_processor.ai_processor.reload_keywords(self.db)
+                    keywords_reloaded_at = time.monotonic()
+                if status_published_at is None or time.monotonic() - status_published_at >= self.status_publish_seconds:
+                    self._publish_status()
+                    status_published_at = time.monotonic()
+                
+                if not self.process_queued_jobs():
+                    time.sleep(self.job_poll_interval)
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+                time.sleep(self.job_poll_interval)
+
+    def _fail_job(self, comment_data: Dict, error: str):
+        """Release a comment's job for a backed-off retry"""
+        job_id = comment_data.get("job_id")
+        if job_id is None:
+            return
+        retry_delay = min(self.job_retry_delay * 2 ** (comment_data.get("job_attempts", 1) - 1), 3600)
+        try:
+            if self.db.fail_comment_job(job_id, self.worker_id, error, retry_delay) is None:
+                logger.warning(f"Job {job_id} was taken over by another worker, leaving it to them")
+        except Exception as e:
+            logger.error(f"Failed to release job {job_id}: {e}")
+        self._release_jobs([job_id])
+
+    def _classify_comments(self, comments: List[Dict]):
+        """Attach batched classifications; comments left unclassified are classified individually"""
+        try:
+            classifications = self.comment_processor.ai_processor.classify_comments(comments)
+            for comment_data, (comment_type, metadata) in zip(comments, classifications):
+                comment_data["classification"] = {"type": comment_type.value, "metadata": metadata}
+        except Exception as e:
+            logger.error(f"Batch classification failed, classifying per comment: {e}")
+
+    def _process_single_comment(self, comment: Dict, platform: str, post_data: Dict):
+        """Process single comment and notify dashboard"""
+        try:
+            # Format comment data
+            comment_data = self._build_comment_data(comment, platform, post_data)
             
-            if not owner_active:
-                # AI processes and auto-replies
-                self._process_ai_reply(comment_data)
-            else:
-                # Mark for manual review
-                logger.info(f"Comment {comment['id']} queued for manual review")
+            # Save, then queue for AI or leave for manual review
+            self._process_comments([comment_data])
                 
         except Exception as e:
             logger.error(f"Failed to process comment {comment.get('id')}: {e}")
 
     def _process_ai_reply(self, comment_data: Dict):
         """Process AI reply with approval workflow"""
+        # Generate AI response
+        result = self.comment_processor.process_comment(comment_data)
+        self._handle_ai_result(comment_data, result)
+        self._flush_replies()
+
+    def _handle_ai_result(self, comment_data: Dict, result: Dict):
+        """Buffer the AI reply for the next bulk save"""
+        if result.get("status") == "skipped":
+            return
+        if result.get("status") == "error":
+            logger.error(f"AI processing failed for comment {comment_data.get('id')}: {result.get('error')}")
+            self._fail_job(comment_data, result.get("error", "unknown error"))
+            return
+        
+        generated = result.get("reply_data", {})
+        if result.get("ghl_request"):
+            # Run by _flush_replies after the job completes
+            comment_data["ghl_request"] = result["ghl_request"]
+        
+        reply_data = {
+            "comment_id": comment_data.get("comment_id", comment_data["id"]),
+            "reply": result["reply"],
+            "platform": comment_data["platform"],
+            "status": "pending" if result.get("needs_approval") else "auto_approved",
+            "source": "ai",
+            "confidence": generated.get("confidence", 0.0),
+            "ghl_triggers": generated.get("ghl_triggers", {})
+        }
+        
+        with self._reply_buffer_lock:
+            self._reply_buffer.append((comment_data, reply_data))
+            should_flush = len(self._reply_buffer) >= self.reply_flush_size
+        
+        if should_flush:
+            self._flush_replies()
+
+    def _flush_replies(self):
+        """Save buffered replies in one transaction, notify dashboard and auto-post approved ones"""
+        with self._reply_buffer_lock:
+            buffered, self._reply_buffer = self._reply_buffer, []
+        if not buffered:
+            return
+        
+        # Confirm the leases right before the side effects; a job another worker took over is left to it
+        self._renew_job_leases()
+        owned = [(comment_data, reply_data) for comment_data, reply_data in buffered if self._holds_job_lease(comment_data)]
+        if len(owned) < len(buffered):
+            logger.warning(f"Dropping {len(buffered) - len(owned)} replies whose jobs were taken over by another worker")
+        buffered = owned
+        if not buffered:
+            return
+        
         try:
-            # Generate AI response
-            result = self.comment_processor.process_comment(comment_data)
-            
-            # Save reply to database
-            reply_data = {
-                "comment_id": comment_data["id"],
-                "reply": result["reply"]["reply"],
-                "platform": comment_data["platform"],
-                "status": "pending" if result["reply"]["needs_approval"] else "auto_approved",
-                "source": "ai",
-                "confidence": result["reply"].get("confidence", 0.0),
-                "ghl_triggers": result["reply"].get("ghl_triggers", {})
-            }
-            
-            reply_id = self.db.save_reply(reply_data)
-            
+            # Save replies to database
+            reply_ids = self.db.save_replies_bulk([reply_data for _, reply_data in buffered])
+        except Exception as e:
+            logger.error(f"Failed to save {len(buffered)} AI replies: {e}")
+            for comment_data, _ in buffered:
+                self._fail_job(comment_data, f"reply save failed: {e}")
+            return
+        
+        # The reply is durable now, so its job is done even if posting fails below
+        job_ids = [comment_data["job_id"] for comment_data, _ in buffered if comment_data.get("job_id") is not None]
+        completed = set(job_ids)
+        try:
+            completed = set(self.db.complete_comment_jobs(job_ids, self.worker_id))
+            if len(completed) < len(job_ids):
+                logger.warning(f"{len(job_ids) - len(completed)} comment jobs were taken over before completing, not posting their replies")
+        except Exception as e:
+            logger.error(f"Failed to complete {len(job_ids)} comment jobs: {e}")
+        self._release_jobs(job_ids)
+        
+        for (comment_data, reply_data), reply_id in zip(buffered, reply_ids):
             # Notify dashboard of new reply
             self._notify_update("new_reply", {
                 "reply_id": reply_id,
                 **reply_data
             })
             
-            # Auto-post if approved
-            if reply_data["status"] == "auto_approved":
-                self._post_reply_to_platform(comment_data, reply_data["reply"])
-                
-        except Exception as e:
-            logger.error(f"AI reply generation failed: {e}")
+            # GHL contact/workflows and auto-post only run once the job is settled, unless its new
+            # owner will run its own
+            taken_over = comment_data.get("job_id") is not None and comment_data["job_id"] not in completed
+            if comment_data.get("job_id") is not None and not taken_over:
+                self.comment_processor.run_ghl_integration(comment_data)
+            if reply_data["status"] == "auto_approved" and not taken_over:
+                self._post_reply_to_platform(comment_data, reply_data["reply"], reply_id)
 
-    def _post_reply_to_platform(self, comment_data: Dict, reply_text: str):
+    def _post_reply_to_platform(self, comment_data: Dict, reply_text: str, reply_id: str = None):
         """Post reply to platform with error handling"""
         platform = comment_data["platform"]
         integrator = self.integrators.get(platform)
@@ -246,7 +765,7 @@ class TaskScheduler:
                 
             if result.get("success"):
                 # Update reply status
-                self.db.update_reply_status(comment_data["id"], "posted")
+                self.db.update_reply_status(reply_id or comment_data["id"], "posted")
                 logger.info(f"Successfully posted reply to {platform}")
                 
                 # Notify dashboard
@@ -261,6 +780,13 @@ class TaskScheduler:
         except Exception as e:
             logger.error(f"Error posting reply to {platform}: {e}")
 
+    def refresh_analytics(self):
+        """Bring the analytics rollups up to date"""
+        try:
+            self.db.refresh_analytics_rollups()
+        except Exception as e:
+            logger.error(f"Analytics rollup refresh failed: {e}")
+
     def process_pending_comments(self):
         """Process any pending comments that need review"""
         pending_replies = self.db.get_pending_replies(limit=100)
@@ -268,7 +794,7 @@ class TaskScheduler:
         for reply in pending_replies:
             # Check if auto-approval conditions are met
             if self._can_auto_approve(reply):
-                self.db.update_reply_status(reply["_id"], "auto_approved")
+                self.db.update_reply_status(reply["reply_id"], "auto_approved")
                 
                 # Get original comment data
                 comment = self.db.get_comment_by_id(reply["comment_id"])
@@ -310,4 +836,15 @@ class TaskScheduler:
         self.running = False
         if self.scheduler_thread:
             self.scheduler_thread.join(timeout=5)
+        if self.job_worker_thread:
+            self.job_worker_thread.join(timeout=5)
+        self.fetch_executor.shutdown(wait=False)
+        self.processing_engine.close()
+        
+        # Hand platform fetching over to the remaining workers right away
+        for platform in self.integrators:
+            try:
+                self.db.release_lease(f"fetch:{platform}", self.worker_id)
+            except Exception as e:
+                logger.error(f"Failed to release fetch lease for {platform}: {e}")
         logger.info("Task scheduler stopped")
@@ -0,0 +1,14 @@
+# conftest.py - Import the checkout as the dashboard package, the way the app and workers do
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "dashboard" not in sys.modules:
+    # The modules use relative imports, so they only load as members of the package
+    spec = importlib.machinery.ModuleSpec("dashboard", None, is_package=True)
+    package = importlib.util.module_from_spec(spec)
+    package.__path__ = [ROOT]
+    sys.modules["dashboard"] = package
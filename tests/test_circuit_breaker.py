@@ -0,0 +1,90 @@
+import pytest
+
+from dashboard import circuit_breaker
+from dashboard.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "time", lambda: now[0])
+    return now
+
+
+def make_breaker():
+    return CircuitBreaker("test", failure_threshold=3, base_backoff=10, max_backoff=100, jitter=0)
+
+
+def test_opens_after_threshold_consecutive_failures(clock):
+    breaker = make_breaker()
+    breaker.record_failure(RuntimeError("down"))
+    breaker.record_failure(RuntimeError("down"))
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+
+    breaker.record_failure(RuntimeError("down"))
+    assert breaker.state == OPEN
+    assert breaker.is_open()
+    assert not breaker.allow_request()
+    assert breaker.get_status()["retry_in"] == 10
+
+
+def test_half_open_lets_a_single_trial_through(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock[0] += 10
+    assert not breaker.is_open()
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+
+
+def test_failed_trial_reopens_immediately(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+
+def test_success_resets_the_circuit(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+    assert breaker.consecutive_opens == 0
+    # A fresh run of failures is needed to open it again
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow_request()
+
+
+def test_open_duration_grows_exponentially_up_to_the_cap(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+
+    durations = []
+    for _ in range(5):
+        durations.append(breaker.open_until - clock[0])
+        clock[0] = breaker.open_until
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert durations == [10, 20, 40, 80, 100]
+
+
+def test_jitter_stays_within_bounds(clock):
+    breaker = CircuitBreaker("jittered", failure_threshold=1, base_backoff=100, max_backoff=100, jitter=0.2)
+    breaker.record_failure()
+    assert 80 <= breaker.open_until - clock[0] <= 120
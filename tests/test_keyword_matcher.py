@@ -0,0 +1,35 @@
+from dashboard.keyword_matcher import KeywordMatcher
+
+
+def test_overlapping_keywords_from_different_categories():
+    matcher = KeywordMatcher({
+        "lead": ["want", "coaching"],
+        "interested": ["want to know more", "know more"]
+    })
+    matches = matcher.match("I want to know more about coaching")
+    assert matches == {
+        "lead": ["want", "coaching"],
+        "interested": ["want to know more", "know more"]
+    }
+
+
+def test_nested_keywords_sharing_a_start():
+    matcher = KeywordMatcher({"lead": ["how much"], "question": ["how"]})
+    assert matcher.match("How much is it?") == {"question": ["how"], "lead": ["how much"]}
+
+
+def test_word_boundaries_on_alphanumeric_edges_only():
+    matcher = KeywordMatcher({"spam": ["www.", "dm me"], "lead": ["price"]})
+    assert matcher.match("visit www.example.com") == {"spam": ["www."]}
+    assert matcher.match("priceless advice, dm meee") == {}
+    assert matcher.match("What's the PRICE?") == {"lead": ["price"]}
+
+
+def test_keyword_in_several_categories_and_whitespace_normalized():
+    matcher = KeywordMatcher({"lead": ["sign  up"], "purchase_intent": ["sign up"]})
+    assert matcher.match("where do I\nsign   up") == {"lead": ["sign up"], "purchase_intent": ["sign up"]}
+
+
+def test_empty_inputs():
+    assert KeywordMatcher({}).match("anything") == {}
+    assert KeywordMatcher({"lead": ["want"]}).match("") == {}
@@ -0,0 +1,83 @@
+import random
+
+from dashboard.local_classifier import LocalCommentClassifier
+
+QUESTION_WORDS = ["when is the next service", "what time does it start", "is there a replay", "where is the event"]
+COMPLAINT_WORDS = ["audio was terrible", "video keeps buffering", "sound cut out again", "stream was broken"]
+
+
+def labelled_rows(count, noise=0.0, seed=0):
+    """Synthetic (text, label) rows; noise flips that share of labels"""
+    rng = random.Random(seed)
+    rows = []
+    for index in range(count):
+        label = "question" if index % 2 else "complaint"
+        text = rng.choice(QUESTION_WORDS if label == "question" else COMPLAINT_WORDS)
+        if rng.random() < noise:
+            label = "complaint" if label == "question" else "question"
+        rows.append((f"{text} {rng.randint(0, 999)}", label))
+    return rows
+
+
+def make_classifier(tmp_path, threshold=0.9):
+    return LocalCommentClassifier(model_path=str(tmp_path / "model.json"), threshold=threshold)
+
+
+def test_train_predict_round_trip_through_saved_model(tmp_path):
+    classifier = make_classifier(tmp_path)
+    classifier.train(labelled_rows(200))
+    assert classifier.predict("the audio was terrible today")[0] == "complaint"
+    assert classifier.predict("what time does the service start")[0] == "question"
+
+    classifier.save()
+    reloaded = make_classifier(tmp_path)
+    assert reloaded.model is not None
+    for text in ("sound cut out", "is there a replay"):
+        assert reloaded.predict(text) == classifier.predict(text)
+
+
+def test_untrained_classifier_defers_to_the_llm(tmp_path):
+    classifier = make_classifier(tmp_path)
+    assert classifier.predict("sound cut out") is None
+    assert classifier.classify("sound cut out") is None
+    assert classifier.get_stats()["deferred"] == 1
+
+
+def test_rules_answer_before_the_model(tmp_path):
+    classifier = make_classifier(tmp_path)
+    comment_type, metadata = classifier.classify("Check my profile for deals")
+    assert comment_type == "spam"
+    assert metadata["reason"] == "local_rules"
+
+
+def test_zero_threshold_accepts_every_model_prediction(tmp_path):
+    classifier = make_classifier(tmp_path, threshold=0)
+    classifier.train(labelled_rows(50))
+    assert classifier.threshold == 0
+    assert classifier.classify("stream keeps buffering")[1]["reason"] == "local_model"
+
+
+def test_calibration_softens_overconfident_predictions(tmp_path):
+    classifier = make_classifier(tmp_path)
+    classifier.train(labelled_rows(400, noise=0.2))
+    raw_confidence = classifier.predict("audio was terrible")[1]
+
+    temperature = classifier.calibrate(labelled_rows(200, noise=0.2, seed=1))
+    assert temperature > 1
+    assert classifier.model["temperature"] == temperature
+    calibrated_label, calibrated_confidence = classifier.predict("audio was terrible")
+    assert calibrated_label == "complaint"
+    assert calibrated_confidence < raw_confidence
+    # With a fifth of the labels flipped, well-calibrated confidence sits near 0.8
+    assert 0.6 < calibrated_confidence < 0.95
+
+
+def test_refresh_keeps_the_calibrated_temperature(tmp_path):
+    class Database:
+        def get_labelled_comments(self, limit):
+            return labelled_rows(300, noise=0.2)
+
+    classifier = make_classifier(tmp_path)
+    report = classifier.refresh_from_db(Database())
+    assert report["temperature"] > 1
+    assert make_classifier(tmp_path).model["temperature"] == report["temperature"]
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("openai")
+
+from dashboard.processing_engine import CommentProcessingEngine, _FairQueue
+
+
+def comments_for(*platforms):
+    return [{"id": f"{platform}-{index}", "platform": platform} for index, platform in enumerate(platforms)]
+
+
+def drain(queue):
+    """Take items one at a time, finishing each before the next"""
+    order = []
+    while queue.has_pending():
+        platform, index = queue.next_item()
+        order.append(index)
+        queue.in_flight[platform] -= 1
+    return order
+
+
+def test_platforms_are_served_round_robin():
+    comments = comments_for("youtube", "youtube", "youtube", "facebook", "twitter", "facebook")
+    assert drain(_FairQueue(comments, max_per_platform=10)) == [0, 3, 4, 1, 5, 2]
+
+
+def test_in_flight_items_are_capped_per_platform():
+    queue = _FairQueue(comments_for("youtube", "youtube", "youtube", "facebook"), max_per_platform=2)
+    taken = [queue.next_item() for _ in range(3)]
+    assert taken == [("youtube", 0), ("facebook", 3), ("youtube", 1)]
+    # youtube is at its cap and facebook is empty, so nothing is runnable
+    assert queue.next_item() is None
+    assert queue.has_pending()
+
+    queue.in_flight["youtube"] -= 1
+    assert queue.next_item() == ("youtube", 2)
+    assert not queue.has_pending()
+
+
+def test_engine_never_exceeds_the_platform_cap():
+    class Processor:
+        def __init__(self):
+            self.running = {}
+            self.peak = {}
+
+        async def aprocess_comment(self, comment_data, should_finalize=None):
+            platform = comment_data["platform"]
+            self.running[platform] = self.running.get(platform, 0) + 1
+            self.peak[platform] = max(self.peak.get(platform, 0), self.running[platform])
+            await asyncio.sleep(0.01)
+            self.running[platform] -= 1
+            return {"status": "processed", "id": comment_data["id"]}
+
+    processor = Processor()
+    engine = CommentProcessingEngine(processor, max_concurrency=6, max_per_platform=2)
+    comments = comments_for(*(["youtube"] * 8 + ["facebook"] * 3))
+    results = engine.process_batch(comments)
+
+    assert [result["id"] for result in results] == [comment["id"] for comment in comments]
+    assert processor.peak == {"youtube": 2, "facebook": 2}
+    assert engine.stats["processed"] == len(comments)
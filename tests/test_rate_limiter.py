@@ -0,0 +1,139 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from dashboard import rate_limiter
+from dashboard.rate_limiter import QuotaExceededError, RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(rate_limiter.time, "time", lambda: now[0])
+    monkeypatch.setattr(rate_limiter.time, "sleep", sleep)
+    return now
+
+
+def at_utc(monkeypatch, *moment):
+    """Freeze the limiter's wall clock at a UTC moment"""
+    frozen = datetime(*moment, tzinfo=timezone.utc)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return frozen.astimezone(tz)
+
+    monkeypatch.setattr(rate_limiter, "datetime", FrozenDatetime)
+
+
+def test_bucket_allows_a_burst_then_refills_at_the_rate(clock):
+    limiter = RateLimiter("test", rate=2.0, burst=2, max_wait=10)
+    limiter.acquire()
+    limiter.acquire()
+    assert limiter.stats["throttled"] == 0
+
+    started = clock[0]
+    limiter.acquire()
+    assert clock[0] - started == pytest.approx(0.5)
+    assert limiter.stats["throttled"] == 1
+
+    clock[0] += 10
+    limiter.acquire()
+    limiter.acquire()
+    # Refill is capped at the burst size
+    assert limiter.get_status()["tokens"] == 0
+
+
+def test_rejects_instead_of_waiting_past_max_wait(clock):
+    limiter = RateLimiter("test", rate=0.1, burst=1, max_wait=5)
+    limiter.acquire()
+    with pytest.raises(QuotaExceededError):
+        limiter.acquire()
+    assert limiter.stats["rejected"] == 1
+
+
+def test_twitter_headers_pause_until_the_window_resets(clock):
+    limiter = RateLimiter("twitter", rate=1.0, burst=5, max_wait=30)
+    limiter.update_from_headers({
+        "x-rate-limit-limit": "100",
+        "x-rate-limit-remaining": "0",
+        "x-rate-limit-reset": str(int(clock[0]) + 120)
+    })
+    assert limiter.usage_percent == 100
+    assert limiter.get_status()["paused_for"] == 120
+    assert limiter.remaining_fraction() == 0.0
+    with pytest.raises(QuotaExceededError):
+        limiter.acquire()
+
+    clock[0] += 120
+    limiter.acquire()
+
+
+def test_graph_usage_slows_down_then_pauses(clock):
+    limiter = RateLimiter("graph", rate=4.0, burst=10)
+    limiter.update_from_headers({"x-app-usage": json.dumps({"call_count": 85, "total_time": 10, "total_cputime": 5})})
+    assert limiter.rate == pytest.approx(4.0 * 15 / 25)
+    assert limiter.get_status()["paused_for"] == 0
+
+    business_usage = {"123": [{"call_count": 96, "estimated_time_to_regain_access": 0}]}
+    limiter.update_from_headers({"x-business-use-case-usage": json.dumps(business_usage)})
+    assert limiter.get_status()["paused_for"] == 60
+
+    limiter.update_from_headers({"x-app-usage": json.dumps({"call_count": 10})})
+    assert limiter.rate == 4.0
+
+
+def test_daily_quota_rolls_over_at_pacific_midnight(clock, monkeypatch):
+    # 23:30 PDT on July 1st
+    at_utc(monkeypatch, 2026, 7, 2, 6, 30)
+    limiter = RateLimiter("youtube", rate=100.0, burst=100, daily_quota=100, costs={"comments.insert": 50})
+    limiter.acquire("comments.insert")
+    limiter.acquire("comments.insert")
+    with pytest.raises(QuotaExceededError):
+        limiter.acquire("list")
+
+    # 00:30 PDT; a fixed UTC-8 offset would still say July 1st here
+    at_utc(monkeypatch, 2026, 7, 2, 7, 30)
+    assert limiter._quota_period() == "2026-07-02"
+    limiter.acquire("list")
+    assert limiter.get_status()["quota_used"] == 1
+
+
+def test_quota_reset_countdown_spans_a_daylight_saving_change(monkeypatch):
+    # Midnight PDT on the day clocks fall back: the next midnight is 25 hours away
+    at_utc(monkeypatch, 2026, 11, 1, 7, 0)
+    limiter = RateLimiter("youtube", rate=1.0, burst=1, daily_quota=10)
+    assert limiter._seconds_until_quota_reset() == 25 * 3600
+
+
+def test_quota_is_charged_in_the_shared_store(clock):
+    class Store:
+        used = 0
+
+        def charge_api_quota(self, api_name, quota_day, units, daily_quota):
+            if self.used + units > daily_quota:
+                return None
+            self.used += units
+            return self.used
+
+        def get_api_quota_usage(self, api_name, quota_day):
+            return self.used
+
+    store = Store()
+    first = RateLimiter("youtube", rate=100.0, burst=100, daily_quota=3)
+    second = RateLimiter("youtube", rate=100.0, burst=100, daily_quota=3)
+    first.set_quota_store(store)
+    second.set_quota_store(store)
+
+    first.acquire()
+    first.acquire()
+    second.acquire()
+    with pytest.raises(QuotaExceededError):
+        second.acquire()
+    assert store.used == 3
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("schedule")
+pytest.importorskip("openai")
+
+from dashboard.scheduler import TaskScheduler
+
+
+def at(hour, minute=0):
+    return datetime(2026, 5, 1, hour, minute, tzinfo=timezone.utc)
+
+
+def comment(comment_id, hour, minute=0):
+    return {"id": comment_id, "published_at": at(hour, minute).isoformat().replace("+00:00", "Z")}
+
+
+@pytest.fixture
+def scheduler():
+    # _advance_cursor is pure, so the integrators and database are not needed
+    return TaskScheduler.__new__(TaskScheduler)
+
+
+def test_single_page_moves_the_high_water_mark(scheduler):
+    cursor = {"last_seen_at": at(8), "last_seen_id": "a"}
+    advanced = scheduler._advance_cursor(cursor, [comment("b", 9), comment("c", 10)], None, at(8))
+    assert advanced == {
+        "last_seen_at": at(10), "last_seen_id": "c", "page_token": None,
+        "pending_seen_at": None, "pending_seen_id": None
+    }
+
+
+def test_draining_keeps_the_old_mark_and_holds_the_newest_as_pending(scheduler):
+    cursor = {"last_seen_at": at(8), "last_seen_id": "a"}
+    first = scheduler._advance_cursor(cursor, [comment("d", 12), comment("c", 11)], "page-2", at(8))
+    assert first["last_seen_at"] == at(8)
+    assert first["last_seen_id"] == "a"
+    assert first["page_token"] == "page-2"
+    assert (first["pending_seen_at"], first["pending_seen_id"]) == (at(12), "d")
+
+    # Older pages do not overwrite what the first page saw
+    second = scheduler._advance_cursor(first, [comment("b", 9)], "page-3", at(8))
+    assert second["last_seen_at"] == at(8)
+    assert (second["pending_seen_at"], second["pending_seen_id"]) == (at(12), "d")
+
+
+def test_last_page_of_a_drain_releases_the_pending_mark(scheduler):
+    cursor = {
+        "last_seen_at": at(8), "last_seen_id": "a", "page_token": "page-3",
+        "pending_seen_at": at(12).isoformat(), "pending_seen_id": "d"
+    }
+    advanced = scheduler._advance_cursor(cursor, [comment("b", 9)], None, at(8))
+    assert advanced == {
+        "last_seen_at": at(12), "last_seen_id": "d", "page_token": None,
+        "pending_seen_at": None, "pending_seen_id": None
+    }
+
+
+def test_newer_item_seen_while_draining_replaces_the_pending_mark(scheduler):
+    cursor = {"last_seen_at": at(8), "page_token": "page-2", "pending_seen_at": at(12), "pending_seen_id": "d"}
+    advanced = scheduler._advance_cursor(cursor, [comment("e", 13)], "page-3", at(8))
+    assert (advanced["pending_seen_at"], advanced["pending_seen_id"]) == (at(13), "e")
+
+
+def test_undated_items_do_not_move_the_cursor(scheduler):
+    cursor = {"last_seen_at": at(8), "last_seen_id": "a"}
+    advanced = scheduler._advance_cursor(cursor, [{"id": "x", "published_at": None}], None, at(8))
+    assert advanced["last_seen_at"] == at(8)
+    assert advanced["last_seen_id"] == "a"
@@ -1,17 +1,30 @@
 # twitter_integration.py - Twitter/X API integration (v2)
 import tweepy
 import logging
+import os
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
+
+from .rate_limiter import RateLimiter, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
+REPLY_TWEET_FIELDS = ['created_at', 'author_id', 'in_reply_to_user_id', 'conversation_id']
+
 class TwitterIntegrator:
     def __init__(self, bearer_token: str, api_key: str = None, api_secret: str = None, 
-                 access_token: str = None, access_token_secret: str = None):
+                 access_token: str = None, access_token_secret: str = None, username: str = None,
+                 rate_limiter: RateLimiter = None):
         """Initialize Twitter API v2 client"""
         
         self.bearer_token = bearer_token
+        self.username = username
+        self._user_ids = {}  # username -> user id, resolved once per client
+        
+        # Recent search query length limit (512 on standard access, 1024 on higher tiers)
+        self.max_query_length = int(os.getenv("TWITTER_MAX_QUERY_LENGTH", "512"))
+        # Safety cap on result pages followed per search query
+        self.max_search_pages = int(os.getenv("TWITTER_MAX_SEARCH_PAGES", "20"))
         
         # Initialize API v2 client for reading
         self.client = tweepy.Client(
@@ -23,21 +36,26 @@ class TwitterIntegrator:
             wait_on_rate_limit=True
         )
         
+        # Track x-rate-limit-* headers on every response so throttling starts before a 429
+        self.rate_limiter = rate_limiter or get_rate_limiter("twitter")
+        self.client.session.hooks["response"].append(
+            lambda response, *args, **kwargs: self.rate_limiter.update_from_headers(response.headers)
+        )
+        
         logger.info("Twitter API client initialized")
 
-    def get_user_tweets(self, username: str, max_results: int = 100) -> List[Dict]:
-        """Get recent tweets from user"""
+    def get_user_tweets(self, username: str = None, max_results: int = 100) -> List[Dict]:
+        """Get recent tweets from user (defaults to the configured account); API errors are raised"""
+        
+        username = username or self.username
         
         try:
-            # Get user ID first
-            user = self.client.get_user(username=username)
-            if not user.data:
-                logger.error(f"User {username} not found")
+            user_id = self._get_user_id(username)
+            if not user_id:
                 return []
             
-            user_id = user.data.id
-            
             # Get tweets
+            self.rate_limiter.acquire()
             tweets = self.client.get_users_tweets(
                 id=user_id,
                 max_results=max_results,
@@ -64,36 +82,24 @@ class TwitterIntegrator:
             
         except Exception as e:
             logger.error(f"Failed to get tweets: {e}")
-            return []
+            raise
+
+    def _get_user_id(self, username: str) -> Optional[int]:
+        """Resolve a username to its user id, caching the lookup"""
+        if username not in self._user_ids:
+            self.rate_limiter.acquire()
+            user = self.client.get_user(username=username)
+            if not user.data:
+                logger.error(f"User {username} not found")
+                return None
+            self._user_ids[username] = user.data.id
+        return self._user_ids[username]
 
-    def get_tweet_replies(self, tweet_id: str) -> List[Dict]:
-        """Get replies to a specific tweet"""
+    def get_tweet_replies(self, tweet_id: str, since_id: str = None) -> List[Dict]:
+        """Get replies to a specific tweet, optionally only those newer than since_id"""
         
         try:
-            # Search for replies using conversation_id
-            tweets = self.client.search_recent_tweets(
-                query=f"conversation_id:{tweet_id}",
-                tweet_fields=['created_at', 'author_id', 'in_reply_to_user_id'],
-                max_results=100
-            )
-            
-            if not tweets.data:
-                return []
-            
-            replies = []
-            for tweet in tweets.data:
-                if tweet.id != tweet_id:  # Exclude original tweet
-                    reply = {
-                        "id": tweet.id,
-                        "text": tweet.text,
-                        "author_id": tweet.author_id,
-                        "created_at": tweet.created_at.isoformat() if tweet.created_at else "",
-                        "in_reply_to_user_id": tweet.in_reply_to_user_id,
-                        "platform": "twitter",
-                        "original_tweet_id": tweet_id
-                    }
-                    replies.append(reply)
-            
+            replies, _ = self.get_comments_batch_since({str(tweet_id): {"since_id": since_id}})[str(tweet_id)]
             logger.info(f"Retrieved {len(replies)} replies to tweet {tweet_id}")
             return replies
             
@@ -101,10 +107,118 @@ class TwitterIntegrator:
             logger.error(f"Failed to get tweet replies: {e}")
             return []
 
+    def get_comments_batch_since(self, cursors: Dict[str, Dict]) -> Dict[str, Union[Tuple[List[Dict], Optional[str]], Exception]]:
+        """Get replies to many tweets, ORing their conversation ids into as few searches as fit the query limit.
+        
+        cursors maps tweet_id to {"since_id": newest reply already seen, "after": resume token}.
+        Returns (replies, resume token) per tweet, matching the other integrators' batch fetchers;
+        the token is set when max_search_pages stopped a search before it reached since_id.
+        """
+        
+        try:
+            replies = {str(tweet_id): [] for tweet_id in cursors}
+            since_ids = {str(tweet_id): cursor.get("since_id") for tweet_id, cursor in cursors.items()}
+            resume_tokens = {str(tweet_id): None for tweet_id in cursors}
+            
+            # Tweets still draining older replies resume below their token; the rest search from the newest
+            by_until = {}
+            for tweet_id, cursor in cursors.items():
+                by_until.setdefault(cursor.get("after"), {})[str(tweet_id)] = since_ids[str(tweet_id)]
+            
+            searches = 0
+            for until_id, group_since_ids in by_until.items():
+                for group in self._group_conversations(group_since_ids):
+                    # The group shares the oldest since_id; newer per-tweet cursors are applied below
+                    group_since = [since_ids[tweet_id] for tweet_id in group]
+                    since_id = None if None in group_since else min(group_since, key=int)
+                    query = " OR ".join(f"conversation_id:{tweet_id}" for tweet_id in group)
+                    
+                    tweets, resume_token = self._search_all(query, since_id, until_id)
+                    for tweet in tweets:
+                        tweet_id = str(tweet.conversation_id)
+                        if tweet_id not in replies or str(tweet.id) == tweet_id:  # Exclude original tweet
+                            continue
+                        if since_ids[tweet_id] and int(tweet.id) <= int(since_ids[tweet_id]):
+                            continue
+                        replies[tweet_id].append(self._parse_reply(tweet, tweet_id))
+                    for tweet_id in group:
+                        resume_tokens[tweet_id] = resume_token
+                    searches += 1
+            
+            total = sum(len(tweet_replies) for tweet_replies in replies.values())
+            logger.info(f"Retrieved {total} replies to {len(cursors)} tweets in {searches} searches")
+            return {tweet_id: (tweet_replies, resume_tokens[tweet_id]) for tweet_id, tweet_replies in replies.items()}
+            
+        except Exception as e:
+            logger.error(f"Failed to batch fetch tweet replies: {e}")
+            raise
+
+    def _group_conversations(self, since_ids: Dict[str, Optional[str]]) -> List[List[str]]:
+        """Split tweet ids into groups whose OR'd conversation_id query fits max_query_length"""
+        # Tweets with similar cursors share a group, so the shared since_id skips little
+        ordered = sorted(since_ids, key=lambda tweet_id: int(since_ids[tweet_id] or 0))
+        
+        groups = []
+        current, length = [], 0
+        for tweet_id in ordered:
+            term_length = len(f"conversation_id:{tweet_id}") + (len(" OR ") if current else 0)
+            if current and length + term_length > self.max_query_length:
+                groups.append(current)
+                current, length = [], 0
+                term_length = len(f"conversation_id:{tweet_id}")
+            current.append(tweet_id)
+            length += term_length
+        if current:
+            groups.append(current)
+        return groups
+
+    def _search_all(self, query: str, since_id: str = None, until_id: str = None) -> Tuple[List, Optional[str]]:
+        """Run a recent search newest first, following next_token until the results are exhausted.
+        
+        Returns the tweets and, when max_search_pages was hit first, the oldest fetched id to
+        pass back as until_id so the next cycle continues with the older replies.
+        """
+        results = []
+        next_token = None
+        for _ in range(self.max_search_pages):
+            self.rate_limiter.acquire()
+            response = self.client.search_recent_tweets(
+                query=query,
+                tweet_fields=REPLY_TWEET_FIELDS,
+                max_results=100,
+                since_id=since_id,
+                until_id=until_id,
+                next_token=next_token
+            )
+            results.extend(response.data or [])
+            next_token = (response.meta or {}).get("next_token")
+            if not next_token:
+                return results, None
+        
+        oldest_id = min((int(tweet.id) for tweet in results), default=None)
+        resume_token = str(oldest_id) if oldest_id is not None else until_id
+        logger.warning(f"Stopped after {self.max_search_pages} pages for query {query[:80]}; resuming below {resume_token} next cycle")
+        return results, resume_token
+
+    def _parse_reply(self, tweet, tweet_id: str) -> Dict:
+        """Parse a reply found by conversation search"""
+        
+        return {
+            "id": tweet.id,
+            "text": tweet.text,
+            "author_id": tweet.author_id,
+            "created_at": tweet.created_at.isoformat() if tweet.created_at else "",
+            "published_at": tweet.created_at.isoformat() if tweet.created_at else "",
+            "in_reply_to_user_id": tweet.in_reply_to_user_id,
+            "platform": "twitter",
+            "original_tweet_id": tweet_id
+        }
+
     def reply_to_tweet(self, tweet_id: str, reply_text: str) -> Dict:
         """Reply to a tweet"""
         
         try:
+            self.rate_limiter.acquire()
             response = self.client.create_tweet(
                 text=reply_text,
                 in_reply_to_tweet_id=tweet_id
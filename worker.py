@@ -0,0 +1,90 @@
+# worker.py - Standalone worker process for platform fetching and AI reply jobs
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from typing import Dict
+
+from dotenv import load_dotenv
+
+from .comment_processor import CommentProcessor
+from .database_manager import DatabaseManager
+from .scheduler import TaskScheduler
+
+logger = logging.getLogger(__name__)
+
+# TaskScheduler.setup_integrators keys, read from the upper-cased environment variable
+API_KEY_NAMES = [
+    "youtube_api_key",
+    "facebook_access_token", "facebook_page_id",
+    "instagram_access_token", "instagram_account_id",
+    "twitter_bearer_token", "twitter_username", "twitter_api_key", "twitter_api_secret",
+    "twitter_access_token", "twitter_access_token_secret"
+]
+
+
+def load_api_keys() -> Dict:
+    """Collect platform credentials from the environment"""
+    return {name: os.getenv(name.upper()) for name in API_KEY_NAMES if os.getenv(name.upper())}
+
+
+def run_worker(fetch: bool = True, jobs: bool = True):
+    """Run one worker until SIGINT/SIGTERM.
+    
+    Workers coordinate through the database: AI jobs are leased with SKIP LOCKED and each
+    platform fetch is guarded by a lease, so any number of workers can run side by side.
+    """
+    load_dotenv()
+    db = DatabaseManager()
+    comment_processor = CommentProcessor(os.getenv("OPENAI_API_KEY"), os.getenv("GHL_API_KEY"), db=db)
+    scheduler = TaskScheduler(comment_processor, db)
+    if fetch:
+        scheduler.setup_integrators(load_api_keys())
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    scheduler.start_scheduler(fetch=fetch, jobs=jobs)
+    logger.info(f"Worker {scheduler.worker_id} running (fetch={fetch}, jobs={jobs})")
+    while not stop.wait(1):
+        pass
+
+    logger.info(f"Worker {scheduler.worker_id} stopping")
+    scheduler.stop_scheduler()
+    db.close()
+
+
+def main():
+    """Command-line entry point: python -m dashboard.worker"""
+    parser = argparse.ArgumentParser(description="Comment fetch and AI reply worker")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to run on this host")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--jobs-only", action="store_true", help="only process queued AI reply jobs")
+    mode.add_argument("--fetch-only", action="store_true", help="only fetch platform comments")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(name)s %(levelname)s %(message)s")
+    fetch, jobs = not args.jobs_only, not args.fetch_only
+
+    if args.processes <= 1:
+        run_worker(fetch, jobs)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(fetch, jobs), name=f"worker-{index}")
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    # Ctrl-C reaches the children directly; SIGTERM to the parent is forwarded
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in processes])
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,59 +3,93 @@ import googleapiclient.discovery
 import googleapiclient.errors
 from datetime import datetime, timedelta
 import logging
-from typing import Dict, List, Optional
-import time
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .rate_limiter import RateLimiter, QuotaExceededError, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
+# Partial responses: request only the fields the parsers read
+COMMENT_SNIPPET_FIELDS = "textDisplay,authorDisplayName,authorChannelId,likeCount,publishedAt,updatedAt"
+THREAD_FIELDS = (
+    f"nextPageToken,items(id,snippet(totalReplyCount,topLevelComment/snippet({COMMENT_SNIPPET_FIELDS})),"
+    f"replies/comments(id,snippet({COMMENT_SNIPPET_FIELDS})))"
+)
+REPLY_FIELDS = f"nextPageToken,items(id,snippet({COMMENT_SNIPPET_FIELDS}))"
+PLAYLIST_FIELDS = "items(snippet(title,description,publishedAt,resourceId/videoId,thumbnails/default/url))"
+
 class YouTubeIntegrator:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, rate_limiter: RateLimiter = None, fetch_all_replies: bool = None):
         """Initialize YouTube API client"""
         self.api_key = api_key
         self.api_service_name = "youtube"
         self.api_version = "v3"
+        # Every call is charged against the shared YouTube quota budget
+        self.rate_limiter = rate_limiter or get_rate_limiter("youtube")
+        # Threads inline at most 5 replies; optionally page the rest with comments().list
+        if fetch_all_replies is None:
+            fetch_all_replies = os.getenv("YOUTUBE_FETCH_ALL_REPLIES", "true").lower() == "true"
+        self.fetch_all_replies = fetch_all_replies
+        # Already-seen threads checked for new replies before paging stops
+        self.reply_rescan_threads = int(os.getenv("REPLY_RESCAN_THREADS", "20"))
+        
+        # Channel and uploads playlist ids never change, so they are resolved once
+        self._channel_ids = {}
+        self._uploads_playlists = {}
+        
+        # The googleapiclient transport is not thread-safe, so each thread gets its own client
+        self._local = threading.local()
         
         try:
-            self.youtube = googleapiclient.discovery.build(
-                self.api_service_name, 
-                self.api_version, 
-                developerKey=api_key
-            )
+            self.youtube = self._build_client()
+            self._local.youtube = self.youtube
             logger.info("YouTube API client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize YouTube API: {e}")
             raise
 
+    def _build_client(self):
+        """Build a YouTube Data API client"""
+        return googleapiclient.discovery.build(
+            self.api_service_name, 
+            self.api_version, 
+            developerKey=self.api_key,
+            cache_discovery=False
+        )
+
+    def _service(self):
+        """Get the calling thread's API client, building it on first use"""
+        if getattr(self._local, "youtube", None) is None:
+            self._local.youtube = self._build_client()
+        return self._local.youtube
+
+    def _execute(self, request, operation: str = "list") -> Dict:
+        """Execute an API request once the rate limiter allows it, charging its quota cost"""
+        self.rate_limiter.acquire(operation)
+        try:
+            return request.execute()
+        except googleapiclient.errors.HttpError as e:
+            if e.resp.status == 403 and b"quotaExceeded" in (e.content or b""):
+                self.rate_limiter.exhaust_quota()
+                raise QuotaExceededError("YouTube daily quota exceeded") from e
+            raise
+
     def get_channel_videos(self, channel_id: str = None, max_results: int = 50) -> List[Dict]:
-        """Get recent videos from channel"""
+        """Get recent videos from channel; API errors are raised so callers can tell them from an empty channel"""
         
         try:
-            # If no channel_id provided, get the authenticated user's channel
-            if not channel_id:
-                channels_response = self.youtube.channels().list(
-                    part="id,snippet",
-                    mine=True
-                ).execute()
-                
-                if not channels_response.get("items"):
-                    raise ValueError("No channel found for authenticated user")
-                
-                channel_id = channels_response["items"][0]["id"]
-            
-            # Get channel's upload playlist
-            channel_response = self.youtube.channels().list(
-                part="contentDetails",
-                id=channel_id
-            ).execute()
-            
-            uploads_playlist_id = channel_response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
+            channel_id = self._resolve_channel_id(channel_id)
+            uploads_playlist_id = self._uploads_playlist_id(channel_id)
             
             # Get videos from uploads playlist
-            playlist_response = self.youtube.playlistItems().list(
+            playlist_response = self._execute(self._service().playlistItems().list(
                 part="snippet",
                 playlistId=uploads_playlist_id,
-                maxResults=max_results
-            ).execute()
+                maxResults=max_results,
+                fields=PLAYLIST_FIELDS
+            ))
             
             videos = []
             for item in playlist_response["items"]:
@@ -74,7 +108,35 @@ class YouTubeIntegrator:
             
         except Exception as e:
             logger.error(f"Failed to get channel videos: {e}")
-            return []
+            raise
+
+    def _resolve_channel_id(self, channel_id: str = None) -> str:
+        """Get the given channel id, or the authenticated user's channel id (cached)"""
+        if channel_id:
+            return channel_id
+        if None not in self._channel_ids:
+            channels_response = self._execute(self._service().channels().list(
+                part="id",
+                mine=True,
+                fields="items(id)"
+            ))
+            
+            if not channels_response.get("items"):
+                raise ValueError("No channel found for authenticated user")
+            
+            self._channel_ids[None] = channels_response["items"][0]["id"]
+        return self._channel_ids[None]
+
+    def _uploads_playlist_id(self, channel_id: str) -> str:
+        """Get a channel's uploads playlist id (cached)"""
+        if channel_id not in self._uploads_playlists:
+            channel_response = self._execute(self._service().channels().list(
+                part="contentDetails",
+                id=channel_id,
+                fields="items(contentDetails/relatedPlaylists/uploads)"
+            ))
+            self._uploads_playlists[channel_id] = channel_response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
+        return self._uploads_playlists[channel_id]
 
     def get_video_comments(self, video_id: str, max_results: int = 100) -> List[Dict]:
         """Get comments for a specific video"""
@@ -84,25 +146,21 @@ class YouTubeIntegrator:
             next_page_token = None
             
             while len(comments) < max_results:
-                request = self.youtube.commentThreads().list(
+                request = self._service().commentThreads().list(
                     part="snippet,replies",
                     videoId=video_id,
                     maxResults=min(100, max_results - len(comments)),
                     order="time",  # Get newest comments first
-                    pageToken=next_page_token
+                    pageToken=next_page_token,
+                    fields=THREAD_FIELDS
                 )
                 
-                response = request.execute()
+                response = self._execute(request)
                 
-                for item in response["items"]:
+                for item in response.get("items", []):
                     comment_data = self._parse_comment_thread(item, video_id)
                     comments.append(comment_data)
-                    
-                    # Also get replies if any
-                    if "replies" in item:
-                        for reply in item["replies"]["comments"]:
-                            reply_data = self._parse_reply(reply, video_id, comment_data["id"])
-                            comments.append(reply_data)
+                    comments.extend(self._thread_replies(item, video_id))
                 
                 next_page_token = response.get("nextPageToken")
                 if not next_page_token:
@@ -122,6 +180,93 @@ class YouTubeIntegrator:
             logger.error(f"Failed to get video comments: {e}")
             return []
 
+    def get_video_comments_since(self, video_id: str, since: datetime = None, page_token: str = None,
+                                 max_results: int = 500) -> Tuple[List[Dict], Optional[str]]:
+        """Get comments newer than since, newest first, stopping shortly after already-seen threads.
+        
+        Threads are ordered by their own publish time, so the first reply_rescan_threads seen
+        threads are still checked for new replies. Returns the comments and a page token to
+        resume from when max_results was hit before reaching already-seen data.
+        """
+        
+        try:
+            comments = []
+            next_page_token = page_token
+            rescanned = 0
+            
+            while True:
+                response = self._execute(self._service().commentThreads().list(
+                    part="snippet,replies",
+                    videoId=video_id,
+                    maxResults=100,
+                    order="time",  # Newest threads first so we can stop early
+                    pageToken=next_page_token,
+                    fields=THREAD_FIELDS
+                ))
+                
+                reached_seen = False
+                for item in response.get("items", []):
+                    comment_data = self._parse_comment_thread(item, video_id)
+                    if since and self._published_at(comment_data) <= since:
+                        if rescanned >= self.reply_rescan_threads:
+                            reached_seen = True
+                            break
+                        rescanned += 1
+                        if not comment_data["reply_count"]:
+                            continue
+                    else:
+                        comments.append(comment_data)
+                    comments.extend(
+                        reply for reply in self._thread_replies(item, video_id)
+                        if not since or self._published_at(reply) > since
+                    )
+                
+                next_page_token = response.get("nextPageToken")
+                if reached_seen or not next_page_token:
+                    next_page_token = None
+                    break
+                if len(comments) >= max_results:
+                    break
+            
+            logger.info(f"Retrieved {len(comments)} new comments for video {video_id}")
+            return comments, next_page_token
+            
+        except googleapiclient.errors.HttpError as e:
+            if e.resp.status == 403:
+                logger.warning(f"Comments disabled for video {video_id}")
+                return [], None
+            logger.error(f"YouTube API error getting comments: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Failed to get new video comments: {e}")
+            raise
+
+    def _thread_replies(self, comment_thread: Dict, video_id: str) -> List[Dict]:
+        """Parse a thread's replies, paging the full list only when more exist than were inlined"""
+        inline = comment_thread.get("replies", {}).get("comments", [])
+        total = comment_thread["snippet"].get("totalReplyCount", 0)
+        if not self.fetch_all_replies or total <= len(inline):
+            return [self._parse_reply(reply, video_id, comment_thread["id"]) for reply in inline]
+        
+        replies = []
+        page_token = None
+        while True:
+            response = self._execute(self._service().comments().list(
+                part="snippet",
+                parentId=comment_thread["id"],
+                maxResults=100,
+                pageToken=page_token,
+                fields=REPLY_FIELDS
+            ))
+            replies.extend(self._parse_reply(reply, video_id, comment_thread["id"]) for reply in response.get("items", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return replies
+
+    def _published_at(self, comment: Dict) -> datetime:
+        """Parse a comment's publish time as an aware datetime"""
+        return datetime.fromisoformat(comment["published_at"].replace('Z', '+00:00'))
+
     def _parse_comment_thread(self, comment_thread: Dict, video_id: str) -> Dict:
         """Parse comment thread data"""
         
@@ -188,9 +333,6 @@ class YouTubeIntegrator:
                     ]
                     
                     all_new_comments.extend(new_comments)
-                    
-                    # Rate limiting
-                    time.sleep(0.1)
             
             logger.info(f"Found {len(all_new_comments)} new comments since {last_check}")
             return all_new_comments
@@ -203,7 +345,7 @@ class YouTubeIntegrator:
         """Reply to a YouTube comment"""
         
         try:
-            response = self.youtube.comments().insert(
+            response = self._execute(self._service().comments().insert(
                 part="snippet",
                 body={
                     "snippet": {
@@ -211,7 +353,7 @@ class YouTubeIntegrator:
                         "textOriginal": reply_text
                     }
                 }
-            ).execute()
+            ), "comments.insert")
             
             logger.info(f"Successfully replied to comment {comment_id}")
             return {